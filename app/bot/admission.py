@@ -0,0 +1,141 @@
+# app/bot/admission.py
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Классическое ведро токенов: rate токенов в секунду, не больше burst"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_consume(self, amount=1):
+        """Забирает токены, если они есть. Возвращает True при успехе"""
+        self._refill(time.monotonic())
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def time_until_available(self, amount=1):
+        """Сколько секунд ждать, пока в ведре появится amount токенов"""
+        self._refill(time.monotonic())
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+
+class AdmissionController:
+    """
+    Контроль допуска запросов перед обработчиком сообщений
+
+    - ограничение частоты вопросов для каждого пользователя (ведро токенов)
+    - глобальный предел одновременно обрабатываемых вопросов
+    - объединение одинаковых вопросов, которые уже обрабатываются
+    """
+
+    def __init__(self, rate=0.2, burst=3, max_concurrent=8, max_users=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self.max_concurrent = max_concurrent
+        self._buckets = OrderedDict()
+        self._semaphore = None
+        self._in_flight = {}
+        self._active = 0
+
+    @classmethod
+    def from_config(cls, options):
+        """Создает контроллер из секции "rate_limit" конфигурации"""
+        options = options or {}
+        return cls(
+            rate=options.get('rate', 0.2),
+            burst=options.get('burst', 3),
+            max_concurrent=options.get('max_concurrent', 8),
+            max_users=options.get('max_users', 10000)
+        )
+
+    @staticmethod
+    def normalize_question(text):
+        """Нормализует вопрос для поиска одинаковых запросов"""
+        text = text.lower().replace('ё', 'е')
+        text = re.sub(r'[^\w\s]', ' ', text)
+        return re.sub(r'\s+', ' ', text).strip()
+
+    def allow(self, user_id):
+        """Проверяет лимит частоты для пользователя"""
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[user_id] = bucket
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+
+        if bucket.try_consume():
+            return True
+
+        metrics.incr('admission.rate_limited')
+        return False
+
+    def retry_after(self, user_id):
+        """Через сколько секунд пользователь сможет задать следующий вопрос"""
+        bucket = self._buckets.get(user_id)
+        return bucket.time_until_available() if bucket else 0.0
+
+    async def run(self, key, factory):
+        """
+        Выполняет корутину factory() с учетом глобального предела
+
+        Если вопрос с тем же ключом уже обрабатывается, ожидает его результат
+        вместо повторного обращения к GigaChat.
+
+        Args:
+            key (str): Нормализованный вопрос или None, если объединять нельзя
+            factory: Функция без аргументов, возвращающая корутину
+        """
+        if key is not None:
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                metrics.incr('admission.coalesced')
+                return await asyncio.shield(pending)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def guarded():
+            async with self._semaphore:
+                self._active += 1
+                metrics.set_gauge('admission.in_flight', self._active)
+                try:
+                    return await factory()
+                finally:
+                    self._active -= 1
+                    metrics.set_gauge('admission.in_flight', self._active)
+
+        if key is None:
+            return await guarded()
+
+        task = asyncio.ensure_future(guarded())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
@@ -0,0 +1,333 @@
+# app/bot/broadcast.py
+import asyncio
+import logging
+
+from bot.admission import TokenBucket
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+CREATE_SUBSCRIBERS_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    chat_id BIGINT PRIMARY KEY,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    active BOOLEAN DEFAULT TRUE
+)
+"""
+
+CREATE_BROADCASTS_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_by BIGINT,
+    text TEXT NOT NULL,
+    status VARCHAR(16) DEFAULT 'pending',
+    last_chat_id BIGINT DEFAULT 0,
+    sent INT DEFAULT 0,
+    failed INT DEFAULT 0,
+    finished_at TIMESTAMP NULL,
+    INDEX idx_status (status)
+)
+"""
+
+
+class SubscriberStore:
+    """
+    Реестр чатов, писавших боту
+
+    В памяти хранится только множество ID активных чатов, поэтому
+    проверка на каждом сообщении не обращается к базе; в таблицу
+    subscribers пишется лишь первый контакт нового чата.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.table = database.table_name('subscribers')
+        self._known = set()
+
+    def load(self):
+        """Создает таблицу и загружает ID активных чатов"""
+        self.database.execute(CREATE_SUBSCRIBERS_TABLE.format(table=self.table))
+        rows = self.database.fetch_all(f"SELECT chat_id FROM {self.table} WHERE active")
+        self._known = {row['chat_id'] for row in rows}
+        metrics.set_gauge('broadcast.subscribers', len(self._known))
+        logger.info(f"📬 Подписчиков рассылки: {len(self._known)}")
+
+    def __len__(self):
+        return len(self._known)
+
+    async def add(self, chat_id):
+        """Запоминает чат; повторные вызовы для известного чата ничего не стоят"""
+        if chat_id in self._known:
+            return
+        self._known.add(chat_id)
+        try:
+            await asyncio.to_thread(
+                self.database.execute,
+                f"INSERT INTO {self.table} (chat_id) VALUES (%s) ON DUPLICATE KEY UPDATE active = TRUE",
+                (chat_id,)
+            )
+            metrics.set_gauge('broadcast.subscribers', len(self._known))
+        except Exception as e:
+            # Попробуем еще раз при следующем сообщении
+            self._known.discard(chat_id)
+            logger.warning(f"⚠️ Не удалось сохранить подписчика {chat_id}: {e}")
+
+    def deactivate(self, chat_id):
+        """Исключает чат из рассылок (пользователь заблокировал бота)"""
+        self._known.discard(chat_id)
+        self.database.execute(f"UPDATE {self.table} SET active = FALSE WHERE chat_id = %s", (chat_id,))
+        metrics.set_gauge('broadcast.subscribers', len(self._known))
+
+    def page(self, after, limit):
+        """ID активных чатов больше after по возрастанию"""
+        rows = self.database.fetch_all(
+            f"SELECT chat_id FROM {self.table} WHERE active AND chat_id > %s ORDER BY chat_id LIMIT %s",
+            (after, limit),
+            replica=True
+        )
+        return [row['chat_id'] for row in rows]
+
+
+class Broadcaster:
+    """
+    Очередь рассылок объявлений всем подписчикам
+
+    Рассылки хранятся в таблице broadcasts и выполняются по одной. Чаты
+    обходятся по возрастанию chat_id, а последний обработанный chat_id
+    периодически сохраняется, поэтому после перезапуска рассылка
+    продолжается с места остановки, а не начинается заново.
+
+    Скорость ограничена ведром токенов ниже глобального лимита Telegram
+    (около 30 сообщений в секунду), чтобы оставить запас для ответов на
+    вопросы. Каждый чат получает одно сообщение рассылки, поэтому лимит на
+    чат (1 сообщение в секунду) не нарушается. Ответ 429 (RetryAfter)
+    приостанавливает рассылку на указанное Telegram время.
+    """
+
+    def __init__(self, database, subscribers, rate=20.0, burst=20, page_size=500,
+                 checkpoint_every=25, max_retries=3, bucket=None):
+        """
+        Args:
+            database: Экземпляр MySQLTextDB
+            subscribers (SubscriberStore): Реестр чатов
+            rate (float): Сообщений рассылки в секунду
+            burst (int): Сколько сообщений можно отправить подряд без пауз
+            page_size (int): Сколько chat_id читать из базы за раз
+            checkpoint_every (int): Через сколько сообщений сохранять прогресс
+            max_retries (int): Попыток отправки одному чату при сетевых ошибках
+            bucket (TokenBucket): Общее ведро токенов рассыльщиков лагерей,
+                которые работают через одного бота: лимит Telegram задан на бота
+        """
+        self.database = database
+        self.table = database.table_name('broadcasts')
+        self.subscribers = subscribers
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self.page_size = page_size
+        self.checkpoint_every = checkpoint_every
+        self.max_retries = max_retries
+        self.bot = None
+        self._task = None
+        self._wake = None
+        self._cancelled = set()
+
+    @classmethod
+    def from_config(cls, database, subscribers, options, bucket=None):
+        """Создает рассыльщика из секции "broadcast" конфигурации"""
+        options = options or {}
+        return cls(
+            database,
+            subscribers,
+            rate=options.get('rate', 20.0),
+            burst=options.get('burst', 20),
+            page_size=options.get('page_size', 500),
+            checkpoint_every=options.get('checkpoint_every', 25),
+            bucket=bucket
+        )
+
+    def start(self, bot):
+        """Запускает обработку очереди рассылок (и продолжает прерванную)"""
+        if self._task is None:
+            self.bot = bot
+            self._wake = asyncio.Event()
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def create(self, text, created_by=None):
+        """
+        Ставит рассылку в очередь
+
+        Returns:
+            int: ID рассылки
+        """
+        broadcast_id = await asyncio.to_thread(
+            self.database.execute,
+            f"INSERT INTO {self.table} (created_by, text) VALUES (%s, %s)",
+            (created_by, text)
+        )
+        logger.info(f"📣 Рассылка #{broadcast_id} поставлена в очередь ({len(self.subscribers)} подписчиков)")
+        if self._wake is not None:
+            self._wake.set()
+        return broadcast_id
+
+    async def cancel(self):
+        """
+        Отменяет текущую и ожидающие рассылки
+
+        Returns:
+            int: Число отмененных рассылок
+        """
+        rows = await asyncio.to_thread(
+            self.database.fetch_all,
+            f"SELECT id FROM {self.table} WHERE status IN ('pending', 'running')"
+        )
+        self._cancelled.update(row['id'] for row in rows)
+        await asyncio.to_thread(
+            self.database.execute,
+            f"UPDATE {self.table} SET status = 'cancelled', finished_at = NOW() "
+            "WHERE status IN ('pending', 'running')"
+        )
+        return len(rows)
+
+    async def status(self, limit=3):
+        """Последние рассылки с прогрессом"""
+        return await asyncio.to_thread(
+            self.database.fetch_all,
+            f"SELECT id, created_at, status, sent, failed, finished_at FROM {self.table} "
+            "ORDER BY id DESC LIMIT %s",
+            (limit,)
+        )
+
+    async def _loop(self):
+        try:
+            await asyncio.to_thread(self.database.execute, CREATE_BROADCASTS_TABLE.format(table=self.table))
+        except Exception as e:
+            logger.error(f"❌ Таблица рассылок недоступна, рассылки отключены: {e}")
+            return
+
+        while True:
+            try:
+                rows = await asyncio.to_thread(
+                    self.database.fetch_all,
+                    f"SELECT * FROM {self.table} WHERE status IN ('pending', 'running') ORDER BY id LIMIT 1"
+                )
+                if rows:
+                    await self._run(rows[0])
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка рассылки: {e}")
+                await asyncio.sleep(30)
+                continue
+
+            self._wake.clear()
+            await self._wake.wait()
+
+    async def _run(self, broadcast):
+        broadcast_id = broadcast['id']
+        text = broadcast['text']
+        last_chat_id = broadcast['last_chat_id']
+        sent = broadcast['sent']
+        failed = broadcast['failed']
+        unsaved = 0
+
+        if broadcast['status'] == 'pending':
+            await self._save(broadcast_id, 'running', last_chat_id, sent, failed)
+            logger.info(f"📣 Рассылка #{broadcast_id} начата")
+        else:
+            logger.info(f"📣 Рассылка #{broadcast_id} продолжена после chat_id {last_chat_id} (отправлено {sent})")
+
+        try:
+            while broadcast_id not in self._cancelled:
+                chat_ids = await asyncio.to_thread(self.subscribers.page, last_chat_id, self.page_size)
+                if not chat_ids:
+                    break
+
+                for chat_id in chat_ids:
+                    if broadcast_id in self._cancelled:
+                        break
+                    if await self._send(chat_id, text):
+                        sent += 1
+                    else:
+                        failed += 1
+                    last_chat_id = chat_id
+                    unsaved += 1
+                    if unsaved >= self.checkpoint_every:
+                        await self._save(broadcast_id, 'running', last_chat_id, sent, failed)
+                        unsaved = 0
+        except asyncio.CancelledError:
+            # Остановка бота: сохраняем прогресс, чтобы после перезапуска не отправить сообщения повторно
+            if unsaved:
+                await self._save(broadcast_id, 'running', last_chat_id, sent, failed)
+                logger.info(f"📣 Рассылка #{broadcast_id} прервана после chat_id {last_chat_id} (отправлено {sent})")
+            raise
+
+        if broadcast_id in self._cancelled:
+            self._cancelled.discard(broadcast_id)
+            logger.info(f"📣 Рассылка #{broadcast_id} отменена: отправлено {sent}, ошибок {failed}")
+            return
+
+        await self._save(broadcast_id, 'done', last_chat_id, sent, failed)
+        metrics.incr('broadcast.completed')
+        logger.info(f"✅ Рассылка #{broadcast_id} завершена: отправлено {sent}, ошибок {failed}")
+
+    async def _save(self, broadcast_id, status, last_chat_id, sent, failed):
+        """Сохраняет прогресс; отмененную рассылку не возобновляет"""
+        await asyncio.to_thread(
+            self.database.execute,
+            f"UPDATE {self.table} SET status = %s, last_chat_id = %s, sent = %s, failed = %s, "
+            "finished_at = IF(%s = 'done', NOW(), NULL) "
+            "WHERE id = %s AND status IN ('pending', 'running')",
+            (status, last_chat_id, sent, failed, status, broadcast_id)
+        )
+
+    async def _acquire(self):
+        while not self.bucket.try_consume():
+            await asyncio.sleep(self.bucket.time_until_available())
+
+    async def _send(self, chat_id, text):
+        """Отправляет сообщение одному чату. Возвращает True при успехе"""
+        from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+        attempt = 0
+        while attempt < self.max_retries:
+            await self._acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                metrics.incr('broadcast.sent')
+                return True
+            except RetryAfter as e:
+                # Telegram просит подождать: останавливаем всю рассылку, а не только этот чат
+                delay = e.retry_after
+                delay = delay.total_seconds() if hasattr(delay, 'total_seconds') else float(delay)
+                metrics.incr('broadcast.retry_after')
+                logger.warning(f"⚠️ Telegram ограничил рассылку, пауза {delay:.0f} с")
+                self.bucket.tokens = 0
+                await asyncio.sleep(delay)
+            except Forbidden:
+                # Пользователь заблокировал бота
+                metrics.incr('broadcast.blocked')
+                await asyncio.to_thread(self.subscribers.deactivate, chat_id)
+                return False
+            except BadRequest as e:
+                # Например, чат удален: повтор не поможет
+                logger.warning(f"⚠️ Рассылка в чат {chat_id} отклонена: {e}")
+                break
+            except TelegramError as e:
+                attempt += 1
+                if attempt < self.max_retries:
+                    await asyncio.sleep(2 ** attempt)
+                else:
+                    logger.warning(f"⚠️ Не удалось отправить рассылку в чат {chat_id}: {e}")
+
+        metrics.incr('broadcast.failed')
+        return False
@@ -0,0 +1,162 @@
+# app/bot/conversation.py
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+
+# Признаки уточняющего вопроса, который без предыдущего контекста не понять
+FOLLOW_UP_FIRST_WORDS = {'а', 'и', 'но', 'тогда'}
+FOLLOW_UP_WORDS = {
+    'еще', 'ещё', 'это', 'этого', 'этом', 'там', 'туда', 'он', 'она', 'они',
+    'его', 'ее', 'её', 'их', 'такой', 'такая', 'такие'
+}
+
+
+class Turn:
+    """Одна реплика диалога: вопрос родителя и ответ бота"""
+
+    __slots__ = ('question', 'answer', 'created')
+
+    def __init__(self, question, answer, created):
+        self.question = question
+        self.answer = answer
+        self.created = created
+
+
+class Conversation:
+    __slots__ = ('turns', 'touched')
+
+    def __init__(self, touched):
+        self.turns = []
+        self.touched = touched
+
+
+class ConversationStore:
+    """
+    Ограниченная память диалогов по user.id
+
+    Хранит не больше max_turns последних реплик для не более чем max_users
+    пользователей. Давно неактивные диалоги удаляются по TTL, при переполнении
+    вытесняется самый давно активный пользователь. Реплики обрезаются до
+    max_chars_per_turn, поэтому объем памяти ограничен сверху.
+    """
+
+    def __init__(self, max_users=5000, ttl=1800, max_turns=4, token_budget=400,
+                 max_chars_per_turn=800, chars_per_token=3.0):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.max_chars_per_turn = max_chars_per_turn
+        self.chars_per_token = chars_per_token
+        self._conversations = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, options):
+        """Создает хранилище из секции "conversation" конфигурации"""
+        options = options or {}
+        return cls(
+            max_users=options.get('max_users', 5000),
+            ttl=options.get('ttl_seconds', 1800),
+            max_turns=options.get('max_turns', 4),
+            token_budget=options.get('token_budget', 400),
+            max_chars_per_turn=options.get('max_chars_per_turn', 800)
+        )
+
+    def _evict_expired(self, now):
+        # Самые старые диалоги лежат в начале OrderedDict
+        while self._conversations:
+            user_id, conversation = next(iter(self._conversations.items()))
+            if now - conversation.touched < self.ttl:
+                break
+            del self._conversations[user_id]
+            metrics.incr('conversation.expired')
+
+    def history(self, user_id):
+        """Возвращает список реплик пользователя (от старых к новым)"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            conversation = self._conversations.get(user_id)
+            return list(conversation.turns) if conversation else []
+
+    def add_turn(self, user_id, question, answer):
+        """Запоминает реплику диалога"""
+        now = time.monotonic()
+        turn = Turn(question[:self.max_chars_per_turn], answer[:self.max_chars_per_turn], now)
+
+        with self._lock:
+            conversation = self._conversations.get(user_id)
+            if conversation is None:
+                conversation = Conversation(now)
+                self._conversations[user_id] = conversation
+                if len(self._conversations) > self.max_users:
+                    self._conversations.popitem(last=False)
+                    metrics.incr('conversation.evicted')
+            else:
+                self._conversations.move_to_end(user_id)
+
+            conversation.touched = now
+            conversation.turns.append(turn)
+            if len(conversation.turns) > self.max_turns:
+                del conversation.turns[:-self.max_turns]
+
+            metrics.set_gauge('conversation.users', len(self._conversations))
+
+    def clear(self, user_id):
+        with self._lock:
+            self._conversations.pop(user_id, None)
+
+    @staticmethod
+    def is_follow_up(question):
+        """Похоже ли сообщение на уточнение к предыдущему вопросу"""
+        words = re.findall(r'\w+', question.lower())
+        if len(words) <= 3:
+            return True
+        return words[0] in FOLLOW_UP_FIRST_WORDS or any(word in FOLLOW_UP_WORDS for word in words)
+
+    def retrieval_query(self, history, question):
+        """Дополняет уточняющий вопрос предыдущим вопросом для лучшего поиска"""
+        if history and self.is_follow_up(question):
+            return f"{history[-1].question} {question}"
+        return question
+
+    def history_messages(self, history):
+        """
+        Превращает реплики в сообщения для GigaChat в пределах бюджета токенов
+
+        Свежие реплики берутся целиком, более старые обрезаются,
+        а не поместившиеся в бюджет отбрасываются.
+        """
+        budget = int(self.token_budget * self.chars_per_token)
+        selected = []
+
+        for turn in reversed(history):
+            if budget <= 0:
+                break
+            question = turn.question[:budget]
+            budget -= len(question)
+            answer = _shorten(turn.answer, budget)
+            budget -= len(answer)
+            selected.append((question, answer))
+
+        messages = []
+        for question, answer in reversed(selected):
+            messages.append({"role": "user", "content": question})
+            if answer:
+                messages.append({"role": "assistant", "content": answer})
+        return messages
+
+
+def _shorten(text, max_chars):
+    """Обрезает ответ по границе предложения"""
+    if max_chars <= 0:
+        return ""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = cut.rfind('. ')
+    return cut[:boundary + 1] if boundary > 0 else cut.rsplit(' ', 1)[0] + '…'
@@ -0,0 +1,152 @@
+# app/bot/scheduler.py
+import asyncio
+import itertools
+import logging
+import time
+
+from gigachat.api_client import GigaChatUnavailable
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета: меньше - раньше
+PRIORITY_FIRST = 0      # первый вопрос пользователя
+PRIORITY_FOLLOW_UP = 1  # продолжение диалога
+PRIORITY_REPEAT = 2     # повтор уже заданного вопроса
+
+
+class SchedulerBusy(Exception):
+    """Очередь запросов к GigaChat переполнена"""
+
+
+class LLMScheduler:
+    """
+    Очередь запросов к GigaChat с приоритетами и ограниченным числом исполнителей
+
+    Одновременно выполняется не больше workers запросов (по квоте API),
+    остальные ждут в очереди по приоритету и времени поступления.
+    Запрос, у которого до дедлайна осталось меньше min_remaining секунд,
+    не отправляется: пользователь уже не дождется ответа. Если очередь
+    заполнена, submit сразу выбрасывает SchedulerBusy.
+    """
+
+    def __init__(self, workers=4, max_queue=50, min_remaining=2.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.min_remaining = min_remaining
+        self._queue = None
+        self._tasks = []
+        self._busy = 0
+        self._sequence = itertools.count()
+
+    @classmethod
+    def from_config(cls, options):
+        """Создает планировщик из секции "scheduler" конфигурации"""
+        options = options or {}
+        return cls(
+            workers=options.get('workers', 4),
+            max_queue=options.get('max_queue', 50),
+            min_remaining=options.get('min_remaining', 2.0)
+        )
+
+    @property
+    def depth(self):
+        return self._queue.qsize() if self._queue else 0
+
+    def _ensure_workers(self):
+        # Очередь и исполнители создаются в цикле событий приложения при первом запросе
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue(self.max_queue)
+            self._tasks = [
+                asyncio.ensure_future(self._worker()) for _ in range(self.workers)
+            ]
+            logger.info(f"🚦 Планировщик запросов к GigaChat: {self.workers} исполнителей, очередь {self.max_queue}")
+
+    async def submit(self, func, priority=PRIORITY_FIRST, deadline=None):
+        """
+        Ставит блокирующий вызов func() в очередь и ждет результат
+
+        Args:
+            func: Функция без аргументов, выполняется в отдельном потоке
+            priority (int): Класс приоритета (PRIORITY_*)
+            deadline (float): Момент time.monotonic(), после которого запрос не нужен
+
+        Raises:
+            SchedulerBusy: Очередь заполнена
+            GigaChatUnavailable: Дедлайн истек, пока запрос ждал в очереди
+        """
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        item = (priority, next(self._sequence), time.monotonic(), deadline, func, future)
+
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            metrics.incr('scheduler.rejected')
+            raise SchedulerBusy("Очередь запросов к GigaChat заполнена")
+
+        metrics.set_gauge('scheduler.queue_depth', self._queue.qsize())
+        return await future
+
+    async def _worker(self):
+        while True:
+            _, _, enqueued, deadline, func, future = await self._queue.get()
+            metrics.set_gauge('scheduler.queue_depth', self._queue.qsize())
+            metrics.observe('scheduler.wait_ms', (time.monotonic() - enqueued) * 1000)
+
+            try:
+                # Обработчик сообщения уже отменен - запрос никому не нужен
+                if future.done():
+                    metrics.incr('scheduler.cancelled')
+                    continue
+
+                if deadline is not None and deadline - time.monotonic() < self.min_remaining:
+                    metrics.incr('scheduler.expired')
+                    future.set_exception(GigaChatUnavailable("Истек дедлайн в очереди к GigaChat"))
+                    continue
+
+                self._busy += 1
+                metrics.set_gauge('scheduler.busy_workers', self._busy)
+                try:
+                    result = await asyncio.to_thread(func)
+                except asyncio.CancelledError:
+                    # Планировщик остановлен во время запроса
+                    if not future.done():
+                        future.set_exception(GigaChatUnavailable("Очередь запросов к GigaChat остановлена"))
+                    raise
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+                finally:
+                    self._busy -= 1
+                    metrics.set_gauge('scheduler.busy_workers', self._busy)
+            finally:
+                self._queue.task_done()
+
+    async def stop(self):
+        """
+        Останавливает исполнителей
+
+        Запросы, оставшиеся в очереди, завершаются GigaChatUnavailable,
+        чтобы ожидающие их обработчики ответили без GigaChat, а не зависли.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        rejected = 0
+        while self._queue is not None and not self._queue.empty():
+            future = self._queue.get_nowait()[-1]
+            self._queue.task_done()
+            if not future.done():
+                future.set_exception(GigaChatUnavailable("Очередь запросов к GigaChat остановлена"))
+                rejected += 1
+        if rejected:
+            metrics.incr('scheduler.rejected_on_stop', rejected)
+            logger.info(f"🚦 Запросов к GigaChat отклонено при остановке: {rejected}")
+        self._queue = None
+        metrics.set_gauge('scheduler.queue_depth', 0)
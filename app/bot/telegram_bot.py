@@ -1,19 +1,129 @@
 # app/bot/telegram_bot.py
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+import asyncio
 import logging
+import math
 import re
+import time
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from bot.admission import AdmissionController
+from bot.conversation import ConversationStore
+from bot.scheduler import (
+    LLMScheduler, SchedulerBusy, PRIORITY_FIRST, PRIORITY_FOLLOW_UP, PRIORITY_REPEAT
+)
+from gigachat.api_client import GigaChatUnavailable
+from lifecycle import Lifecycle
+from processing.prompt_budget import ContextAssembler
+from metrics import metrics
+from profiling import request_profiler
+from startup import startup_profiler
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = """Ты - полезный AI-помощник {camp_title}. 
+Отвечай на вопросы родителей вежливо и информативно. Основывай ответ на предоставленном контексте.
+Строго соблюдай все правила форматирования из инструкции."""
+
+FORMATTING_RULES = """
+ПРИ ФОРМИРОВАНИИ ОТВЕТА СОБЛЮДАЙТЕ СЛЕДУЮЩИЕ ПРАВИЛА ФОРМАТИРОВАНИЯ:
+
+1. ССЫЛКИ: сайт пишется через пробел после двоеточия, следующего за непосредственным упоминанием ресурса.
+   Пример: Наш сайт: {camp_website}
+
+2. EMAIL: адреса электронных почт указываются без кавычек.
+   Пример: Пишите нам на email: {contact_email}
+
+3. ПЕРЕЧИСЛЕНИЯ: каждый пункт пишется с нового абзаца в формате:
+   1. "Заголовок пункта". Текст пункта начинается с нового предложения.
+   2. "Второй пункт". Описание второго пункта.
+
+4. ОБРАЩЕНИЯ: обращения "Вам", "Вы", "Ваш" всегда пишутся с заглавной буквы.
+   Пример: Для Вас необходимо предоставить следующие документы. Ваш ребенок будет находиться под присмотром.
+
+5. КОНТАКТНЫЙ ТЕЛЕФОН: при вопросах о связи с представителями лагеря, контакте с детьми или упоминании администрации обязательно указывайте контактный телефон в круглых скобках.
+   Пример: Для связи с администрацией лагеря (тел. {contact_phone}) Вы можете позвонить по указанному номеру.
+
+6. СТОИМОСТЬ: при вопросах о стоимости указывайте ИСКЛЮЧИТЕЛЬНО информацию с официального сайта без каких-либо преобразований. Если точной информации нет, направляйте на сайт.
+   Пример: Актуальную стоимость путевок Вы можете узнать на нашем сайте: {camp_website}
+
+7. ОБЩИЕ ПРАВИЛА:
+   - Используйте четкую структуру
+   - Разделяйте абзацы пустыми строками
+   - Никогда не выделяйте слова или словосочетания двойными звёздочками
+   - Будьте вежливы и информативны
+   - Если информации недостаточно, предложите связаться с администрацией
+"""
+
+PRICE_INSTRUCTIONS = """
+ВНИМАНИЕ: Вопрос касается стоимости. Указывайте ТОЛЬКО информацию с официального сайта без изменений.
+Если точных данных о стоимости нет в контексте, направляйте на официальный сайт для получения актуальной информации.
+"""
+
+CONTACT_INSTRUCTIONS = """
+ВНИМАНИЕ: Вопрос касается связи или контактов. Обязательно укажите контактный телефон лагеря.
+"""
+
+
+def _build_prompt_prefix(formatting_rules, additional_instructions):
+    """Собирает неизменяемую часть промпта"""
+    return f"""
+{formatting_rules}
+{additional_instructions}
+
+КОНТЕКСТНАЯ ИНФОРМАЦИЯ:
+"""
+
+
+# Маршрутизация поиска: вопросы с такими словами ищутся только в указанных разделах базы
+RETRIEVAL_ROUTES = [
+    (('закон', 'фз', 'кодекс', 'законодательств', 'нормативн', 'правов'), {'type': ['legal_document']}),
+]
+
+# Длина фрагмента базы знаний в ответе без GigaChat
+RETRIEVAL_ONLY_MAX_CHARS = 1500
+
+PROMPT_INSTRUCTIONS = {
+    'default': "",
+    'price': PRICE_INSTRUCTIONS,
+    'contact': CONTACT_INSTRUCTIONS
+}
+
+
 class TelegramBot:
-    def __init__(self, token, gigachat_client, database):
+    def __init__(self, token, gigachat_client, database, admission=None, admin_ids=None,
+                 context_assembler=None, faq_index=None, conversations=None, analytics=None,
+                 request_timeout=25.0, scheduler=None, refresher=None, subscribers=None, broadcaster=None,
+                 lifecycle=None, tenant=None):
         self.token = token
+        # ID лагеря, если один процесс обслуживает несколько лагерей
+        self.tenant = tenant
         self.gigachat = gigachat_client
         self.db = database
         self.application = None
         self.contact_phone = "+7 (4752) 55-70-09"  
         self.camp_website = "https://cosmos.68edu.ru"
+        self.contact_email = "kosmos@OBRAZ.TAMBOV.GOV.RU"
+        self.camp_name = "Космос"
+        self.camp_title = 'детского лагеря "Космос" в Тамбовской области'
+        self.admission = admission or AdmissionController()
+        self.admin_ids = set(admin_ids or [])
+        self.context_assembler = context_assembler or ContextAssembler()
+        self.faq_index = faq_index
+        self.conversations = conversations or ConversationStore()
+        self.analytics = analytics
+        self.request_timeout = request_timeout
+        self.scheduler = scheduler or LLMScheduler()
+        self.refresher = refresher
+        self.subscribers = subscribers
+        self.broadcaster = broadcaster
+        self.lifecycle = lifecycle or Lifecycle()
+        # Префиксы промпта с контактами лагеря: (контакты, {вид вопроса: префикс})
+        self._prompt_prefixes = None
+        if self.faq_index:
+            self.faq_index.bind_formatter(self._apply_answer_rules)
 
     def _format_response(self, response):
         """Форматирует ответ согласно правилам"""
@@ -79,58 +189,42 @@ class TelegramBot:
         question_lower = question.lower()
         return any(keyword in question_lower for keyword in price_keywords)
 
+    @property
+    def system_prompt(self):
+        return SYSTEM_PROMPT.format(camp_title=self.camp_title)
+
+    def prompt_prefixes(self):
+        """
+        Неизменяемые части промпта с контактами этого лагеря
+
+        Собираются один раз и пересобираются, только если контакты изменились
+        (update_bot_contacts вызывается после создания бота).
+        """
+        contacts = (self.contact_phone, self.camp_website, self.contact_email)
+        if self._prompt_prefixes is None or self._prompt_prefixes[0] != contacts:
+            formatting_rules = FORMATTING_RULES.format(
+                contact_phone=self.contact_phone,
+                camp_website=self.camp_website,
+                contact_email=self.contact_email or "адрес из раздела контактов сайта"
+            )
+            self._prompt_prefixes = (contacts, {
+                kind: _build_prompt_prefix(formatting_rules, instructions)
+                for kind, instructions in PROMPT_INSTRUCTIONS.items()
+            })
+        return self._prompt_prefixes[1]
+
     def _create_formatted_prompt(self, context, question):
         """Создает промпт с инструкциями по форматированию"""
-        
-        formatting_rules = """
-ПРИ ФОРМИРОВАНИИ ОТВЕТА СОБЛЮДАЙТЕ СЛЕДУЮЩИЕ ПРАВИЛА ФОРМАТИРОВАНИЯ:
-
-1. ССЫЛКИ: сайт пишется через пробел после двоеточия, следующего за непосредственным упоминанием ресурса.
-   Пример: Наш сайт: https://cosmos.68edu.ru
-
-2. EMAIL: адреса электронных почт указываются без кавычек.
-   Пример: Пишите нам на email: kosmos@OBRAZ.TAMBOV.GOV.RU
-
-3. ПЕРЕЧИСЛЕНИЯ: каждый пункт пишется с нового абзаца в формате:
-   1. "Заголовок пункта". Текст пункта начинается с нового предложения.
-   2. "Второй пункт". Описание второго пункта.
-
-4. ОБРАЩЕНИЯ: обращения "Вам", "Вы", "Ваш" всегда пишутся с заглавной буквы.
-   Пример: Для Вас необходимо предоставить следующие документы. Ваш ребенок будет находиться под присмотром.
-
-5. КОНТАКТНЫЙ ТЕЛЕФОН: при вопросах о связи с представителями лагеря, контакте с детьми или упоминании администрации обязательно указывайте контактный телефон в круглых скобках.
-   Пример: Для связи с администрацией лагеря (тел. +7 (4752) 55-70-09) Вы можете позвонить по указанному номеру.
-
-6. СТОИМОСТЬ: при вопросах о стоимости указывайте ИСКЛЮЧИТЕЛЬНО информацию с официального сайта без каких-либо преобразований. Если точной информации нет, направляйте на сайт.
-   Пример: Актуальную стоимость путевок Вы можете узнать на нашем сайте: https://cosmos.68edu.ru
-
-7. ОБЩИЕ ПРАВИЛА:
-   - Используйте четкую структуру
-   - Разделяйте абзацы пустыми строками
-   - Никогда не выделяйте слова или словосочетания двойными звёздочками
-   - Будьте вежливы и информативны
-   - Если информации недостаточно, предложите связаться с администрацией
-"""
-
+        prefixes = self.prompt_prefixes()
         # Добавляем специфические инструкции в зависимости от вопроса
-        additional_instructions = ""
-        
         if self._should_redirect_to_website(question):
-            additional_instructions = """
-ВНИМАНИЕ: Вопрос касается стоимости. Указывайте ТОЛЬКО информацию с официального сайта без изменений.
-Если точных данных о стоимости нет в контексте, направляйте на официальный сайт для получения актуальной информации.
-"""
+            prefix = prefixes['price']
         elif self._should_add_phone_contact(question, ""):
-            additional_instructions = """
-ВНИМАНИЕ: Вопрос касается связи или контактов. Обязательно укажите контактный телефон лагеря.
-"""
+            prefix = prefixes['contact']
+        else:
+            prefix = prefixes['default']
 
-        prompt = f"""
-{formatting_rules}
-{additional_instructions}
-
-КОНТЕКСТНАЯ ИНФОРМАЦИЯ:
-{context}
+        prompt = f"""{prefix}{context}
 
 ВОПРОС РОДИТЕЛЯ:
 {question}
@@ -141,7 +235,7 @@ class TelegramBot:
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         welcome_text = f"""
-👋 Привет! Я - умный помощник детского лагеря "Космос" в Тамбовской области.
+👋 Привет! Я - умный помощник {self.camp_title}.
 
 Я могу ответить на Ваши вопросы о:
 1. "Программы и смены". Информация о текущих и планируемых сменах.
@@ -155,8 +249,10 @@ class TelegramBot:
 
 Просто задайте Ваш вопрос, и я постараюсь помочь!
 
-🏕️ Лагерь "Космос" - место, где рождаются мечты!
+🏕️ Лагерь "{self.camp_name}" - место, где рождаются мечты!
 """
+        if self.subscribers:
+            await self.subscribers.add(update.message.chat_id)
         await update.message.reply_text(welcome_text)
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -181,18 +277,139 @@ class TelegramBot:
         user = update.message.from_user
         user_message = update.message.text
 
-        logger.info(f"Вопрос от {user.first_name} ({user.id}): {user_message}")
+        logger.info(f"Вопрос от {user.first_name} ({user.id}): {user_message[:200]}", extra={'sampled': True})
+
+        # Всех, кто писал боту, запоминаем для рассылки объявлений
+        if self.subscribers:
+            await self.subscribers.add(update.message.chat_id)
+
+        # Ограничение частоты вопросов от одного пользователя
+        if not self.admission.allow(user.id):
+            wait_seconds = math.ceil(self.admission.retry_after(user.id))
+            await update.message.reply_text(
+                f"Вы задаете вопросы слишком часто. Пожалуйста, подождите {wait_seconds} сек. и повторите Ваш вопрос."
+            )
+            return
+
         await update.message.chat.send_action(action="typing")
 
+        # Сведения о запросе для аналитики; если вопрос объединен с чужим, их заполнит не он
+        trace = {'source': 'coalesced', 'documents': [], 'stages': {}}
+        request_profiler.begin(trace)
+        started = time.perf_counter()
+        # Общий дедлайн на ответ: до него должны уложиться все повторы запросов к GigaChat
+        deadline = time.monotonic() + self.request_timeout
+        formatted_response = ""
+
         try:
-            # Используем текстовый поиск вместо эмбеддингов
-            similar_docs = self.db.search_similar_documents(user_message, k=3)
+            history = self.conversations.history(user.id)
+
+            # Одинаковые вопросы, которые уже обрабатываются, получают общий ответ.
+            # Ответ на вопрос с историей диалога зависит от нее, такие вопросы не объединяются
+            key = None if history else self.admission.normalize_question(user_message)
+            if key and self.tenant:
+                # Одинаковые вопросы родителей разных лагерей имеют разные ответы
+                key = f"{self.tenant}:{key}"
+            formatted_response = await self.admission.run(
+                key, lambda: self._answer_question(user_message, history, trace, deadline)
+            )
+
+            self.conversations.add_turn(user.id, user_message, formatted_response)
+            await update.message.reply_text(formatted_response)
+            logger.info(f"Ответ отправлен пользователю {user.first_name}", extra={'sampled': True})
+
+        except SchedulerBusy:
+            trace['source'] = 'busy'
+            await update.message.reply_text(
+                "Сейчас бот получает очень много вопросов. Пожалуйста, повторите Ваш вопрос через минуту."
+            )
+
+        except Exception as e:
+            trace['source'] = 'error'
+            logger.error(f"Ошибка обработки сообщения: {e}")
+            error_message = f"Извините, произошла ошибка. Попробуйте задать вопрос позже или свяжитесь с администрацией лагеря (тел. {self.contact_phone})."
+            await update.message.reply_text(error_message)
 
+        trace['stages']['total'] = round((time.perf_counter() - started) * 1000, 1)
+        if self.analytics:
+            documents = trace['documents']
+            # Без найденных документов ответ не считается ответом по ключевым словам
+            fallback = trace['source'] == 'llm' and bool(documents) and all(
+                doc.get('method') == 'keyword' for doc in documents
+            )
+            self.analytics.record(
+                user.id,
+                user_message,
+                trace['source'],
+                documents=documents,
+                fallback=fallback,
+                latency_ms=trace['stages'],
+                answer_length=len(formatted_response)
+            )
+
+    @staticmethod
+    @contextmanager
+    def _stage(trace, name, awaits=False):
+        """
+        Замеряет длительность этапа обработки вопроса в миллисекундах
+
+        У профилируемого вопроса синхронный этап сэмплируется в текущем потоке.
+        Этапы с await (awaits=True) в это время уступают поток другим вопросам,
+        поэтому их работа профилируется через request_profiler.bind.
+        """
+        started = time.perf_counter()
+        profiled = not awaits and request_profiler.enter(trace, name)
+        try:
+            yield
+        finally:
+            if profiled:
+                request_profiler.leave()
+            duration = (time.perf_counter() - started) * 1000
+            trace['stages'][name] = round(duration, 1)
+            metrics.observe(f'stage.{name}_ms', duration)
+
+    async def _answer_question(self, user_message, history=(), trace=None, deadline=None):
+        """
+        Готовит ответ на вопрос: поиск контекста, запрос к GigaChat и форматирование
+
+        Args:
+            user_message (str): Вопрос пользователя
+            history (list): Предыдущие реплики диалога (Turn)
+            trace (dict): Сюда записываются источник ответа, документы и время этапов
+            deadline (float): Момент time.monotonic(), к которому нужен ответ GigaChat
+        """
+        if trace is None:
+            trace = {'stages': {}}
+
+        # Частые вопросы из FAQ получают готовый ответ без обращения к GigaChat
+        if self.faq_index:
+            with self._stage(trace, 'faq'):
+                answer = self.faq_index.lookup(user_message)
+            if answer:
+                trace['source'] = 'faq'
+                return answer
+
+        trace['source'] = 'llm'
+
+        # Уточняющие вопросы ищем вместе с предыдущим вопросом
+        search_query = self.conversations.retrieval_query(history, user_message)
+
+        # Используем текстовый поиск вместо эмбеддингов
+        with self._stage(trace, 'retrieval', awaits=True):
+            doc_filters = self._retrieval_filters(user_message)
+            search = request_profiler.bind(self.db.search_similar_documents, trace, 'retrieval')
+            similar_docs = await asyncio.to_thread(search, search_query, 3, doc_filters)
+            if not similar_docs and doc_filters:
+                # В выбранных разделах ничего нет - ищем по всей базе
+                similar_docs = await asyncio.to_thread(search, search_query, 3)
+        trace['documents'] = similar_docs
+
+        with self._stage(trace, 'prompt'):
+            # Контекст ужимается до бюджета токенов без повторяющихся фрагментов
             context = ""
             if similar_docs:
-                for doc in similar_docs:
-                    context += f"{doc['content']}\n\n"
-            else:
+                context = self.context_assembler.assemble(similar_docs, user_message)
+            if not context:
                 context = "Информация по запросу не найдена в базе знаний."
 
             # Создаем промпт с правилами форматирования
@@ -201,55 +418,246 @@ class TelegramBot:
             messages = [
                 {
                     "role": "system",
-                    "content": """Ты - полезный AI-помощник детского лагеря "Космос" в Тамбовской области. 
-Отвечай на вопросы родителей вежливо и информативно. Основывай ответ на предоставленном контексте.
-Строго соблюдай все правила форматирования из инструкции."""
+                    "content": self.system_prompt
                 },
+                *self.conversations.history_messages(history),
                 {
                     "role": "user",
                     "content": prompt
                 }
             ]
 
-            response = self.gigachat.chat_completion(messages)
-
-            # Дополнительное форматирование ответа
-            formatted_response = self._format_response(response)
+        prompt_chars = sum(len(message['content']) for message in messages)
+        metrics.observe('prompt.chars', prompt_chars)
+        metrics.observe('prompt.tokens', int(prompt_chars / self.context_assembler.chars_per_token) + 1)
 
-            # Правило 5: Добавляем телефон при необходимости
-            if self._should_add_phone_contact(user_message, formatted_response):
-                if f"тел. {self.contact_phone}" not in formatted_response and self.contact_phone not in formatted_response:
-                    formatted_response += f"\n\nДля уточнения информации Вы можете связаться с администрацией лагеря (тел. {self.contact_phone})."
-
-            # Правило 6: Для вопросов о стоимости добавляем ссылку на сайт
-            if self._should_redirect_to_website(user_message):
-                if self.camp_website not in formatted_response:
-                    formatted_response += f"\n\nАктуальную информацию о стоимости Вы можете найти на нашем сайте: {self.camp_website}"
-
-            # Стандартное предложение о связи, если его нет
-            if not any(word in formatted_response.lower() for word in ['свяжитесь', 'администрац', 'тел.', 'телефон']):
-                formatted_response += f"\n\nДля уточнения деталей свяжитесь с администрацией лагеря (тел. {self.contact_phone})."
-
-            await update.message.reply_text(formatted_response)
-            logger.info(f"Ответ отправлен пользователю {user.first_name}")
-
-        except Exception as e:
-            logger.error(f"Ошибка обработки сообщения: {e}")
-            error_message = f"Извините, произошла ошибка. Попробуйте задать вопрос позже или свяжитесь с администрацией лагеря (тел. {self.contact_phone})."
-            await update.message.reply_text(error_message)
+        try:
+            with self._stage(trace, 'llm', awaits=True):
+                response = await self.scheduler.submit(
+                    request_profiler.bind(
+                        partial(self.gigachat.chat_completion, messages, deadline=deadline), trace, 'llm'
+                    ),
+                    priority=self._llm_priority(user_message, history),
+                    deadline=deadline
+                )
+        except GigaChatUnavailable as e:
+            # GigaChat не ответил вовремя: отвечаем найденным фрагментом базы знаний
+            logger.warning(f"⚠️ Ответ без GigaChat: {e}")
+            metrics.incr('answers.retrieval_only')
+            trace['source'] = 'retrieval_only'
+            return self._retrieval_only_answer(user_message, similar_docs)
+
+        with self._stage(trace, 'formatting'):
+            return self._apply_answer_rules(user_message, response)
+
+    @staticmethod
+    def _retrieval_filters(question):
+        """Разделы базы знаний, в которых искать ответ, или None для всей базы"""
+        question_lower = question.lower()
+        for keywords, doc_filters in RETRIEVAL_ROUTES:
+            if any(keyword in question_lower for keyword in keywords):
+                metrics.incr('retrieval.routed')
+                return doc_filters
+        return None
+
+    def _llm_priority(self, question, history):
+        """Класс приоритета запроса к GigaChat: новые вопросы раньше повторов"""
+        if not history:
+            return PRIORITY_FIRST
+        normalized = self.admission.normalize_question(question)
+        if any(self.admission.normalize_question(turn.question) == normalized for turn in history):
+            return PRIORITY_REPEAT
+        return PRIORITY_FOLLOW_UP
+
+    def _retrieval_only_answer(self, question, documents):
+        """Ответ из найденных документов, когда GigaChat недоступен"""
+        if not documents:
+            return (
+                "Извините, сейчас я не могу подготовить ответ. Пожалуйста, повторите вопрос позже "
+                f"или свяжитесь с администрацией лагеря (тел. {self.contact_phone})."
+            )
+
+        best = documents[0]
+        passage = self.context_assembler.assemble([best], question) or best['content']
+        if len(passage) > RETRIEVAL_ONLY_MAX_CHARS:
+            passage = passage[:RETRIEVAL_ONLY_MAX_CHARS].rsplit(' ', 1)[0] + '…'
+        answer = f"По Вашему вопросу в базе знаний лагеря нашлось следующее:\n\n{passage}"
+        if best.get('source', '').startswith('http'):
+            answer += f"\n\nПодробнее: {best['source']}"
+        return self._apply_answer_rules(question, answer)
+
+    def _apply_answer_rules(self, question, response):
+        """Приводит ответ к правилам оформления и добавляет контакты"""
+        # Дополнительное форматирование ответа
+        formatted_response = self._format_response(response)
+
+        # Правило 5: Добавляем телефон при необходимости
+        if self._should_add_phone_contact(question, formatted_response):
+            if f"тел. {self.contact_phone}" not in formatted_response and self.contact_phone not in formatted_response:
+                formatted_response += f"\n\nДля уточнения информации Вы можете связаться с администрацией лагеря (тел. {self.contact_phone})."
+
+        # Правило 6: Для вопросов о стоимости добавляем ссылку на сайт
+        if self._should_redirect_to_website(question):
+            if self.camp_website not in formatted_response:
+                formatted_response += f"\n\nАктуальную информацию о стоимости Вы можете найти на нашем сайте: {self.camp_website}"
+
+        # Стандартное предложение о связи, если его нет
+        if not any(word in formatted_response.lower() for word in ['свяжитесь', 'администрац', 'тел.', 'телефон']):
+            formatted_response += f"\n\nДля уточнения деталей свяжитесь с администрацией лагеря (тел. {self.contact_phone})."
+
+        return formatted_response
+
+    def _is_admin(self, update: Update):
+        return update.message.from_user.id in self.admin_ids
+
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Служебная команда: текущие метрики бота (только для администраторов)"""
+        if not self._is_admin(update):
+            return
+        await update.message.reply_text(
+            f"{metrics.format_report()}\n\nЗапуск:\n{startup_profiler.report()}"
+        )
+
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Служебная команда профилирования (только для администраторов)
+
+        /profile on [процент] - профилировать долю вопросов (по умолчанию все)
+        /profile off - выключить и сохранить профили
+        /profile dump - сохранить профили и прислать all.folded
+        /profile - состояние и сводка по этапам
+        """
+        if not self._is_admin(update):
+            return
+
+        action = context.args[0].lower() if context.args else ''
+        if action == 'on':
+            try:
+                percent = float(context.args[1]) if len(context.args) > 1 else request_profiler.toggle_percent
+            except ValueError:
+                await update.message.reply_text("Использование: /profile on [процент]")
+                return
+            await asyncio.to_thread(request_profiler.set_sample_percent, percent)
+            await update.message.reply_text(f"Профилирование включено для {request_profiler.sample_percent:g}% вопросов")
+            return
+
+        if action in ('off', 'dump'):
+            report = request_profiler.report()
+            # Остановка потока профилировщика и запись файлов - вне цикла событий
+            if action == 'off':
+                await asyncio.to_thread(request_profiler.set_sample_percent, 0)
+            paths = await asyncio.to_thread(request_profiler.dump)
+            await update.message.reply_text(report)
+            if paths:
+                data = await asyncio.to_thread(Path(paths[-1]).read_bytes)
+                await update.message.reply_document(data, filename='all.folded')
+            return
+
+        state = f"включено, {request_profiler.sample_percent:g}%" if request_profiler.enabled else "выключено"
+        await update.message.reply_text(f"Профилирование {state}\n\n{request_profiler.report()}")
+
+    async def broadcast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Служебная команда рассылки (только для администраторов)
+
+        /broadcast <текст> - разослать объявление всем, кто писал боту
+        /broadcast status - прогресс последних рассылок
+        /broadcast cancel - отменить текущую и ожидающие рассылки
+        """
+        if not self._is_admin(update) or not self.broadcaster:
+            return
+
+        from bot.broadcast import MAX_MESSAGE_LENGTH
+
+        # Текст берем целиком, чтобы сохранить переносы строк
+        text = update.message.text.partition(' ')[2].strip()
+        if not text or text == 'status':
+            rows = await self.broadcaster.status()
+            lines = [
+                f"#{row['id']} {row['status']}: отправлено {row['sent']}, ошибок {row['failed']}"
+                for row in rows
+            ]
+            await update.message.reply_text(
+                f"Подписчиков: {len(self.subscribers)}\n" + ("\n".join(lines) or "Рассылок еще не было")
+            )
+            return
+
+        if text == 'cancel':
+            cancelled = await self.broadcaster.cancel()
+            await update.message.reply_text(f"Отменено рассылок: {cancelled}")
+            return
+
+        if len(text) > MAX_MESSAGE_LENGTH:
+            await update.message.reply_text(f"Текст длиннее {MAX_MESSAGE_LENGTH} символов")
+            return
+
+        broadcast_id = await self.broadcaster.create(text, created_by=update.message.from_user.id)
+        await update.message.reply_text(
+            f"Рассылка #{broadcast_id} поставлена в очередь для {len(self.subscribers)} подписчиков"
+        )
+
+    def start_background(self, bot):
+        """Запускает фоновые задачи лагеря: индекс FAQ, обновление базы знаний и рассылки"""
+        if self.faq_index:
+            self.faq_index.start()
+        if self.refresher:
+            self.refresher.start()
+        if self.broadcaster:
+            self.broadcaster.start(bot)
+
+    async def _post_init(self, application):
+        """Вызывается, когда бот готов принимать обновления"""
+        startup_profiler.mark_ready()
+        request_profiler.install_signal_handler(asyncio.get_running_loop())
+        self.lifecycle.install(application)
+        self.start_background(application.bot)
+
+    async def _post_stop(self, application):
+        """Вызывается после остановки получения обновлений: дожидаемся ответов и сохраняем состояние"""
+        await self.lifecycle.drain()
+        await self.lifecycle.run_hooks()
 
     def setup_handlers(self):
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
-        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        self.application.add_handler(CommandHandler("stats", self.stats_command))
+        self.application.add_handler(CommandHandler("profile", self.profile_command))
+        self.application.add_handler(CommandHandler("broadcast", self.broadcast_command))
+        self.application.add_handler(MessageHandler(
+            filters.TEXT & ~filters.COMMAND,
+            self.lifecycle.tracked(
+                self.handle_message,
+                cancelled_reply="Бот перезапускается. Пожалуйста, повторите Ваш вопрос через минуту."
+            )
+        ))
+
+    def build_application(self, standalone=True):
+        """
+        Создает приложение Telegram с обработчиками этого бота
+
+        Args:
+            standalone (bool): Бот запускается сам через run(). Если несколько
+                ботов работают в одном процессе, запуском и остановкой
+                управляет bot.tenants.run_tenants
+        """
+        # Обновления обрабатываются параллельно, общий предел задает AdmissionController
+        builder = Application.builder().token(self.token).concurrent_updates(True)
+        if standalone:
+            builder = builder.post_init(self._post_init).post_stop(self._post_stop)
+        self.application = builder.build()
+        self.setup_handlers()
+        return self.application
 
     def run(self):
         try:
-            self.application = Application.builder().token(self.token).build()
-            self.setup_handlers()
+            self.build_application()
 
             logger.info("Бот запущен...")
-            self.application.run_polling()
+            # Сигналы остановки перехватывает Lifecycle, чтобы дождаться обрабатываемых сообщений
+            if self.lifecycle.handles_signals:
+                self.application.run_polling(stop_signals=None)
+            else:
+                self.application.run_polling()
 
         except Exception as e:
             logger.error(f"Ошибка запуска бота: {e}")
\ No newline at end of file
@@ -0,0 +1,209 @@
+# app/bot/tenants.py
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+
+from metrics import metrics
+from profiling import request_profiler
+from startup import startup_profiler
+
+logger = logging.getLogger(__name__)
+
+CREATE_CHAT_TENANTS_TABLE = """
+CREATE TABLE IF NOT EXISTS chat_tenants (
+    chat_id BIGINT PRIMARY KEY,
+    tenant VARCHAR(32) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)
+"""
+
+
+class ChatRouter:
+    """
+    Выбор лагеря по чату для бота, который обслуживает несколько лагерей
+
+    Чаты из chat_ids лагеря (например, группы родителей смены) всегда
+    относятся к нему. Остальные чаты выбирают лагерь командой /camp; выбор
+    хранится в таблице chat_tenants и в памяти, поэтому определение лагеря
+    на каждом сообщении не обращается к базе. Пока лагерь не выбран,
+    используется лагерь с "default": true, если он есть.
+    """
+
+    def __init__(self, database, tenant_ids, static_routes=None, default=None):
+        """
+        Args:
+            database: Экземпляр MySQLTextDB (общий пул соединений)
+            tenant_ids: ID лагерей этого бота
+            static_routes (dict): chat_id -> лагерь из конфигурации
+            default (str): Лагерь для чатов, которые его еще не выбрали
+        """
+        self.database = database
+        self.tenant_ids = list(tenant_ids)
+        self.static_routes = dict(static_routes or {})
+        self.default = default
+        self._chosen = {}
+
+    def load(self):
+        """Создает таблицу и загружает выбор лагерей чатами"""
+        self.database.execute(CREATE_CHAT_TENANTS_TABLE)
+        rows = self.database.fetch_all("SELECT chat_id, tenant FROM chat_tenants")
+        self._chosen = {row['chat_id']: row['tenant'] for row in rows if row['tenant'] in self.tenant_ids}
+        logger.info(f"🧭 Чатов с выбранным лагерем: {len(self._chosen)}")
+
+    def resolve(self, chat_id):
+        """Лагерь чата или None, если его нужно выбрать"""
+        return self.static_routes.get(chat_id) or self._chosen.get(chat_id) or self.default
+
+    def is_fixed(self, chat_id):
+        """Лагерь чата задан в конфигурации и не меняется командой /camp"""
+        return chat_id in self.static_routes
+
+    async def choose(self, chat_id, tenant):
+        """Запоминает выбранный чатом лагерь"""
+        self._chosen[chat_id] = tenant
+        await asyncio.to_thread(
+            self.database.execute,
+            "INSERT INTO chat_tenants (chat_id, tenant) VALUES (%s, %s) ON DUPLICATE KEY UPDATE tenant = %s",
+            (chat_id, tenant, tenant)
+        )
+        metrics.incr('tenants.chosen')
+
+
+class TenantDispatcher:
+    """
+    Один бот Telegram для нескольких лагерей
+
+    Обновления передаются TelegramBot лагеря, выбранного для чата через
+    ChatRouter. Пока лагерь не выбран, бот предлагает выбрать его командой /camp.
+    """
+
+    def __init__(self, token, bots, router, lifecycle):
+        """
+        Args:
+            token (str): Токен бота Telegram
+            bots (dict): ID лагеря -> TelegramBot
+            router (ChatRouter): Выбор лагеря по чату
+            lifecycle (Lifecycle): Общий менеджер остановки
+        """
+        self.token = token
+        self.bots = bots
+        self.router = router
+        self.lifecycle = lifecycle
+        self.application = None
+
+    def _camp_list(self):
+        return "\n".join(f"/camp {tenant} - лагерь \"{bot.camp_name}\"" for tenant, bot in self.bots.items())
+
+    async def _ask_camp(self, update):
+        await update.message.reply_text(
+            f"Выберите лагерь, о котором хотите узнать:\n\n{self._camp_list()}"
+        )
+
+    def _route(self, name):
+        """Обработчик, который передает обновление боту лагеря этого чата"""
+        async def handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            bot = self.bots.get(self.router.resolve(update.effective_chat.id))
+            if bot is None:
+                await self._ask_camp(update)
+                return
+            await getattr(bot, name)(update, context)
+
+        handler.__name__ = name
+        return handler
+
+    async def camp_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Выбор лагеря
+
+        /camp - текущий лагерь и список лагерей
+        /camp <id> - выбрать лагерь
+        """
+        chat_id = update.effective_chat.id
+        tenant = context.args[0].lower() if context.args else None
+        if tenant is None or self.router.is_fixed(chat_id):
+            current = self.bots.get(self.router.resolve(chat_id))
+            text = f"Текущий лагерь: \"{current.camp_name}\"" if current else "Лагерь еще не выбран"
+            if not self.router.is_fixed(chat_id):
+                text += f"\n\n{self._camp_list()}"
+            await update.message.reply_text(text)
+            return
+
+        bot = self.bots.get(tenant)
+        if bot is None:
+            await update.message.reply_text(f"Такого лагеря нет. Доступные лагеря:\n\n{self._camp_list()}")
+            return
+
+        await self.router.choose(chat_id, tenant)
+        await bot.start_command(update, context)
+
+    def build_application(self):
+        """Создает приложение Telegram с обработчиками, выбирающими лагерь по чату"""
+        self.application = Application.builder().token(self.token).concurrent_updates(True).build()
+        for bot in self.bots.values():
+            bot.application = self.application
+
+        self.application.add_handler(CommandHandler("camp", self.camp_command))
+        for command in ("start", "help", "stats", "profile", "broadcast"):
+            self.application.add_handler(CommandHandler(command, self._route(f"{command}_command")))
+        self.application.add_handler(MessageHandler(
+            filters.TEXT & ~filters.COMMAND,
+            self.lifecycle.tracked(
+                self._route("handle_message"),
+                cancelled_reply="Бот перезапускается. Пожалуйста, повторите Ваш вопрос через минуту."
+            )
+        ))
+        return self.application
+
+
+def run_tenants(groups, lifecycle):
+    """
+    Запускает несколько ботов Telegram в одном цикле событий
+
+    Повторяет последовательность Application.run_polling для каждого
+    приложения: пулы MySQL, клиент GigaChat, очередь запросов и индексы
+    остаются общими для всех ботов процесса.
+
+    Args:
+        groups (list): Пары (Application, боты лагерей этого приложения)
+        lifecycle (Lifecycle): Общий менеджер остановки
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    applications = [application for application, _ in groups]
+
+    async def start():
+        for application, bots in groups:
+            await application.initialize()
+            await application.updater.start_polling()
+            await application.start()
+            for bot in bots:
+                bot.start_background(application.bot)
+        startup_profiler.mark_ready()
+        request_profiler.install_signal_handler(asyncio.get_running_loop())
+        lifecycle.install(*applications)
+        logger.info(f"Боты запущены: {len(applications)}, лагерей: {sum(len(bots) for _, bots in groups)}")
+
+    async def stop():
+        for application in applications:
+            if application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+        # Дожидаемся ответов и сохраняем состояние всех лагерей
+        await lifecycle.drain()
+        await lifecycle.run_hooks()
+        for application in applications:
+            await application.shutdown()
+
+    try:
+        loop.run_until_complete(start())
+        loop.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Остановка ботов...")
+    finally:
+        try:
+            loop.run_until_complete(stop())
+        finally:
+            loop.close()
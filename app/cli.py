@@ -0,0 +1,411 @@
+# app/cli.py
+"""
+Командная строка администратора базы знаний
+
+Работает с той же конфигурацией, что и бот, но без запуска Telegram:
+
+    python cli.py crawl                  # парсинг сайта в снимок корпуса
+    python cli.py ingest                 # загрузка снимка (или парсинг) в MySQL
+    python cli.py reindex                # переобучение индекса по таблице documents
+    python cli.py search "вопрос" -k 5   # поиск с замером времени
+    python cli.py bench --repeat 20      # задержки поиска по набору вопросов
+    python cli.py stats                  # документы, память индекса, кэши, аналитика
+    python cli.py warm-cache             # прогрев файлов индекса, частые запросы для прогрева бота
+
+Если в конфигурации описано несколько лагерей (секция "tenants"), лагерь
+выбирается параметром --tenant: python cli.py --tenant kosmos ingest.
+Без --tenant используется лагерь с "default": true, а если его нет,
+команда завершается с кодом 2.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from logging_config import setup_logging, stop_logging
+from processing.data_parser import crawl_documents
+from settings import load_config
+from tenants import tenant_config, tenant_configs, tenant_dir
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_PATH = 'corpus_snapshot.jsonl.gz'
+DEFAULT_WARM_STATE_PATH = 'warm_queries.json'
+
+
+def _open_database(config, lazy_index=False):
+    from database.mysql_db import MySQLTextDB
+
+    return MySQLTextDB(
+        config['mysql_config'], lazy_index=lazy_index, retrieval_options=config.get('retrieval'),
+        tenant=config.get('tenant')
+    )
+
+
+def _snapshot_path(args, config):
+    return args.snapshot or config.get('snapshot_file', DEFAULT_SNAPSHOT_PATH)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"нужно целое число не меньше 1, получено {value}")
+    return number
+
+
+def _print_timings(title, timings_ms):
+    if not timings_ms:
+        print(f"{title:<12} n=0     нет замеров")
+        return
+    print(
+        f"{title:<12} n={len(timings_ms):<5} mean={sum(timings_ms) / len(timings_ms):8.2f} ms  "
+        f"p50={_percentile(timings_ms, 50):8.2f} ms  p95={_percentile(timings_ms, 95):8.2f} ms  "
+        f"max={max(timings_ms):8.2f} ms"
+    )
+
+
+def _bench_questions(args, config):
+    """Вопросы для замеров: из файла (по одному в строке) или из FAQ"""
+    if getattr(args, 'queries', None):
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+    from processing.data_parser import load_faq_entries
+
+    return [item['question'] for item in load_faq_entries(config.get('faq_file'), builtin=not config.get('tenant'))]
+
+
+def cmd_crawl(args, config):
+    """Парсит сайт и сохраняет снимок корпуса, не трогая базу"""
+    from processing.snapshot import write_snapshot
+
+    started = time.perf_counter()
+    documents = crawl_documents(
+        config['camp_url'], config.get('faq_file'), config.get('dedup'), builtin_faq=not config.get('tenant')
+    )
+    if not documents:
+        print("Не удалось получить ни одного документа")
+        return 1
+    count = write_snapshot(documents, _snapshot_path(args, config), source=config['camp_url'])
+    print(f"Сохранено документов: {count} за {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+def cmd_ingest(args, config):
+    """Загружает снимок корпуса в MySQL (или парсит сайт, если снимка нет) и строит индекс"""
+    database = _open_database(config, lazy_index=True)
+    try:
+        path = _snapshot_path(args, config)
+        started = time.perf_counter()
+        if os.path.exists(path) and not args.crawl:
+            from processing.snapshot import restore
+
+            count = restore(database, path)
+        else:
+            documents = crawl_documents(
+                config['camp_url'], config.get('faq_file'), config.get('dedup'),
+                builtin_faq=not config.get('tenant')
+            )
+            if args.snapshot or config.get('snapshot_file'):
+                from processing.snapshot import write_snapshot
+
+                write_snapshot(documents, path, source=config['camp_url'])
+            count = database.store_documents(documents)
+        print(f"Загружено документов: {count} за {time.perf_counter() - started:.1f} с")
+        return 0
+    finally:
+        database.close()
+
+
+def cmd_reindex(args, config):
+    """Переобучает TF-IDF и плотный индекс по текущей таблице documents"""
+    database = _open_database(config, lazy_index=True)
+    try:
+        started = time.perf_counter()
+        count = database.reindex()
+        print(f"Проиндексировано документов: {count} за {time.perf_counter() - started:.1f} с")
+        return 0
+    finally:
+        database.close()
+
+
+def cmd_search(args, config):
+    """Ищет документы по запросу и печатает время первого и повторных поисков"""
+    database = _open_database(config)
+    try:
+        filters = {'type': args.type} if args.type else None
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            documents = database.search_similar_documents(args.query, args.k, filters)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        for rank, doc in enumerate(documents, 1):
+            preview = ' '.join(doc['content'].split())[:args.preview]
+            print(f"{rank}. [{doc['similarity']:.3f} {doc['method']}] {doc['type']} {doc['source']}\n   {preview}")
+
+        print(f"\nпервый поиск: {timings[0]:.2f} мс")
+        if len(timings) > 1:
+            _print_timings("повторные", timings[1:])
+        return 0
+    finally:
+        database.close()
+
+
+def cmd_bench(args, config):
+    """Замеряет задержки поиска без кэша и с кэшем, по желанию - запрос к GigaChat"""
+    questions = _bench_questions(args, config)
+    if not questions:
+        print("Нет вопросов для замера: укажите --queries")
+        return 1
+    database = _open_database(config)
+    try:
+        cold = []
+        warm = []
+        for _ in range(args.repeat):
+            for question in questions:
+                database.result_cache.clear()
+                database.query_vector_cache.clear()
+                started = time.perf_counter()
+                database.search_similar_documents(question, args.k)
+                cold.append((time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                database.search_similar_documents(question, args.k)
+                warm.append((time.perf_counter() - started) * 1000)
+
+        print(f"Вопросов: {len(questions)}, повторов: {args.repeat}, режим: {database.retrieval_mode}")
+        _print_timings("без кэша", cold)
+        _print_timings("с кэшем", warm)
+
+        if args.llm:
+            from gigachat.api_client import GigaChatClient
+
+            client = GigaChatClient(config['gigachat_api_key'])
+            started = time.perf_counter()
+            client.request_completion([{"role": "user", "content": questions[0]}], max_tokens=256)
+            print(f"GigaChat: {(time.perf_counter() - started) * 1000:.0f} мс")
+        return 0
+    finally:
+        database.close()
+
+
+def cmd_stats(args, config):
+    """Печатает состояние базы, индекса, кэшей и аналитики"""
+    from database.compact_index import format_report, memory_report
+    from processing.snapshot import read_header
+
+    database = _open_database(config)
+    try:
+        snapshot = database.snapshot
+        print(f"Документов в MySQL: {database.get_document_count()}")
+        print(f"Документов в индексе: {len(snapshot.document_ids)} (версия {snapshot.version})")
+        print("Разделы: " + ", ".join(
+            f"{doc_type}={len(rows)}" for doc_type, (rows, _) in sorted(snapshot.partitions.items())
+        ))
+
+        header = read_header(_snapshot_path(args, config))
+        if header:
+            print(f"Снимок корпуса: {_snapshot_path(args, config)} от {header.get('created_at')}")
+
+        print("\nПамять индекса:")
+        print(format_report(memory_report(snapshot)))
+
+        try:
+            rows = database.fetch_all(
+                f"SELECT answer_source, COUNT(*) AS questions FROM {database.table_name('questions')} "
+                "WHERE created_at > NOW() - INTERVAL 1 DAY GROUP BY answer_source",
+                replica=True
+            )
+            print("\nВопросы за сутки:")
+            for row in rows:
+                print(f"{row['answer_source'] or '-':<16}{row['questions']:>8}")
+        except Exception as e:
+            print(f"\nАналитика недоступна: {e}")
+        return 0
+    finally:
+        database.close()
+
+
+def cmd_warm_cache(args, config):
+    """
+    Прогревает кэш страниц ОС файлами индекса и готовит частые запросы для бота
+
+    Кэши поиска бота живут в его процессе, поэтому отсюда их заполнить нельзя.
+    Частые вопросы из аналитики записываются в файл запросов прогрева
+    (shutdown.warm_state_file), который бот выполняет после загрузки индекса
+    (warm_up); запросы, сохраненные ботом при остановке, остаются в файле после них.
+    Работающий бот перезапишет файл при остановке, поэтому команду выполняют
+    перед запуском бота.
+    """
+    from database.dense_index import DENSE_INDEX_DIR, DenseIndex
+
+    directory = tenant_dir(config.get('tenant'))
+    dense_dir = DenseIndex.current_path(os.path.join(directory, DENSE_INDEX_DIR))
+    paths = [os.path.join(directory, name) for name in ('tfidf_model.pkl', 'tfidf_matrix.pkl', 'document_ids.pkl')]
+    if dense_dir:
+        paths += [os.path.join(dense_dir, name) for name in sorted(os.listdir(dense_dir))]
+
+    warmed = 0
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    break
+                warmed += len(chunk)
+    print(f"Прочитано файлов индекса: {warmed / (1 << 20):.1f} МиБ")
+
+    database = _open_database(config)
+    try:
+        questions = []
+        try:
+            rows = database.fetch_all(
+                f"SELECT question, COUNT(*) AS asked FROM {database.table_name('questions')} "
+                "GROUP BY question ORDER BY asked DESC LIMIT %s", (args.top,), replica=True
+            )
+            questions = [row['question'] for row in rows]
+        except Exception as e:
+            logger.warning(f"⚠️ Частые вопросы из аналитики недоступны: {e}")
+        questions = questions or _bench_questions(args, config)
+
+        from bot.telegram_bot import TelegramBot
+
+        # Те же k и разделы, что и при ответе бота, иначе прогретые записи кэша не совпадут
+        queries = [
+            {'query': question, 'k': 3, 'filters': TelegramBot._retrieval_filters(question)}
+            for question in questions
+        ]
+        timings = []
+        for item in queries:
+            started = time.perf_counter()
+            database.search_similar_documents(item['query'], item['k'], item['filters'])
+            timings.append((time.perf_counter() - started) * 1000)
+        _print_timings("запросы", timings)
+
+        if config.get('tenant'):
+            print("Индексы лагерей из секции tenants загружаются по первому вопросу и не прогреваются")
+            return 0
+        warm_state_path = config.get('shutdown', {}).get('warm_state_file', DEFAULT_WARM_STATE_PATH)
+        print(f"Запросов для прогрева бота: {_write_warm_queries(warm_state_path, queries)} ({warm_state_path})")
+        return 0
+    finally:
+        database.close()
+
+
+def _write_warm_queries(path, queries):
+    """
+    Записывает запросы в файл прогрева бота перед сохраненными ботом
+
+    Returns:
+        int: Число запросов в файле
+    """
+    saved = []
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось прочитать {path}: {e}")
+
+    # warm_up выполняет файл с конца, поэтому частые вопросы в начале попадут в кэш последними
+    seen = set()
+    merged = []
+    for item in queries + saved:
+        key = (item['query'], item['k'], json.dumps(item.get('filters'), sort_keys=True))
+        if key not in seen:
+            seen.add(key)
+            merged.append(item)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return len(merged)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Администрирование базы знаний лагеря 'Космос'")
+    parser.add_argument('--config', default='config.json', help="Путь к файлу конфигурации")
+    parser.add_argument('--snapshot', help="Путь к снимку корпуса (по умолчанию snapshot_file из конфигурации)")
+    parser.add_argument('--tenant', help="ID лагеря из секции tenants конфигурации")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('crawl', help=cmd_crawl.__doc__).set_defaults(handler=cmd_crawl)
+
+    ingest = subparsers.add_parser('ingest', help=cmd_ingest.__doc__)
+    ingest.add_argument('--crawl', action='store_true', help="Парсить сайт, даже если снимок есть")
+    ingest.set_defaults(handler=cmd_ingest)
+
+    subparsers.add_parser('reindex', help=cmd_reindex.__doc__).set_defaults(handler=cmd_reindex)
+
+    search = subparsers.add_parser('search', help=cmd_search.__doc__)
+    search.add_argument('query')
+    search.add_argument('-k', type=int, default=3)
+    search.add_argument('--type', action='append', help="Искать только в документах этого типа")
+    search.add_argument('--repeat', type=_positive_int, default=5)
+    search.add_argument('--preview', type=int, default=200)
+    search.set_defaults(handler=cmd_search)
+
+    bench = subparsers.add_parser('bench', help=cmd_bench.__doc__)
+    bench.add_argument('--queries', help="Файл с вопросами, по одному в строке (по умолчанию вопросы FAQ)")
+    bench.add_argument('--repeat', type=_positive_int, default=10)
+    bench.add_argument('-k', type=int, default=3)
+    bench.add_argument('--llm', action='store_true', help="Также замерить один запрос к GigaChat")
+    bench.set_defaults(handler=cmd_bench)
+
+    subparsers.add_parser('stats', help=cmd_stats.__doc__).set_defaults(handler=cmd_stats)
+
+    warm = subparsers.add_parser('warm-cache', help="Прогревает файлы индекса и готовит частые запросы для бота")
+    warm.add_argument('--top', type=int, default=50, help="Сколько частых вопросов из аналитики взять")
+    warm.add_argument('--queries', help="Файл с вопросами, если аналитики нет")
+    warm.set_defaults(handler=cmd_warm_cache)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Параметры логирования по умолчанию до загрузки конфигурации
+    setup_logging()
+    try:
+        config = load_config(args.config)
+        if 'logging' in config:
+            setup_logging(config['logging'])
+        try:
+            if args.tenant:
+                config = tenant_config(config, args.tenant)
+            else:
+                camps = tenant_configs(config)
+                if camps:
+                    config = _default_camp(camps)
+        except ValueError as e:
+            print(e)
+            return 2
+        return args.handler(args, config)
+    finally:
+        stop_logging()
+
+
+def _default_camp(camps):
+    """Лагерь с "default": true для команд без --tenant"""
+    for camp_config in camps:
+        if camp_config.get('default'):
+            return camp_config
+    raise ValueError(
+        "В конфигурации несколько лагерей: укажите --tenant "
+        f"({', '.join(camp_config['tenant'] for camp_config in camps)})"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+# app/database/analytics.py
+import json
+import logging
+import queue
+import threading
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CREATE_QUESTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    user_id BIGINT,
+    question TEXT NOT NULL,
+    answer_source VARCHAR(20),
+    doc_ids JSON,
+    similarities JSON,
+    fallback BOOLEAN DEFAULT FALSE,
+    latency_ms JSON,
+    answer_length INT,
+    INDEX idx_created_at (created_at),
+    INDEX idx_answer_source (answer_source)
+)
+"""
+
+INSERT_QUESTION = """
+INSERT INTO {table}
+    (user_id, question, answer_source, doc_ids, similarities, fallback, latency_ms, answer_length)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+class AnalyticsWriter:
+    """
+    Асинхронная запись статистики вопросов в таблицу questions
+
+    Обработчик сообщений только кладет запись в очередь в памяти.
+    Фоновый поток забирает записи пачками и вставляет их одним executemany
+    через пул соединений базы. Если очередь переполнена, новые записи
+    отбрасываются, чтобы аналитика никогда не тормозила ответы.
+    """
+
+    def __init__(self, database, batch_size=100, flush_interval=5.0, max_queue=10000):
+        self.database = database
+        # У каждого лагеря своя таблица questions
+        self.table = database.table_name('questions')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, database, options):
+        """Создает writer из секции "analytics" конфигурации"""
+        options = options or {}
+        return cls(
+            database,
+            batch_size=options.get('batch_size', 100),
+            flush_interval=options.get('flush_interval', 5.0),
+            max_queue=options.get('max_queue', 10000)
+        )
+
+    def start(self):
+        """Создает таблицу и запускает фоновый поток записи"""
+        try:
+            self.database.execute(CREATE_QUESTIONS_TABLE.format(table=self.table))
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось создать таблицу {self.table}: {e}")
+        self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+        self._thread.start()
+        logger.info("📈 Запись аналитики вопросов запущена")
+
+    def record(self, user_id, question, answer_source, documents=(), fallback=False,
+               latency_ms=None, answer_length=0):
+        """Ставит запись в очередь, не блокируя вызывающий код"""
+        row = (
+            user_id,
+            question,
+            answer_source,
+            json.dumps([doc.get('id') for doc in documents]),
+            json.dumps([round(doc.get('similarity', 0.0), 4) for doc in documents]),
+            bool(fallback),
+            json.dumps(latency_ms or {}),
+            answer_length
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            metrics.incr('analytics.dropped')
+
+    def _drain(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def flush(self):
+        """Записывает все накопленные записи"""
+        while True:
+            rows = self._drain(self.batch_size)
+            if not rows:
+                return
+            self._write(rows)
+
+    def _write(self, rows):
+        try:
+            self.database.execute_many(INSERT_QUESTION.format(table=self.table), rows)
+            metrics.incr('analytics.written', len(rows))
+        except Exception as e:
+            metrics.incr('analytics.failed', len(rows))
+            logger.warning(f"⚠️ Не удалось записать аналитику ({len(rows)} записей): {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Ждем либо полную пачку, либо истечения интервала
+            self._stop.wait(self.flush_interval if self._queue.qsize() < self.batch_size else 0)
+            metrics.set_gauge('analytics.queue', self._queue.qsize())
+            self.flush()
+
+    def stop(self, timeout=10.0):
+        """Останавливает поток, дописав оставшиеся записи"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
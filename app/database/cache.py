@@ -0,0 +1,69 @@
+# app/database/cache.py
+import threading
+from collections import OrderedDict
+
+from metrics import metrics
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU кэш ограниченного размера со статистикой попаданий
+
+    Попадания и промахи также попадают в метрики под именем name:
+    name.hit, name.miss и name.hit_rate.
+    """
+
+    def __init__(self, max_size, name):
+        self.max_size = max_size
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        """Возвращает значение или None, если ключа нет"""
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self._items.move_to_end(key)
+                self.hits += 1
+            hit_rate = self.hits / (self.hits + self.misses)
+
+        metrics.incr(f'{self.name}.miss' if value is None else f'{self.name}.hit')
+        metrics.set_gauge(f'{self.name}.hit_rate', round(hit_rate, 3))
+        return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def keys(self):
+        """Ключи от самого давнего к самому недавнему использованию"""
+        with self._lock:
+            return list(self._items)
+
+    def stats(self):
+        """Размер и доля попаданий"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._items),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
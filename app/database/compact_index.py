@@ -0,0 +1,250 @@
+# app/database/compact_index.py
+"""
+Сжатие TF-IDF индекса в памяти и отчет о его размере
+
+Отчет о памяти индекса из tfidf_*.pkl запускается как модуль из каталога app/,
+чтобы импорты database.* находились:
+
+    cd app && python -m database.compact_index [--quantize] [--write]
+"""
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+
+# Шаг квантованных значений: строки TF-IDF нормированы (norm='l2'), значения в [0, 1]
+QUANTIZED_SCALE = 1.0 / 255
+
+
+class FrozenVocabulary(Mapping):
+    """
+    Неизменяемый словарь термин -> номер столбца на отсортированном массиве
+
+    Заменяет vocabulary_ обученного TfidfVectorizer: вместо Python dict
+    с объектами str и int хранятся два numpy массива, поиск термина -
+    двоичный поиск (np.searchsorted).
+    """
+
+    def __init__(self, vocabulary):
+        terms = sorted(vocabulary)
+        self.terms = np.array(terms, dtype=str)
+        self.columns = np.array([vocabulary[term] for term in terms], dtype=np.int32)
+
+    def __getitem__(self, term):
+        position = int(np.searchsorted(self.terms, term))
+        if position < len(self.terms) and self.terms[position] == term:
+            return int(self.columns[position])
+        raise KeyError(term)
+
+    def __contains__(self, term):
+        position = int(np.searchsorted(self.terms, term))
+        return position < len(self.terms) and self.terms[position] == term
+
+    def __iter__(self):
+        return iter(self.terms.tolist())
+
+    def __len__(self):
+        return len(self.terms)
+
+    @property
+    def nbytes(self):
+        return self.terms.nbytes + self.columns.nbytes
+
+
+def compact_matrix(matrix, quantize=False):
+    """
+    CSR матрица с float32 значениями и int32 индексами
+
+    С quantize значения хранятся в uint8 с шагом QUANTIZED_SCALE: data
+    занимает вчетверо меньше, погрешность веса термина - до QUANTIZED_SCALE / 2.
+    Квантованная матрица (например, загруженная из файла) без quantize
+    переводится обратно в float32.
+    """
+    from scipy import sparse
+
+    matrix = sparse.csr_matrix(matrix)
+    data = matrix.data
+    if data.dtype == np.uint8:
+        if not quantize:
+            data = data.astype(np.float32) * np.float32(QUANTIZED_SCALE)
+    elif quantize:
+        data = np.clip(np.rint(data / QUANTIZED_SCALE), 0, 255).astype(np.uint8)
+    else:
+        data = data.astype(np.float32, copy=False)
+    return sparse.csr_matrix(
+        (
+            data,
+            matrix.indices.astype(np.int32, copy=False),
+            matrix.indptr.astype(np.int32, copy=False)
+        ),
+        shape=matrix.shape
+    )
+
+
+def compact_vectorizer(vectorizer):
+    """
+    Уменьшает обученный TfidfVectorizer на месте
+
+    vocabulary_ заменяется FrozenVocabulary, stop_words_ (нужен только для
+    отладки) удаляется, запросы преобразуются сразу в float32.
+    """
+    if not isinstance(vectorizer.vocabulary_, FrozenVocabulary):
+        vectorizer.vocabulary_ = FrozenVocabulary(vectorizer.vocabulary_)
+    if hasattr(vectorizer, 'stop_words_'):
+        del vectorizer.stop_words_
+    vectorizer.dtype = np.float32
+    return vectorizer
+
+
+def quantized_scale(matrix):
+    """Множитель сходства для квантованной матрицы или None, если значения float"""
+    return QUANTIZED_SCALE if matrix.dtype == np.uint8 else None
+
+
+def compact(vectorizer, tfidf_matrix, document_ids, quantize=False):
+    """
+    Компактное представление TF-IDF индекса
+
+    Args:
+        quantize (bool): Хранить значения матрицы в uint8 (см. compact_matrix)
+
+    Returns:
+        tuple: (векторизатор, CSR float32|uint8/int32 матрица, np.int32 массив ID документов)
+    """
+    return (
+        compact_vectorizer(vectorizer),
+        compact_matrix(tfidf_matrix, quantize),
+        np.asarray(document_ids, dtype=np.int32)
+    )
+
+
+def recall_check(matrix, quantized, queries, k=10):
+    """
+    Сравнивает поиск по квантованной матрице с поиском по исходной
+
+    Args:
+        matrix: Исходная TF-IDF матрица
+        quantized: Та же матрица после compact_matrix(matrix, quantize=True)
+        queries: Разреженные TF-IDF векторы запросов (n_queries, n_features)
+
+    Returns:
+        float: recall@k - доля документов точного топ-k, найденных по квантованной матрице
+    """
+    exact = (matrix @ queries.T).toarray()
+    approximate = (quantized @ queries.T).toarray()
+    recall = 0.0
+    for column in range(exact.shape[1]):
+        # Документы с нулевым сходством в выдачу не попадают (min_similarity)
+        exact_top = {row for row in np.argsort(exact[:, column])[-k:] if exact[row, column] > 0}
+        found = {row for row in np.argsort(approximate[:, column])[-k:] if approximate[row, column] > 0}
+        recall += len(exact_top & found) / max(1, len(exact_top))
+    return recall / max(1, exact.shape[1])
+
+
+def _object_size(value):
+    """Приблизительный размер Python контейнера вместе с содержимым"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, FrozenVocabulary):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+def memory_report(snapshot):
+    """
+    Память, занимаемая частями снимка индекса, в байтах
+
+    Args:
+        snapshot (IndexSnapshot): Снимок индекса
+
+    Returns:
+        dict: Имя части -> байты
+    """
+    report = {}
+    matrix = snapshot.tfidf_matrix
+    if matrix is not None:
+        report['tfidf.data'] = matrix.data.nbytes
+        report['tfidf.indices'] = matrix.indices.nbytes
+        report['tfidf.indptr'] = matrix.indptr.nbytes
+
+    report['document_ids'] = _object_size(snapshot.document_ids)
+
+    vectorizer = snapshot.vectorizer
+    if vectorizer is not None:
+        report['vectorizer.vocabulary'] = _object_size(getattr(vectorizer, 'vocabulary_', {}))
+        stop_words = getattr(vectorizer, 'stop_words_', None)
+        report['vectorizer.stop_words'] = _object_size(stop_words) if stop_words is not None else 0
+        idf = getattr(vectorizer, 'idf_', None)
+        report['vectorizer.idf'] = idf.nbytes if idf is not None else 0
+
+    report['documents'] = sum(
+        _object_size(row) + sum(sys.getsizeof(value) for value in row.values())
+        for row in snapshot.documents.values()
+    )
+    # Подматрицы-представления общей матрицы своей памяти почти не занимают
+    report['partitions'] = sum(
+        rows.nbytes + sub.indptr.nbytes + (0 if sub.data.base is not None else sub.data.nbytes + sub.indices.nbytes)
+        for rows, sub in snapshot.partitions.values()
+    ) + sum(rows.nbytes for rows in snapshot.source_rows.values())
+
+    dense = snapshot.dense_index
+    if dense is not None:
+        for name in ('components', 'vectors', 'centroids', 'offsets', 'order'):
+            report[f'dense.{name}'] = getattr(dense, name).nbytes
+
+    report['total'] = sum(report.values())
+    return report
+
+
+def format_report(report):
+    return "\n".join(f"{name:<24}{size / 1024:>12.1f} KiB" for name, size in report.items())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import joblib
+
+    from database.index_snapshot import IndexSnapshot
+
+    arg_parser = argparse.ArgumentParser(
+        description="Отчет о памяти TF-IDF индекса (tfidf_*.pkl в текущем каталоге) до и после сжатия"
+    )
+    arg_parser.add_argument('--quantize', action='store_true', help="Хранить значения матрицы в uint8")
+    arg_parser.add_argument('--queries', type=int, default=200, help="Строк-запросов для проверки recall")
+    arg_parser.add_argument('--min-recall', type=float, default=0.95,
+                            help="Не сохранять квантованный индекс с меньшим recall@10")
+    arg_parser.add_argument('--write', action='store_true', help="Сохранить сжатый индекс поверх исходного")
+    args = arg_parser.parse_args()
+
+    vectorizer = joblib.load('tfidf_model.pkl')
+    tfidf_matrix = joblib.load('tfidf_matrix.pkl')
+    document_ids = joblib.load('document_ids.pkl')
+
+    print("Исходный индекс:")
+    print(format_report(memory_report(IndexSnapshot(vectorizer, tfidf_matrix, document_ids))))
+
+    original = compact_matrix(tfidf_matrix)
+    vectorizer, tfidf_matrix, document_ids = compact(vectorizer, tfidf_matrix, document_ids, args.quantize)
+    print("\nСжатый индекс:")
+    print(format_report(memory_report(IndexSnapshot(vectorizer, tfidf_matrix, document_ids))))
+
+    recall = None
+    if args.quantize and original.shape[0]:
+        # Запросами служат сами документы: их векторы нормированы так же, как запросы
+        rows = np.random.default_rng(1).choice(original.shape[0], min(args.queries, original.shape[0]), replace=False)
+        recall = recall_check(original, tfidf_matrix, original[np.sort(rows)])
+        print(f"\nrecall@10 квантованного индекса: {recall:.3f}")
+
+    if args.write and recall is not None and recall < args.min_recall:
+        print(f"\n❌ recall ниже {args.min_recall}, индекс не сохранен")
+    elif args.write:
+        joblib.dump(vectorizer, 'tfidf_model.pkl')
+        joblib.dump(tfidf_matrix, 'tfidf_matrix.pkl')
+        joblib.dump(document_ids, 'document_ids.pkl')
+        print("\n✅ Сжатый индекс сохранен")
@@ -0,0 +1,304 @@
+# app/database/dense_index.py
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DENSE_INDEX_DIR = 'dense_index'
+
+# Файл в каталоге индекса с именем подкаталога текущей версии
+CURRENT_FILE = 'CURRENT'
+
+ARRAY_NAMES = ('components', 'vectors', 'centroids', 'offsets', 'order')
+
+
+def index_version(tfidf_matrix, document_ids):
+    """
+    Версия снимка индекса для проверки файлов на диске
+
+    Отпечаток ID документов и TF-IDF матрицы: плотный индекс, сохраненный
+    для другой матрицы, не подойдет к загруженной модели.
+    """
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(document_ids).tobytes())
+    for array in (tfidf_matrix.indptr, tfidf_matrix.indices, tfidf_matrix.data):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+class DenseIndex:
+    """
+    Плотные векторы документов и приближенный поиск ближайших соседей на CPU
+
+    Векторы получаются LSA-проекцией (усеченное SVD) существующей TF-IDF матрицы,
+    поэтому внешний сервис эмбеддингов не нужен. Поиск идет по IVF индексу:
+    векторы разбиты k-means на кластеры и лежат в файле подряд по кластерам,
+    запрос сравнивается только с nprobe ближайшими кластерами.
+    Массивы хранятся в .npy и при загрузке отображаются в память (mmap).
+    Каждая версия лежит в своем подкаталоге, текущий указан в файле CURRENT.
+    """
+
+    def __init__(self, components, vectors, centroids, offsets, order, scale=None, nprobe=8):
+        self.components = components    # (dims, n_features) float32, проекция TF-IDF -> LSA
+        self.vectors = vectors          # (n_docs, dims) float32 или int8, упорядочены по кластерам
+        self.centroids = centroids      # (nlist, dims) float32
+        self.offsets = offsets          # (nlist + 1,) int64, границы кластеров в vectors
+        self.order = order              # (n_docs,) int32, исходный номер строки для vectors[i]
+        self.scale = scale              # множитель для int8 векторов или None
+        self.nprobe = nprobe
+
+    @property
+    def size(self):
+        return len(self.order)
+
+    @classmethod
+    def build(cls, tfidf_matrix, dims=128, nlist=None, nprobe=8, quantize=False, iterations=10, seed=42):
+        """
+        Строит индекс по TF-IDF матрице
+
+        Args:
+            tfidf_matrix: Разреженная матрица документов (n_docs, n_features)
+            dims (int): Размерность плотных векторов
+            nlist (int): Число кластеров IVF, по умолчанию ~sqrt(n_docs)
+            nprobe (int): Сколько кластеров просматривать при поиске
+            quantize (bool): Хранить векторы в int8 вместо float32
+        """
+        from sklearn.decomposition import TruncatedSVD
+
+        n_docs, n_features = tfidf_matrix.shape
+        dims = max(1, min(dims, n_features - 1, n_docs - 1))
+
+        svd = TruncatedSVD(n_components=dims, random_state=seed)
+        vectors = _normalize(svd.fit_transform(tfidf_matrix).astype(np.float32))
+        components = svd.components_.astype(np.float32)
+
+        nlist = nlist or max(1, int(np.sqrt(n_docs)))
+        nlist = min(nlist, n_docs)
+        centroids, assignments = _kmeans(vectors, nlist, iterations, seed)
+
+        order = np.argsort(assignments, kind='stable').astype(np.int32)
+        counts = np.bincount(assignments, minlength=nlist)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        vectors = vectors[order]
+
+        scale = None
+        if quantize:
+            scale = 1.0 / 127
+            vectors = np.round(vectors * 127).astype(np.int8)
+
+        logger.info(f"🧭 Плотный индекс построен: {n_docs} документов, {dims} измерений, {nlist} кластеров")
+        return cls(components, vectors, centroids, offsets, order, scale, nprobe)
+
+    def project(self, tfidf_query):
+        """Переводит TF-IDF вектор запроса в нормированный плотный вектор"""
+        vector = np.asarray(tfidf_query @ self.components.T, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _scores(self, vectors, query):
+        scores = vectors @ query if self.scale is None else (vectors.astype(np.float32) @ query) * self.scale
+        return scores
+
+    def search(self, query, k=3, nprobe=None):
+        """
+        Приближенный поиск по IVF индексу
+
+        Returns:
+            list: Пары (номер строки TF-IDF матрицы, косинусное сходство)
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        positions = []
+        scores = []
+        for cluster in probes:
+            start, end = self.offsets[cluster], self.offsets[cluster + 1]
+            if start == end:
+                continue
+            positions.append(np.arange(start, end))
+            scores.append(self._scores(self.vectors[start:end], query))
+
+        if not positions:
+            return []
+        positions = np.concatenate(positions)
+        scores = np.concatenate(scores)
+        return self._top_k(positions, scores, k)
+
+    def brute_force(self, query, k=3):
+        """Точный поиск по всем векторам (для сравнения с IVF)"""
+        scores = self._scores(self.vectors, query)
+        return self._top_k(np.arange(len(scores)), scores, k)
+
+    def _top_k(self, positions, scores, k):
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.order[positions[i]]), float(scores[i])) for i in top]
+
+    def save(self, directory=DENSE_INDEX_DIR, version=None):
+        """
+        Сохраняет массивы индекса в .npy файлы
+
+        Все файлы пишутся в новый подкаталог, который становится текущим одной
+        заменой файла CURRENT через os.replace: загрузка никогда не увидит файлы
+        разных версий вперемешку, а индекс предыдущего снимка, отображенный
+        в память, продолжает читать старые данные. Прежние версии удаляются.
+
+        Args:
+            directory (str): Каталог индекса
+            version (str): Версия снимка (index_version), проверяется при загрузке
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = f'v{time.time_ns()}'
+        path = os.path.join(directory, name)
+        os.makedirs(path)
+        for array_name in ARRAY_NAMES:
+            np.save(os.path.join(path, f'{array_name}.npy'), getattr(self, array_name))
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'scale': self.scale, 'nprobe': self.nprobe}, f)
+
+        current = os.path.join(directory, CURRENT_FILE)
+        with open(f'{current}.tmp', 'w', encoding='utf-8') as f:
+            f.write(name)
+        os.replace(f'{current}.tmp', current)
+
+        # Файлы, отображенные в память, Windows не даст удалить - удалим при следующем сохранении
+        for entry in os.listdir(directory):
+            entry_path = os.path.join(directory, entry)
+            if entry != name and entry.startswith('v') and os.path.isdir(entry_path):
+                shutil.rmtree(entry_path, ignore_errors=True)
+            elif entry.endswith('.npy') or entry == 'meta.json':
+                # Файлы индекса, сохраненного без подкаталогов версий
+                try:
+                    os.remove(entry_path)
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, directory=DENSE_INDEX_DIR, version=None, mmap=True):
+        """
+        Загружает индекс, отображая векторы в память без чтения файла целиком
+
+        Raises:
+            ValueError: Индекс сохранен для другой версии снимка
+        """
+        path = cls.current_path(directory)
+        if path is None:
+            raise FileNotFoundError(f"В {directory} нет сохраненного плотного индекса")
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if version is not None and meta.get('version') != version:
+            raise ValueError(f"Плотный индекс в {path} сохранен для другой версии снимка")
+
+        mode = 'r' if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode)
+            for name in ARRAY_NAMES
+        }
+        return cls(scale=meta['scale'], nprobe=meta['nprobe'], **arrays)
+
+    @staticmethod
+    def current_path(directory=DENSE_INDEX_DIR):
+        """Подкаталог текущей версии индекса или None"""
+        try:
+            with open(os.path.join(directory, CURRENT_FILE), 'r', encoding='utf-8') as f:
+                path = os.path.join(directory, f.read().strip())
+        except OSError:
+            return None
+        return path if os.path.exists(os.path.join(path, 'meta.json')) else None
+
+    @classmethod
+    def exists(cls, directory=DENSE_INDEX_DIR):
+        return cls.current_path(directory) is not None
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _kmeans(vectors, nlist, iterations, seed):
+    """Сферический k-means: центроиды нормируются, близость - скалярное произведение"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    assignments = np.zeros(len(vectors), dtype=np.int64)
+
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = np.bincount(assignments, minlength=nlist) == 0
+        # Пустые кластеры получают случайные документы
+        sums[empty] = vectors[rng.integers(len(vectors), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+
+    return centroids.astype(np.float32), np.argmax(vectors @ centroids.T, axis=1)
+
+
+def benchmark(index, queries, k=10, nprobe=None):
+    """
+    Сравнивает IVF поиск с точным перебором
+
+    Args:
+        index (DenseIndex): Построенный индекс
+        queries: Плотные нормированные векторы запросов (n_queries, dims)
+
+    Returns:
+        dict: Среднее время запроса в мс для обоих способов и recall@k
+    """
+    ivf_time = 0.0
+    brute_time = 0.0
+    recall = 0.0
+
+    for query in queries:
+        started = time.perf_counter()
+        approximate = index.search(query, k, nprobe)
+        ivf_time += time.perf_counter() - started
+
+        started = time.perf_counter()
+        exact = index.brute_force(query, k)
+        brute_time += time.perf_counter() - started
+
+        exact_ids = {doc for doc, _ in exact}
+        recall += len(exact_ids & {doc for doc, _ in approximate}) / max(1, len(exact_ids))
+
+    n = max(1, len(queries))
+    return {
+        'ivf_ms': ivf_time / n * 1000,
+        'brute_force_ms': brute_time / n * 1000,
+        f'recall@{k}': recall / n
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from scipy import sparse
+
+    arg_parser = argparse.ArgumentParser(description="Бенчмарк плотного IVF индекса на синтетическом корпусе")
+    arg_parser.add_argument('--docs', type=int, default=50000)
+    arg_parser.add_argument('--features', type=int, default=1000)
+    arg_parser.add_argument('--dims', type=int, default=128)
+    arg_parser.add_argument('--nprobe', type=int, default=8)
+    arg_parser.add_argument('--queries', type=int, default=200)
+    arg_parser.add_argument('--quantize', action='store_true')
+    args = arg_parser.parse_args()
+
+    matrix = sparse.random(args.docs, args.features, density=0.02, format='csr', dtype=np.float32, random_state=1)
+
+    started = time.perf_counter()
+    dense = DenseIndex.build(matrix, dims=args.dims, nprobe=args.nprobe, quantize=args.quantize)
+    print(f"build: {time.perf_counter() - started:.2f} s")
+
+    sample = matrix[np.random.default_rng(2).choice(args.docs, args.queries, replace=False)]
+    query_vectors = np.stack([dense.project(sample[i]) for i in range(sample.shape[0])])
+    for key, value in benchmark(dense, query_vectors).items():
+        print(f"{key}: {value:.3f}")
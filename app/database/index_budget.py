@@ -0,0 +1,97 @@
+# app/database/index_budget.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class IndexBudget:
+    """
+    Общий бюджет памяти для индексов нескольких лагерей
+
+    Индекс лагеря загружается с диска при первом поиске. Когда суммарный
+    размер загруженных индексов превышает бюджет, выгружаются индексы
+    лагерей, к которым дольше всего не обращались (LRU). Индекс, по
+    которому идет поиск или перестроение, не выгружается: снимок
+    освобождается после последнего читателя, а перестраиваемый лагерь
+    пропускается.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Args:
+            max_bytes (int): Сколько байт могут занимать все загруженные индексы
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._loaded = OrderedDict()    # лагерь -> MySQLTextDB, от давно использованных к недавним
+        self._sizes = {}                # лагерь -> (версия снимка, байты)
+
+    @classmethod
+    def from_config(cls, options):
+        """Создает бюджет из секции "tenants" конфигурации"""
+        options = options or {}
+        return cls(int(options.get('index_memory_mb', 512) * 1024 * 1024))
+
+    def touch(self, database):
+        """
+        Отмечает использование индекса лагеря, при необходимости загружает его
+        и выгружает давно не использованные индексы других лагерей
+        """
+        if not database.snapshot.ready:
+            started = time.perf_counter()
+            if database.ensure_index():
+                metrics.incr('tenants.index_loads')
+                logger.info(
+                    f"📂 Индекс лагеря {database.tenant} загружен за {(time.perf_counter() - started) * 1000:.0f} мс"
+                )
+
+        with self._lock:
+            if database.snapshot.ready:
+                self._loaded[database.tenant] = database
+                self._loaded.move_to_end(database.tenant)
+            total = sum(self._size(db) for db in self._loaded.values())
+            victims = []
+            for tenant, db in self._loaded.items():
+                if total <= self.max_bytes:
+                    break
+                if db is database:
+                    continue
+                victims.append(db)
+                total -= self._size(db)
+            metrics.set_gauge('tenants.loaded', len(self._loaded) - len(victims))
+            metrics.set_gauge('tenants.index_memory_kib', total // 1024)
+
+        for db in victims:
+            self._evict(db)
+
+    def _size(self, database):
+        snapshot = database.snapshot
+        cached = self._sizes.get(database.tenant)
+        if cached is None or cached[0] != snapshot.version:
+            from database.compact_index import memory_report
+
+            cached = (snapshot.version, memory_report(snapshot)['total'] if snapshot.ready else 0)
+            self._sizes[database.tenant] = cached
+        return cached[1]
+
+    def _evict(self, database):
+        if not database.unload_index():
+            # Лагерь перестраивает индекс - выгрузим позже
+            return
+        with self._lock:
+            if not database.snapshot.ready:
+                self._loaded.pop(database.tenant, None)
+                self._sizes.pop(database.tenant, None)
+            metrics.set_gauge('tenants.loaded', len(self._loaded))
+        metrics.incr('tenants.index_evictions')
+        logger.info(f"📤 Индекс лагеря {database.tenant} выгружен из памяти")
+
+    def stats(self):
+        """Загруженные индексы от давно использованных к недавним с размерами в байтах"""
+        with self._lock:
+            return [(tenant, self._size(db)) for tenant, db in self._loaded.items()]
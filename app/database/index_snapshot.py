@@ -0,0 +1,163 @@
+# app/database/index_snapshot.py
+import logging
+import threading
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSnapshot:
+    """
+    Неизменяемый снимок поискового индекса
+
+    Содержит все, что нужно поиску: обученный векторизатор, TF-IDF матрицу,
+    ID документов по строкам матрицы, сами документы и плотный индекс.
+    Новый индекс строится в отдельном снимке и публикуется заменой ссылки,
+    поэтому поиск всегда видит согласованное состояние.
+
+    Читатели берут снимок через acquire()/release(). Снятый с публикации
+    снимок (retire) освобождает данные, когда завершится последний читатель.
+
+    Строки матрицы разбиты на разделы по типу документа (website,
+    legal_document, faq) и по источнику, поэтому поиск с фильтром считает
+    сходство только с документами нужных разделов.
+    """
+
+    def __init__(self, vectorizer=None, tfidf_matrix=None, document_ids=None, documents=None,
+                 dense_index=None, version=0, speller=None):
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.document_ids = document_ids if document_ids is not None else []
+        self.documents = documents or {}    # id -> {'id', 'content', 'source', 'type'}
+        self.dense_index = dense_index
+        self.version = version
+        self.speller = speller      # SpellCorrector по словарю этого индекса
+        self.partitions = {}     # type -> (номера строк, подматрица)
+        self.source_rows = {}    # source -> номера строк
+        if self.ready and self.documents:
+            self._build_partitions()
+        self._readers = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        """Есть ли в снимке обученная TF-IDF модель"""
+        return self.tfidf_matrix is not None and len(self.document_ids) > 0
+
+    def _build_partitions(self):
+        import numpy as np
+
+        by_type = {}
+        by_source = {}
+        for row, doc_id in enumerate(self.document_ids):
+            doc = self.documents.get(doc_id)
+            if doc is None:
+                continue
+            by_type.setdefault(doc['type'], []).append(row)
+            by_source.setdefault(doc['source'], []).append(row)
+
+        for doc_type, rows in by_type.items():
+            rows = np.asarray(rows, dtype=np.int32)
+            if rows[-1] - rows[0] + 1 == len(rows):
+                # Документы одного типа идут подряд - подматрица ссылается на данные общей матрицы
+                submatrix = _row_slice(self.tfidf_matrix, int(rows[0]), int(rows[-1]) + 1)
+            else:
+                submatrix = self.tfidf_matrix[rows]
+            self.partitions[doc_type] = (rows, submatrix)
+        self.source_rows = {
+            source: np.asarray(rows, dtype=np.int32) for source, rows in by_source.items()
+        }
+
+    def select(self, filters=None):
+        """
+        Части матрицы, по которым нужно искать с учетом фильтров
+
+        Args:
+            filters (dict): {'type': [...], 'source': [...]}; значения внутри ключа
+                объединяются по ИЛИ, разные ключи - по И
+
+        Returns:
+            list: Пары (номера строк или None для всей матрицы, матрица)
+        """
+        if not filters:
+            return [(None, self.tfidf_matrix)]
+
+        types = filters.get('type')
+        sources = filters.get('source')
+
+        if not sources:
+            return [self.partitions[doc_type] for doc_type in types if doc_type in self.partitions]
+
+        import numpy as np
+
+        rows = [self.source_rows[source] for source in sources if source in self.source_rows]
+        if not rows:
+            return []
+        rows = np.unique(np.concatenate(rows))
+        if types:
+            allowed = [self.partitions[doc_type][0] for doc_type in types if doc_type in self.partitions]
+            if not allowed:
+                return []
+            rows = np.intersect1d(rows, np.concatenate(allowed))
+        return [(rows, self.tfidf_matrix[rows])] if len(rows) else []
+
+    def matches(self, doc_id, filters):
+        """Проходит ли документ фильтры"""
+        if not filters:
+            return True
+        doc = self.documents.get(doc_id)
+        if doc is None:
+            return False
+        return all(doc.get(key) in values for key, values in filters.items())
+
+    @property
+    def readers(self):
+        return self._readers
+
+    def acquire(self):
+        with self._lock:
+            self._readers += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._readers -= 1
+            free = self._retired and self._readers == 0
+        if free:
+            self._free()
+
+    def retire(self):
+        """Снимает снимок с публикации; данные освобождаются после последнего читателя"""
+        with self._lock:
+            self._retired = True
+            free = self._readers == 0
+        if free:
+            self._free()
+
+    def _free(self):
+        if self.version:
+            logger.info(f"♻️ Снимок индекса v{self.version} освобожден")
+        self.vectorizer = None
+        self.tfidf_matrix = None
+        self.document_ids = []
+        self.documents = {}
+        self.dense_index = None
+        self.speller = None
+        self.partitions = {}
+        self.source_rows = {}
+        metrics.incr('index.snapshots_released')
+
+
+def _row_slice(matrix, start, end):
+    """Строки start:end CSR матрицы без копирования значений и индексов"""
+    from scipy import sparse
+
+    indptr = matrix.indptr[start:end + 1]
+    # Конструктор csr_matrix копирует массивы, поэтому подставляем представления напрямую
+    submatrix = sparse.csr_matrix((end - start, matrix.shape[1]), dtype=matrix.dtype)
+    submatrix.data = matrix.data[indptr[0]:indptr[-1]]
+    submatrix.indices = matrix.indices[indptr[0]:indptr[-1]]
+    submatrix.indptr = indptr - indptr[0]
+    return submatrix
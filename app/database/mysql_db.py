@@ -1,67 +1,293 @@
 # app/database/mysql_db.py
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from mysql.connector.errors import InterfaceError, OperationalError, PoolError
 import json
 import logging
 from datetime import datetime
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
-import joblib
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from database.cache import LRUCache
+from database.index_snapshot import IndexSnapshot
+from database.replicas import REPLICA_OPTIONS, ReplicaRouter
+from processing.spell import SpellCorrector, correct_query
+from metrics import metrics
+from tenants import tenant_dir
 
 logger = logging.getLogger(__name__)
 
+# Ключи mysql_config, которые относятся к пулу, а не к mysql.connector.connect
+POOL_OPTIONS = ('pool_size',) + REPLICA_OPTIONS
+
+# Константа сглаживания для reciprocal rank fusion
+RRF_K = 60
+
+# Недавние запросы, которыми кэш прогревается при следующем запуске
+WARM_QUERIES_PATH = 'warm_queries.json'
+
 class MySQLTextDB:
-    def __init__(self, config):
+    def __init__(self, config, lazy_index=False, retrieval_options=None, tenant=None, shared=None,
+                 index_budget=None):
+        """
+        Args:
+            config (dict): Параметры подключения к MySQL
+            lazy_index (bool): Не загружать TF-IDF модель в конструкторе.
+                Модель загружается позже через load_index_in_background(),
+                а до тех пор поиск работает по ключевым словам.
+            retrieval_options (dict): Секция "retrieval" конфигурации
+            tenant (str): ID лагеря: таблицы получают префикс <tenant>_,
+                файлы индекса лежат в tenants/<tenant>/
+            shared (MySQLTextDB): База другого лагеря, чьи пулы соединений
+                и потоки поиска используются вместо собственных
+            index_budget (IndexBudget): Общий бюджет памяти индексов лагерей;
+                индекс загружается при первом поиске и может быть выгружен
+        """
         self.config = config
-        self.connection = None
+        self.pool = None
+        # Реплики для читающих запросов поиска (mysql_config.replicas)
+        self.replicas = None
+        self.tenant = tenant
+        self.table_prefix = f"{tenant}_" if tenant else ""
+        self.table = self.table_name('documents')
+        self.data_dir = tenant_dir(tenant)
+        if self.data_dir:
+            os.makedirs(self.data_dir, exist_ok=True)
+        self.index_budget = index_budget
+        self._owns_pool = shared is None
+        # Защищает замену ссылки на текущий снимок индекса
+        self._lock = threading.RLock()
+        # Перестроения индекса выполняются по одному
+        self._rebuild_lock = threading.Lock()
+
+        retrieval_options = retrieval_options or {}
+        self.retrieval_mode = retrieval_options.get('mode', 'hybrid')
+        self.retrieval_deadline = retrieval_options.get('deadline_ms', 500) / 1000
+        self.min_similarity = retrieval_options.get('min_similarity', 0.1)
+        self.dense_options = retrieval_options.get('dense', {})
+        self.tfidf_options = retrieval_options.get('tfidf', {})
+        self.spell_options = retrieval_options.get('spell', {})
+        if shared is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=retrieval_options.get('workers', 4),
+                thread_name_prefix="retrieval"
+            )
+        else:
+            self._executor = shared._executor
         
+        # Текущий снимок индекса; заменяется целиком при публикации новой модели
+        self._snapshot = IndexSnapshot()
+        cache_options = retrieval_options.get('cache', {})
+        self.query_vector_cache = LRUCache(cache_options.get('query_vectors', 2048), 'retrieval.vector_cache')
+        self.result_cache = LRUCache(cache_options.get('results', 1024), 'retrieval.result_cache')
+        self.index_ready = threading.Event()
+        # Загрузки индекса с диска выполняются по одной
+        self._load_lock = threading.Lock()
+        # Версия снимка, сохраненного в tfidf_*.pkl
+        self._saved_version = None
+        if shared is None:
+            self._connect()
+        else:
+            self.pool = shared.pool
+            self.replicas = shared.replicas
+        self._create_tables()
+        if not lazy_index:
+            self._load_tfidf_model()
+
+    @staticmethod
+    def _new_vectorizer():
+        # sklearn загружается только при обучении модели
+        import numpy as np
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
         # Исправляем инициализацию TfidfVectorizer
-        self.vectorizer = TfidfVectorizer(
+        return TfidfVectorizer(
             max_features=1000, 
-            stop_words=list(russian_stop_words())  # Преобразуем в список
+            stop_words=list(russian_stop_words()),  # Преобразуем в список
+            dtype=np.float32
         )
-        
-        self.tfidf_matrix = None
-        self.document_ids = []
-        self._connect()
-        self._create_tables()
-        self._load_tfidf_model()
+
+    def table_name(self, name):
+        """Имя таблицы лагеря"""
+        return f"{self.table_prefix}{name}"
+
+    def data_path(self, name):
+        """Путь к файлу лагеря (индекс, снимок корпуса, прогрев кэша)"""
+        return os.path.join(self.data_dir, name)
+
+    @property
+    def snapshot(self):
+        """Текущий опубликованный снимок индекса"""
+        return self._snapshot
+
+    @property
+    def vectorizer(self):
+        return self._snapshot.vectorizer
+
+    @property
+    def tfidf_matrix(self):
+        return self._snapshot.tfidf_matrix
+
+    @property
+    def document_ids(self):
+        return self._snapshot.document_ids
+
+    @property
+    def dense_index(self):
+        return self._snapshot.dense_index
+
+    @property
+    def index_version(self):
+        """Растет при каждой публикации нового снимка и делает старые записи кэшей недействительными"""
+        return self._snapshot.version
+
+    @contextmanager
+    def _reading(self):
+        """Берет текущий снимок индекса на время поиска"""
+        with self._lock:
+            snapshot = self._snapshot.acquire()
+        try:
+            yield snapshot
+        finally:
+            snapshot.release()
+
+    def _publish(self, vectorizer, tfidf_matrix, document_ids, documents, dense_index):
+        """Атомарно заменяет текущий снимок индекса новым"""
+        from database.compact_index import compact, memory_report
+
+        # float32 (или квантованные uint8) значения, int32 индексы и массив ID вместо списка
+        vectorizer, tfidf_matrix, document_ids = compact(
+            vectorizer, tfidf_matrix, document_ids, quantize=self.tfidf_options.get('quantize', False)
+        )
+        snapshot = IndexSnapshot(
+            vectorizer, tfidf_matrix, document_ids, documents, dense_index,
+            speller=self._build_speller(vectorizer, documents)
+        )
+
+        with self._lock:
+            old = self._snapshot
+            snapshot.version = old.version + 1
+            self._snapshot = snapshot
+            self.query_vector_cache.clear()
+            self.result_cache.clear()
+        old.retire()
+        metrics.set_gauge('retrieval.index_version', snapshot.version)
+        metrics.set_gauge('retrieval.documents', len(document_ids))
+        metrics.set_gauge('index.memory_kib', memory_report(snapshot)['total'] // 1024)
+        if self.index_budget is not None:
+            # Новый индекс может не поместиться в бюджет вместе с индексами других лагерей
+            self.index_budget.touch(self)
+        return snapshot
+
+    def _build_speller(self, vectorizer, documents):
+        """Корректор опечаток по словарю нового индекса или None, если он выключен"""
+        if not self.spell_options.get('enabled', True):
+            return None
+        try:
+            started = time.perf_counter()
+            speller = SpellCorrector.from_index(
+                vectorizer, documents, russian_stop_words(),
+                max_distance=self.spell_options.get('max_distance', 2)
+            )
+            logger.info(
+                f"✏️ Словарь опечаток: {len(speller.words)} слов, {len(speller.deletes)} удалений "
+                f"за {(time.perf_counter() - started) * 1000:.0f} мс"
+            )
+            return speller
+        except Exception as e:
+            logger.warning(f"⚠️ Исправление опечаток недоступно: {e}")
+            return None
 
     def _connect(self):
-        """Подключение к MySQL"""
+        """Создание пула соединений с MySQL"""
         try:
-            self.connection = mysql.connector.connect(**self.config)
+            connect_options = {key: value for key, value in self.config.items() if key not in POOL_OPTIONS}
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name=f"cosmos_{id(self)}",
+                pool_size=self.config.get('pool_size', 10),
+                **connect_options
+            )
             logger.info("✅ Успешное подключение к MySQL")
         except Error as e:
             logger.error(f"❌ Ошибка подключения к MySQL: {e}")
             raise
 
+        self.replicas = ReplicaRouter.from_config(self.config, connect_options, f"cosmos_{id(self)}")
+        if self.replicas:
+            self.replicas.start()
+
+    @contextmanager
+    def _connection(self, timeout=5.0):
+        """Берет соединение основного сервера из пула и возвращает его обратно после использования"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                connection = self.pool.get_connection()
+                break
+            except PoolError:
+                # Пул mysql.connector не ждет освобождения соединений сам
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def _read(self, read, replica=False):
+        """
+        Выполняет читающий запрос read(connection) и возвращает его результат
+
+        Args:
+            read: Функция, выполняющая запрос на переданном соединении
+            replica (bool): Запрос может выполняться на реплике. Если здоровой
+                реплики нет, используется основной сервер; если соединение
+                с репликой оборвалось посреди запроса, реплика исключается,
+                а запрос один раз повторяется на основном сервере
+        """
+        if replica and self.replicas:
+            source, connection = self.replicas.acquire()
+            if connection is not None:
+                try:
+                    return read(connection)
+                except (OperationalError, InterfaceError) as e:
+                    self.replicas.mark_failed(source, e)
+                finally:
+                    try:
+                        connection.close()
+                    except Error:
+                        pass
+
+        with self._connection() as connection:
+            return read(connection)
+
     def _create_tables(self):
         """Создание таблиц если они не существуют"""
         try:
-            cursor = self.connection.cursor()
-
-            create_documents_table = """
-            CREATE TABLE IF NOT EXISTS documents (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                content TEXT NOT NULL,
-                source VARCHAR(500),
-                type VARCHAR(50),
-                chunk_index INT DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                keywords TEXT,
-                INDEX idx_source (source),
-                INDEX idx_type (type),
-                FULLTEXT idx_content (content)
-            )
-            """
+            with self._connection() as connection:
+                cursor = connection.cursor()
 
-            cursor.execute(create_documents_table)
-            self.connection.commit()
-            cursor.close()
+                create_documents_table = f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    source VARCHAR(500),
+                    type VARCHAR(50),
+                    chunk_index INT DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    keywords TEXT,
+                    INDEX idx_source (source),
+                    INDEX idx_type (type),
+                    FULLTEXT idx_content (content)
+                )
+                """
+
+                cursor.execute(create_documents_table)
+                connection.commit()
+                cursor.close()
             logger.info("✅ Таблицы созданы успешно")
 
         except Error as e:
@@ -71,20 +297,211 @@ class MySQLTextDB:
     def _load_tfidf_model(self):
         """Загрузка или создание TF-IDF модели"""
         try:
-            if os.path.exists('tfidf_model.pkl'):
-                self.vectorizer = joblib.load('tfidf_model.pkl')
-                self.tfidf_matrix = joblib.load('tfidf_matrix.pkl')
-                self.document_ids = joblib.load('document_ids.pkl')
+            if os.path.exists(self.data_path('tfidf_model.pkl')):
+                import joblib
+
+                vectorizer = joblib.load(self.data_path('tfidf_model.pkl'))
+                tfidf_matrix = joblib.load(self.data_path('tfidf_matrix.pkl'))
+                document_ids = joblib.load(self.data_path('document_ids.pkl'))
+
+                dense_index = None
+                dense_saved = True
+                if self.dense_options.get('enabled'):
+                    from database.dense_index import DENSE_INDEX_DIR, DenseIndex, index_version
+
+                    try:
+                        dense_index = DenseIndex.load(
+                            self.data_path(DENSE_INDEX_DIR), version=index_version(tfidf_matrix, document_ids)
+                        )
+                    except (OSError, ValueError) as e:
+                        # Нет файлов или они от другого снимка - строим заново по загруженной матрице
+                        logger.warning(f"⚠️ Плотный индекс будет перестроен: {e}")
+                        dense_index = self._build_dense_index(tfidf_matrix)
+                        dense_saved = False
+
+                # Публикуем модель целиком, чтобы поиск не увидел ее наполовину загруженной
+                documents = self._load_documents()
+                snapshot = self._publish(vectorizer, tfidf_matrix, document_ids, documents, dense_index)
+                # Перестроенный плотный индекс сохранится при остановке (persist_index)
+                self._saved_version = snapshot.version if dense_saved else None
                 logger.info("✅ TF-IDF модель загружена из файла")
         except Exception as e:
             logger.warning(f"⚠️ Не удалось загрузить TF-IDF модель: {e}")
+        finally:
+            self.index_ready.set()
+
+    def persist_index(self):
+        """Сохраняет текущий индекс на диск, если сохраненная версия устарела"""
+        with self._reading() as snapshot:
+            if snapshot.ready and snapshot.version != self._saved_version:
+                self._save_tfidf_model(snapshot)
+
+    def ensure_index(self):
+        """
+        Загружает индекс с диска, если он не загружен
+
+        Returns:
+            bool: True, если индекс был загружен этим вызовом
+        """
+        if self._snapshot.ready:
+            return False
+        with self._load_lock:
+            # Пока ждали блокировку, индекс мог загрузить другой поток
+            if self._snapshot.ready:
+                return False
+            self._load_tfidf_model()
+            return self._snapshot.ready
+
+    def unload_index(self):
+        """
+        Выгружает индекс из памяти, предварительно сохранив его на диск
+
+        Следующий поиск через IndexBudget загрузит индекс снова.
+
+        Returns:
+            bool: False, если индекс сейчас перестраивается и выгружать его нельзя
+        """
+        if not self._rebuild_lock.acquire(blocking=False):
+            return False
+        try:
+            self.persist_index()
+            with self._lock:
+                old = self._snapshot
+                self._snapshot = IndexSnapshot(version=old.version + 1)
+                self.query_vector_cache.clear()
+                self.result_cache.clear()
+                self.index_ready.clear()
+            # Данные освободятся, когда завершатся идущие по снимку поиски
+            old.retire()
+            return True
+        finally:
+            self._rebuild_lock.release()
+
+    def save_warm_state(self, path=WARM_QUERIES_PATH):
+        """
+        Сохраняет недавние запросы из кэша результатов
+
+        Сохраняются запросы, а не результаты: при следующем запуске они
+        выполняются заново по загруженному индексу (см. warm_up), поэтому
+        прогретый кэш не может оказаться устаревшим.
+
+        Returns:
+            int: Число сохраненных запросов
+        """
+        # Индекс еще не загружен - кэш пуст, прежний список запросов не затираем
+        if not self.snapshot.ready:
+            return 0
+        version = self.index_version
+        queries = [
+            {'query': query, 'k': k, 'filters': {key: list(values) for key, values in filters} if filters else None}
+            for key_version, _, query, k, filters in reversed(self.result_cache.keys())
+            if key_version == version
+        ]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(queries, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        logger.info(f"💾 Сохранено запросов для прогрева кэша: {len(queries)}")
+        return len(queries)
+
+    def warm_up(self, path=WARM_QUERIES_PATH):
+        """
+        Прогревает кэши поиска запросами, сохраненными при прошлой остановке
+
+        Returns:
+            int: Число выполненных запросов
+        """
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                queries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось прочитать {path}: {e}")
+            return 0
+
+        started = time.monotonic()
+        # Самые недавние запросы сохранены первыми; выполняем их последними, чтобы LRU их не вытеснил
+        queries = queries[:self.result_cache.max_size]
+        for item in reversed(queries):
+            try:
+                self.search_similar_documents(item['query'], item['k'], item.get('filters'))
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка прогрева кэша: {e}")
+                break
+        logger.info(f"🔥 Кэш поиска прогрет {len(queries)} запросами за {time.monotonic() - started:.1f} с")
+        return len(queries)
+
+    def cache_stats(self):
+        """Статистика кэшей поиска"""
+        return {
+            'index_version': self.index_version,
+            'query_vectors': self.query_vector_cache.stats(),
+            'results': self.result_cache.stats()
+        }
+
+    def load_index_in_background(self, on_ready=None):
+        """
+        Загружает TF-IDF модель в фоновом потоке
+
+        Если индекс уже опубликован (store_documents при загрузке пустой базы),
+        модель с диска не читается и снимок не публикуется повторно.
+
+        Args:
+            on_ready: Функция, вызываемая после завершения загрузки
+        """
+        def load():
+            if self._snapshot.ready:
+                logger.info(f"✅ Индекс уже актуален (v{self._snapshot.version}), загрузка с диска пропущена")
+                self.index_ready.set()
+            else:
+                self.ensure_index()
+            if on_ready:
+                on_ready()
 
-    def _save_tfidf_model(self):
-        """Сохранение TF-IDF модели"""
+        thread = threading.Thread(target=load, name="tfidf-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def _build_dense_index(self, tfidf_matrix):
+        """Строит плотный LSA/IVF индекс, если он включен в конфигурации"""
+        if not self.dense_options.get('enabled') or tfidf_matrix.shape[0] < 3:
+            return None
+        try:
+            from database.dense_index import DenseIndex
+
+            return DenseIndex.build(
+                tfidf_matrix,
+                dims=self.dense_options.get('dims', 128),
+                nprobe=self.dense_options.get('nprobe', 8),
+                quantize=self.dense_options.get('quantize', False)
+            )
+        except Exception as e:
+            logger.error(f"❌ Ошибка построения плотного индекса: {e}")
+            return None
+
+    def _save_tfidf_model(self, snapshot):
+        """Сохранение TF-IDF модели снимка"""
         try:
-            joblib.dump(self.vectorizer, 'tfidf_model.pkl')
-            joblib.dump(self.tfidf_matrix, 'tfidf_matrix.pkl')
-            joblib.dump(self.document_ids, 'document_ids.pkl')
+            import joblib
+
+            # Каждый файл пишется рядом и подменяется целиком
+            for name, value in (
+                ('tfidf_model.pkl', snapshot.vectorizer),
+                ('tfidf_matrix.pkl', snapshot.tfidf_matrix),
+                ('document_ids.pkl', snapshot.document_ids)
+            ):
+                path = self.data_path(name)
+                joblib.dump(value, f'{path}.tmp')
+                os.replace(f'{path}.tmp', path)
+            if snapshot.dense_index is not None:
+                from database.dense_index import DENSE_INDEX_DIR, index_version
+
+                snapshot.dense_index.save(
+                    self.data_path(DENSE_INDEX_DIR),
+                    version=index_version(snapshot.tfidf_matrix, snapshot.document_ids)
+                )
+            self._saved_version = snapshot.version
             logger.info("✅ TF-IDF модель сохранена")
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения TF-IDF модели: {e}")
@@ -108,104 +525,537 @@ class MySQLTextDB:
         return ' '.join([word for word, freq in sorted_words[:top_n]])
 
     def store_documents(self, documents):
-        """Сохранение документов в базу"""
-        try:
-            cursor = self.connection.cursor()
+        """
+        Сохранение документов в базу и перестроение индекса без простоя
 
-            # Очищаем старые данные
-            cursor.execute("DELETE FROM documents")
-            logger.info("🗑️ Очищены старые данные")
+        Документы записываются в промежуточную таблицу, по ним обучается новая
+        модель, затем таблицы атомарно меняются местами (RENAME TABLE) и
+        публикуется новый снимок индекса. Поиск все это время работает
+        по старым таблице и снимку.
 
-            stored_count = 0
-            all_texts = []
+        Args:
+            documents: Итерируемые документы, можно генератор
+        """
+        with self._rebuild_lock:
+            started = time.perf_counter()
+            stored = self._store_staging(documents)
 
-            for i, doc in enumerate(documents):
-                # Извлекаем ключевые слова
-                keywords = self._extract_keywords(doc['content'])
-                
-                # Сохраняем документ
-                insert_doc_query = """
-                INSERT INTO documents (content, source, type, chunk_index, keywords)
-                VALUES (%s, %s, %s, %s, %s)
-                """
-                cursor.execute(insert_doc_query, (
-                    doc['content'],
-                    doc.get('source', 'unknown'),
-                    doc.get('type', 'website'),
-                    doc.get('chunk_index', 0),
-                    keywords
-                ))
-
-                document_id = cursor.lastrowid
-                stored_count += 1
-                all_texts.append(self._preprocess_text(doc['content']))
-
-            self.connection.commit()
+            if not stored:
+                logger.warning("⚠️ Нет документов для сохранения, текущий индекс оставлен")
+                self.execute(f"DROP TABLE IF EXISTS {self.table}_staging")
+                return 0
+
+            snapshot = self._build_and_publish(stored, before_publish=self._swap_tables)
+
+            duration = time.perf_counter() - started
+            metrics.observe('index.rebuild_ms', duration * 1000)
+            logger.info(f"💾 Успешно сохранено документов: {len(stored)} (индекс v{snapshot.version}, {duration:.1f} с)")
+            return len(stored)
+
+    def apply_changes(self, documents):
+        """
+        Применяет к базе только изменения относительно текущего снимка
+
+        Документы сравниваются по (source, type, content): совпавшие строки
+        остаются на месте со своими ID, пропавшие удаляются, новые вставляются.
+        Если ничего не изменилось, индекс не перестраивается.
+
+        Returns:
+            dict: Число добавленных, удаленных и оставленных документов
+        """
+        # Выгруженный индекс лагеря загружаем, чтобы сравнить с ним новые документы
+        self.ensure_index()
+        current = self._snapshot.documents
+        if not current:
+            stored = self.store_documents(documents)
+            return {'added': stored, 'removed': 0, 'kept': 0}
+
+        with self._rebuild_lock:
+            current = self._snapshot.documents
+            existing = {}
+            for doc_id, row in current.items():
+                existing.setdefault((row['source'], row['type'], row['content']), []).append(doc_id)
+
+            kept = []
+            added = []
+            for doc in documents:
+                key = (doc.get('source', 'unknown'), doc.get('type', 'website'), doc['content'])
+                ids = existing.get(key)
+                if ids:
+                    kept.append(current[ids.pop()])
+                else:
+                    added.append(doc)
+            removed = [doc_id for ids in existing.values() for doc_id in ids]
+
+            changes = {'added': len(added), 'removed': len(removed), 'kept': len(kept)}
+            if not added and not removed:
+                return changes
+
+            with self._connection() as connection:
+                try:
+                    cursor = connection.cursor()
+                    if removed:
+                        placeholders = ", ".join(["%s"] * len(removed))
+                        cursor.execute(f"DELETE FROM {self.table} WHERE id IN ({placeholders})", removed)
+                    new_rows = self._insert_documents(cursor, self.table, added)
+                    connection.commit()
+                    cursor.close()
+                except Error as e:
+                    logger.error(f"❌ Ошибка применения изменений: {e}")
+                    connection.rollback()
+                    raise
+
+            stored = sorted(kept + new_rows, key=lambda row: row['id'])
+            snapshot = self._build_and_publish(stored)
+            logger.info(
+                f"🔄 Изменения применены: +{changes['added']} -{changes['removed']}, "
+                f"без изменений {changes['kept']} (индекс v{snapshot.version})"
+            )
+            return changes
+
+    def _build_and_publish(self, stored, before_publish=None):
+        """Обучает модель по строкам документов и публикует новый снимок индекса"""
+        # Строки одного типа идут в матрице подряд, и разделы индекса не копируют ее данные
+        stored = sorted(stored, key=lambda row: row['type'])
+        document_ids = [doc['id'] for doc in stored]
+        all_texts = [self._preprocess_text(doc['content']) for doc in stored]
+
+        # Обучаем новую TF-IDF модель, не трогая опубликованную
+        vectorizer = self._new_vectorizer()
+        tfidf_matrix = vectorizer.fit_transform(all_texts)
+        dense_index = self._build_dense_index(tfidf_matrix)
+
+        if before_publish:
+            before_publish()
+        snapshot = self._publish(
+            vectorizer, tfidf_matrix, document_ids,
+            {doc['id']: doc for doc in stored}, dense_index
+        )
+        self._save_tfidf_model(snapshot)
+        return snapshot
+
+    def _insert_documents(self, cursor, table, documents):
+        """Вставляет документы в таблицу. Возвращает строки с присвоенными ID"""
+        insert_doc_query = f"""
+        INSERT INTO {table} (content, source, type, chunk_index, keywords)
+        VALUES (%s, %s, %s, %s, %s)
+        """
+        stored = []
+        for doc in documents:
+            source = doc.get('source', 'unknown')
+            doc_type = doc.get('type', 'website')
+            cursor.execute(insert_doc_query, (
+                doc['content'],
+                source,
+                doc_type,
+                doc.get('chunk_index', 0),
+                self._extract_keywords(doc['content'])
+            ))
+            stored.append({
+                'id': cursor.lastrowid,
+                'content': doc['content'],
+                'source': source,
+                'type': doc_type
+            })
+        return stored
+
+    def _store_staging(self, documents):
+        """Записывает документы в промежуточную таблицу documents_staging. Возвращает сохраненные строки"""
+        stored = []
+        with self._connection() as connection:
+            try:
+                cursor = connection.cursor()
+                cursor.execute(f"DROP TABLE IF EXISTS {self.table}_staging")
+                cursor.execute(f"CREATE TABLE {self.table}_staging LIKE {self.table}")
+                stored = self._insert_documents(cursor, f'{self.table}_staging', documents)
+                connection.commit()
+                cursor.close()
+
+            except Error as e:
+                logger.error(f"❌ Ошибка сохранения документов: {e}")
+                connection.rollback()
+                raise
+        return stored
+
+    def _swap_tables(self):
+        """Атомарно подменяет documents промежуточной таблицей"""
+        with self._connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}_old")
+            cursor.execute(
+                f"RENAME TABLE {self.table} TO {self.table}_old, {self.table}_staging TO {self.table}"
+            )
+            cursor.execute(f"DROP TABLE {self.table}_old")
+            connection.commit()
             cursor.close()
+        logger.info(f"🔁 Таблица {self.table} заменена новой версией")
 
-            # Обучаем TF-IDF модель
-            if all_texts:
-                self.tfidf_matrix = self.vectorizer.fit_transform(all_texts)
-                self.document_ids = list(range(1, stored_count + 1))
-                self._save_tfidf_model()
+    def reindex(self):
+        """Переобучает модель по текущей таблице documents, не меняя строк"""
+        with self._rebuild_lock:
+            stored = list(self._load_documents().values())
+            if not stored:
+                return 0
+            snapshot = self._build_and_publish(stored)
+            logger.info(f"🔁 Индекс перестроен: {len(stored)} документов (индекс v{snapshot.version})")
+            return len(stored)
 
-            logger.info(f"💾 Успешно сохранено документов: {stored_count}")
-            return stored_count
+    def rebuild_in_background(self, load_documents, on_done=None):
+        """
+        Перестраивает индекс в фоновом потоке
 
-        except Error as e:
-            logger.error(f"❌ Ошибка сохранения документов: {e}")
-            self.connection.rollback()
-            raise
+        Args:
+            load_documents: Функция без аргументов, возвращающая документы
+            on_done: Функция, вызываемая с числом сохраненных документов
+        """
+        def rebuild():
+            try:
+                stored = self.store_documents(load_documents())
+            except Exception as e:
+                logger.error(f"❌ Ошибка перестроения индекса: {e}")
+                return
+            if on_done:
+                on_done(stored)
+
+        thread = threading.Thread(target=rebuild, name="index-rebuild", daemon=True)
+        thread.start()
+        return thread
 
-    def search_similar_documents(self, query, k=3):
-        """Поиск похожих документов по текстовому запросу"""
+    def _load_documents(self):
+        """Загружает все документы для снимка индекса. Возвращает словарь id -> строка"""
+        with self._connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(f"SELECT id, content, source, type FROM {self.table}")
+            rows = cursor.fetchall()
+            cursor.close()
+        return {row['id']: row for row in rows}
+
+    def search_similar_documents(self, query, k=3, filters=None):
+        """
+        Поиск похожих документов по текстовому запросу
+
+        Результаты полного поиска кэшируются по нормализованному запросу, k,
+        фильтрам и версии индекса, поэтому повторный вопрос не обращается
+        ни к матрице, ни к MySQL. Перед поиском в запросе исправляются
+        опечатки по словарю индекса.
+
+        Args:
+            query (str): Текст запроса
+            k (int): Сколько документов вернуть
+            filters (dict): Ограничение поиска разделами, например
+                {'type': ['legal_document']} или {'source': [url, ...]}
+        """
+        if self.index_budget is not None:
+            self.index_budget.touch(self)
+        filters = self._normalize_filters(filters)
+        with self._reading() as snapshot:
+            # Слова с опечатками не попадают в словарь TF-IDF и уводят запрос в поиск по LIKE
+            query = correct_query(snapshot.speller, self._preprocess_text(query))
+            key = (
+                snapshot.version, self.retrieval_mode, query, k,
+                tuple(sorted(filters.items())) if filters else None
+            )
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return [dict(doc) for doc in cached]
+
+            if self.retrieval_mode == 'hybrid':
+                similar_docs, complete = self._hybrid_search(snapshot, query, k, filters)
+            else:
+                similar_docs, complete = self._tfidf_search(snapshot, query, k, filters)
+
+        # Неполные результаты (дедлайн, ошибка, модель не загружена) не кэшируем
+        if complete:
+            self.result_cache.put(key, [dict(doc) for doc in similar_docs])
+        return similar_docs
+
+    @staticmethod
+    def _normalize_filters(filters):
+        """Приводит фильтры к виду {'type': (...), 'source': (...)} или None"""
+        if not filters:
+            return None
+        normalized = {}
+        for key in ('type', 'source'):
+            values = filters.get(key)
+            if values:
+                if isinstance(values, str):
+                    values = [values]
+                normalized[key] = tuple(sorted(set(values)))
+        return normalized or None
+
+    @staticmethod
+    def _filter_sql(filters):
+        """Условие WHERE и параметры для фильтров поиска"""
+        if not filters:
+            return "", []
+        conditions = []
+        params = []
+        for key, values in filters.items():
+            conditions.append(f"{key} IN ({', '.join(['%s'] * len(values))})")
+            params.extend(values)
+        return " AND " + " AND ".join(conditions), params
+
+    def _tfidf_search(self, snapshot, query, k, filters=None):
+        """Поиск только по TF-IDF. Возвращает (документы, признак полного результата)"""
         try:
-            if self.tfidf_matrix is None or not self.document_ids:
+            scored = self._vector_search(snapshot, query, k, filters)
+            if scored is None:
                 # Fallback: поиск по ключевым словам
-                return self._keyword_search(query, k)
+                return self._keyword_search(query, k, filters), False
 
-            # Преобразуем запрос в TF-IDF вектор
-            query_vec = self.vectorizer.transform([self._preprocess_text(query)])
-            
-            # Вычисляем косинусное сходство
-            similarities = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
-            
-            # Получаем топ-K документов
-            top_indices = similarities.argsort()[-k:][::-1]
-            
-            cursor = self.connection.cursor(dictionary=True)
+            rows = self._snapshot_documents(snapshot, [doc_id for doc_id, _ in scored])
             similar_docs = []
-            
-            for idx in top_indices:
-                if similarities[idx] > 0.1:  # Порог сходства
-                    doc_id = self.document_ids[idx]
-                    cursor.execute("SELECT content, source, type FROM documents WHERE id = %s", (doc_id,))
-                    doc = cursor.fetchone()
-                    if doc:
-                        similar_docs.append({
-                            'content': doc['content'],
-                            'source': doc['source'],
-                            'type': doc['type'],
-                            'similarity': float(similarities[idx])
-                        })
-            
-            cursor.close()
+            for doc_id, similarity in scored:
+                doc = rows.get(doc_id)
+                if doc:
+                    similar_docs.append(self._format_document(doc, similarity, 'tfidf'))
             
             if not similar_docs:
-                return self._keyword_search(query, k)
+                return self._keyword_search(query, k, filters), True
                 
-            logger.info(f"🔍 Найдено похожих документов: {len(similar_docs)}")
-            return similar_docs
+            logger.info(f"🔍 Найдено похожих документов: {len(similar_docs)}", extra={'sampled': True})
+            return similar_docs, True
 
         except Exception as e:
             logger.error(f"❌ Ошибка поиска документов: {e}")
-            return self._keyword_search(query, k)
+            return self._keyword_search(query, k, filters), False
+
+    def hybrid_search(self, query, k=3, filters=None):
+        """
+        Гибридный поиск: TF-IDF и плотные векторы в памяти и FULLTEXT в MySQL
+        выполняются параллельно
+
+        Результаты объединяются методом reciprocal rank fusion. Если один из поисков
+        не уложился в retrieval_deadline, используется то, что успело завершиться.
+        """
+        with self._reading() as snapshot:
+            return self._hybrid_search(snapshot, query, k, self._normalize_filters(filters))[0]
+
+    def _submit_reading(self, snapshot, search, *args):
+        """
+        Отправляет поиск по снимку в пул потоков
+
+        Задача сама держит ссылку на снимок: если поиск не дождется ее
+        из-за дедлайна, снимок не освободится, пока задача не завершится.
+        """
+        snapshot.acquire()
+
+        def run():
+            try:
+                return search(snapshot, *args)
+            finally:
+                snapshot.release()
+
+        try:
+            return self._executor.submit(run)
+        except Exception:
+            snapshot.release()
+            raise
+
+    def _hybrid_search(self, snapshot, query, k, filters=None):
+        """Гибридный поиск. Возвращает (документы, признак полного результата)"""
+        try:
+            vector_future = self._submit_reading(snapshot, self._vector_search, query, k, filters)
+            fulltext_future = self._executor.submit(self._fulltext_search, query, k, filters)
+            futures = [vector_future, fulltext_future]
+            dense_future = None
+            if snapshot.dense_index is not None:
+                dense_future = self._submit_reading(snapshot, self._dense_search, query, k, filters)
+                futures.append(dense_future)
+
+            done, not_done = wait(futures, timeout=self.retrieval_deadline)
+            if not_done:
+                metrics.incr('retrieval.deadline_exceeded')
+
+            vector_result = self._future_result(vector_future, done, None)
+            ranked_lists = [vector_result or []]
+            if dense_future is not None:
+                ranked_lists.append(self._future_result(dense_future, done, None) or [])
+            fulltext_rows = self._future_result(fulltext_future, done, [])
+
+            fused = {}
+            similarities = {}
+            for ranked in ranked_lists:
+                for rank, (doc_id, similarity) in enumerate(ranked):
+                    fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+                    similarities[doc_id] = max(similarity, similarities.get(doc_id, 0.0))
+            rows = {}
+            for rank, row in enumerate(fulltext_rows):
+                # Во время замены таблицы FULLTEXT может вернуть строку из более новой версии
+                if snapshot.documents and snapshot.documents.get(row['id'], {}).get('content') != row['content']:
+                    continue
+                fused[row['id']] = fused.get(row['id'], 0.0) + 1.0 / (RRF_K + rank + 1)
+                rows[row['id']] = row
+
+            # Результат полный, если все поиски успели без ошибок и модель уже загружена
+            complete = (
+                not not_done
+                and vector_result is not None
+                and all(future.exception() is None for future in futures)
+            )
+
+            if not fused:
+                if not_done:
+                    return [], False
+                return self._keyword_search(query, k, filters), complete
 
-    def _keyword_search(self, query, k=3):
+            top_ids = sorted(fused, key=fused.get, reverse=True)[:k]
+            missing = [doc_id for doc_id in top_ids if doc_id not in rows]
+            if missing:
+                rows.update(self._snapshot_documents(snapshot, missing))
+
+            similar_docs = []
+            for doc_id in top_ids:
+                doc = rows.get(doc_id)
+                if doc:
+                    # Документы, найденные только FULLTEXT, получают среднюю релевантность
+                    similar_docs.append(self._format_document(doc, similarities.get(doc_id, 0.5), 'hybrid'))
+
+            logger.info(f"🔍 Найдено похожих документов: {len(similar_docs)}", extra={'sampled': True})
+            return similar_docs, complete
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка гибридного поиска: {e}")
+            return self._keyword_search(query, k, filters), False
+
+    def _dense_search(self, snapshot, query, k, filters=None):
+        """Поиск по плотным LSA векторам через IVF индекс (фильтры применяются к результату)"""
+        vectorizer = snapshot.vectorizer
+        dense_index = snapshot.dense_index
+        document_ids = snapshot.document_ids
+        version = snapshot.version
+
+        if dense_index is None or vectorizer is None:
+            return None
+
+        query_vec = dense_index.project(self._query_vector(vectorizer, version, query))
+        # IVF индекс не разбит на разделы, поэтому с фильтром берем кандидатов с запасом
+        candidates = dense_index.search(query_vec, k * 4 if filters else k)
+        return [
+            (int(document_ids[row]), similarity)
+            for row, similarity in candidates
+            if similarity > self.min_similarity and snapshot.matches(document_ids[row], filters)
+        ][:k]
+
+    def _query_vector(self, vectorizer, version, query):
+        """TF-IDF вектор запроса с кэшированием по версии индекса"""
+        text = self._preprocess_text(query)
+        key = (version, text)
+        query_vec = self.query_vector_cache.get(key)
+        if query_vec is None:
+            query_vec = vectorizer.transform([text])
+            self.query_vector_cache.put(key, query_vec)
+        return query_vec
+
+    @staticmethod
+    def _future_result(future, done, default):
+        """Результат завершившегося поиска; ошибка одного поиска не отменяет другой"""
+        if future not in done:
+            return default
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning(f"⚠️ Один из поисков завершился ошибкой: {e}")
+            return default
+
+    def _vector_search(self, snapshot, query, k, filters=None):
+        """
+        Поиск по TF-IDF в памяти
+
+        С фильтрами сходство считается только по строкам нужных разделов,
+        лучшие документы разделов затем объединяются.
+
+        Returns:
+            list: Пары (id документа, сходство) по убыванию сходства
+                или None, если модель еще не загружена
+        """
+        # Снимок может быть освобожден, если поиск уже не уложился в дедлайн
+        vectorizer = snapshot.vectorizer
+        tfidf_matrix = snapshot.tfidf_matrix
+        document_ids = snapshot.document_ids
+        version = snapshot.version
+
+        if vectorizer is None or tfidf_matrix is None or len(document_ids) == 0:
+            return None
+
+        from database.compact_index import quantized_scale
+
+        # Преобразуем запрос в TF-IDF вектор
+        query_vec = self._query_vector(vectorizer, version, query)
+        scale = quantized_scale(tfidf_matrix)
+
+        scored = []
+        rows_scored = 0
+        for rows, matrix in snapshot.select(filters):
+            # Строки матрицы и запрос нормированы (norm='l2'), поэтому косинусное
+            # сходство - просто скалярное произведение, без копирования матрицы
+            similarities = (matrix @ query_vec.T).toarray().ravel()
+            if scale is not None:
+                similarities *= scale
+            rows_scored += len(similarities)
+
+            # Получаем топ-K документов раздела
+            top_indices = similarities.argsort()[-k:][::-1]
+            scored.extend(
+                (int(document_ids[idx if rows is None else rows[idx]]), float(similarities[idx]))
+                for idx in top_indices
+                if similarities[idx] > self.min_similarity  # Порог сходства
+            )
+
+        metrics.observe('retrieval.rows_scored', rows_scored)
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def _fulltext_search(self, query, k, filters=None):
+        """Поиск по FULLTEXT индексу MySQL"""
+        text = self._preprocess_text(query)
+        if not text:
+            return []
+
+        filter_sql, filter_params = self._filter_sql(filters)
+        return self._read(lambda connection: self._fetch(connection, f"""
+            SELECT id, content, source, type, MATCH(content) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score
+            FROM {self.table}
+            WHERE MATCH(content) AGAINST (%s IN NATURAL LANGUAGE MODE){filter_sql}
+            ORDER BY score DESC
+            LIMIT %s
+            """, (text, text, *filter_params, k)), replica=True)
+
+    def _snapshot_documents(self, snapshot, doc_ids):
+        """Документы из снимка индекса; чего в снимке нет, загружается из MySQL"""
+        rows = {doc_id: snapshot.documents[doc_id] for doc_id in doc_ids if doc_id in snapshot.documents}
+        missing = [doc_id for doc_id in doc_ids if doc_id not in rows]
+        if missing:
+            rows.update(self._fetch_documents(missing))
+        return rows
+
+    def _fetch_documents(self, doc_ids):
+        """Загружает документы одним запросом. Возвращает словарь id -> строка"""
+        if not doc_ids:
+            return {}
+
+        placeholders = ", ".join(["%s"] * len(doc_ids))
+        rows = self._read(lambda connection: self._fetch(
+            connection,
+            f"SELECT id, content, source, type FROM {self.table} WHERE id IN ({placeholders})",
+            list(doc_ids)
+        ), replica=True)
+        return {row['id']: row for row in rows}
+
+    @staticmethod
+    def _format_document(doc, similarity, method):
+        return {
+            'id': doc['id'],
+            'content': doc['content'],
+            'source': doc['source'],
+            'type': doc['type'],
+            'similarity': float(similarity),
+            'method': method
+        }
+
+    def _keyword_search(self, query, k=3, filters=None):
         """Резервный поиск по ключевым словам"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            
             # Извлекаем ключевые слова из запроса
             query_keywords = self._extract_keywords(query, top_n=5)
             keywords_list = query_keywords.split()
@@ -221,51 +1071,108 @@ class MySQLTextDB:
                 params.extend([f'%{keyword}%', f'%{keyword}%'])
             
             where_clause = " OR ".join(conditions)
+            filter_sql, filter_params = self._filter_sql(filters)
             
             query_sql = f"""
-            SELECT content, source, type
-            FROM documents 
-            WHERE {where_clause}
+            SELECT id, content, source, type
+            FROM {self.table}
+            WHERE ({where_clause}){filter_sql}
             LIMIT %s
             """
             
+            params.extend(filter_params)
             params.append(k)
-            cursor.execute(query_sql, params)
-            docs = cursor.fetchall()
+            docs = self._read(lambda connection: self._fetch(connection, query_sql, params), replica=True)
             
-            formatted_docs = []
-            for doc in docs:
-                formatted_docs.append({
-                    'content': doc['content'],
-                    'source': doc['source'],
-                    'type': doc['type'],
-                    'similarity': 0.5  # Средняя релевантность для ключевого поиска
-                })
+            # Средняя релевантность для ключевого поиска
+            formatted_docs = [self._format_document(doc, 0.5, 'keyword') for doc in docs]
             
-            cursor.close()
-            logger.info(f"🔍 Найдено документов по ключевым словам: {len(formatted_docs)}")
+            logger.info(f"🔍 Найдено документов по ключевым словам: {len(formatted_docs)}", extra={'sampled': True})
             return formatted_docs
             
         except Exception as e:
             logger.error(f"❌ Ошибка ключевого поиска: {e}")
             return []
 
-    def get_document_count(self):
-        """Получение количества документов"""
+    def execute(self, sql, params=None):
+        """
+        Выполняет служебный запрос (например, DDL) на соединении из пула
+
+        Returns:
+            int: ID вставленной строки для INSERT
+        """
+        with self._connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            connection.commit()
+            row_id = cursor.lastrowid
+            cursor.close()
+        return row_id
+
+    def fetch_all(self, sql, params=None, replica=False):
+        """
+        Выполняет служебный SELECT и возвращает строки-словари
+
+        Args:
+            replica (bool): Можно читать с реплики (данные могут отставать на replica_max_lag)
+        """
+        return self._read(lambda connection: self._fetch(connection, sql, params), replica=replica)
+
+    @staticmethod
+    def _fetch(connection, sql, params=None):
+        """Строки-словари запроса на соединении"""
+        cursor = connection.cursor(dictionary=True)
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT COUNT(*) FROM documents")
-            count = cursor.fetchone()[0]
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
             cursor.close()
-            return count
+
+    def execute_many(self, sql, rows):
+        """Пакетная вставка строк одним executemany"""
+        with self._connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(sql, rows)
+                connection.commit()
+            except Error:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def get_document_count(self, replica=True):
+        """
+        Получение количества документов
+
+        Args:
+            replica (bool): Можно считать на реплике; сразу после записи нужен основной сервер
+        """
+        try:
+            rows = self._read(
+                lambda connection: self._fetch(connection, f"SELECT COUNT(*) AS count FROM {self.table}"),
+                replica=replica
+            )
+            return rows[0]['count']
         except Error as e:
             logger.error(f"❌ Ошибка получения количества документов: {e}")
             return 0
 
     def close(self):
-        """Закрытие соединения"""
-        if self.connection:
-            self.connection.close()
+        """Закрытие соединений"""
+        if not self._owns_pool:
+            # Пулы и потоки поиска закрывает база, которая их создала
+            self.pool = None
+            self.replicas = None
+            return
+        self._executor.shutdown(wait=False)
+        if self.replicas:
+            self.replicas.stop()
+            self.replicas = None
+        if self.pool:
+            # Пул закрывает только свободные соединения, занятые закроются при возврате
+            self.pool._remove_connections()
+            self.pool = None
             logger.info("🔌 Соединение с MySQL закрыто")
 
 def russian_stop_words():
@@ -0,0 +1,202 @@
+# app/database/replicas.py
+import itertools
+import logging
+import threading
+
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Ключи mysql_config, описывающие реплики, а не подключение к основному серверу
+REPLICA_OPTIONS = ('replicas', 'replica_pool_size', 'replica_max_lag', 'replica_check_interval')
+
+
+class Replica:
+    """Реплика MySQL со своим пулом соединений и последним известным состоянием"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = False
+        self.lag = None
+
+
+class ReplicaRouter:
+    """
+    Распределение читающих запросов по репликам MySQL
+
+    Фоновый поток раз в check_interval секунд проверяет каждую реплику:
+    доступность и отставание репликации (Seconds_Behind_Source). Чтения
+    идут по кругу на здоровые реплики с отставанием не больше max_lag;
+    если таких нет или реплика не выдала соединение, чтение выполняется
+    на основном сервере. Реплику, на которой оборвался запрос, вызывающий
+    исключает через mark_failed и повторяет чтение на основном сервере.
+    Запись всегда идет на основной сервер.
+    """
+
+    def __init__(self, replicas, max_lag=5.0, check_interval=10.0):
+        """
+        Args:
+            replicas (list): Объекты Replica
+            max_lag (float): Допустимое отставание реплики в секундах
+            check_interval (float): Период проверки реплик в секундах
+        """
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._cycle = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, connect_options, pool_prefix):
+        """
+        Создает пулы реплик из mysql_config
+
+        Параметры реплики, которых нет в ее описании (user, password,
+        database и т.д.), берутся из connect_options основного сервера.
+
+        Returns:
+            ReplicaRouter или None, если реплики не настроены
+        """
+        replica_configs = config.get('replicas')
+        if not replica_configs:
+            return None
+
+        replicas = []
+        for index, replica_config in enumerate(replica_configs):
+            if isinstance(replica_config, str):
+                replica_config = {'host': replica_config}
+            options = {**connect_options, **replica_config}
+            name = f"{options['host']}:{options.get('port', 3306)}"
+            try:
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"{pool_prefix}_replica{index}",
+                    pool_size=config.get('replica_pool_size', config.get('pool_size', 10)),
+                    **options
+                )
+            except Error as e:
+                # Недоступная при запуске реплика не мешает работе: чтения пойдут на основной сервер
+                logger.warning(f"⚠️ Реплика {name} недоступна: {e}")
+                continue
+            replicas.append(Replica(name, pool))
+
+        if not replicas:
+            return None
+        router = cls(
+            replicas,
+            max_lag=config.get('replica_max_lag', 5.0),
+            check_interval=config.get('replica_check_interval', 10.0)
+        )
+        router.check()
+        logger.info(f"✅ Реплики MySQL: {', '.join(replica.name for replica in replicas)}")
+        return router
+
+    def start(self):
+        """Запускает фоновую проверку реплик"""
+        self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.check_interval)
+        for replica in self.replicas:
+            try:
+                replica.pool._remove_connections()
+            except Exception:
+                pass
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+    def check(self):
+        """Обновляет состояние всех реплик"""
+        for replica in self.replicas:
+            was_healthy = replica.healthy
+            try:
+                replica.lag = self._replication_lag(replica)
+                replica.healthy = replica.lag is not None and replica.lag <= self.max_lag
+            except Exception as e:
+                replica.lag = None
+                replica.healthy = False
+                if was_healthy:
+                    logger.warning(f"⚠️ Реплика {replica.name} недоступна: {e}")
+
+            if replica.healthy != was_healthy:
+                state = "в работе" if replica.healthy else f"исключена (отставание {replica.lag})"
+                logger.info(f"🔀 Реплика {replica.name} {state}")
+            if replica.lag is not None:
+                metrics.set_gauge(f'mysql.replica.{replica.name}.lag_s', replica.lag)
+
+        metrics.set_gauge('mysql.replicas_healthy', sum(replica.healthy for replica in self.replicas))
+
+    @staticmethod
+    def _replication_lag(replica):
+        """
+        Отставание реплики в секундах
+
+        Returns:
+            float: Отставание; 0 для сервера, который сам не является репликой
+                (например, точка чтения кластера); None, если репликация остановлена
+        """
+        connection = replica.pool.get_connection()
+        try:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except Error:
+                # MySQL до 8.0.22
+                cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+            cursor.close()
+        finally:
+            connection.close()
+
+        if not row:
+            return 0.0
+        lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+        return float(lag) if lag is not None else None
+
+    def acquire(self):
+        """
+        Соединение со здоровой репликой по кругу
+
+        Returns:
+            tuple: (Replica, соединение) или (None, None), если читать нужно
+                с основного сервера
+        """
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            metrics.incr('mysql.reads_primary_fallback')
+            return None, None
+
+        start = next(self._cycle)
+        for offset in range(len(healthy)):
+            replica = healthy[(start + offset) % len(healthy)]
+            try:
+                connection = replica.pool.get_connection()
+            except PoolError:
+                # Пул реплики занят - пробуем следующую, реплика исправна
+                continue
+            except Error as e:
+                replica.healthy = False
+                logger.warning(f"⚠️ Реплика {replica.name} исключена: {e}")
+                continue
+            metrics.incr('mysql.reads_replica')
+            return replica, connection
+
+        metrics.incr('mysql.reads_primary_fallback')
+        return None, None
+
+    def mark_failed(self, replica, error):
+        """Исключает реплику, на которой оборвался запрос, до следующей проверки"""
+        if replica.healthy:
+            logger.warning(f"⚠️ Реплика {replica.name} исключена после ошибки запроса: {error}")
+        replica.healthy = False
+        metrics.incr('mysql.replica_read_errors')
+        metrics.set_gauge('mysql.replicas_healthy', sum(item.healthy for item in self.replicas))
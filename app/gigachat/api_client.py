@@ -14,6 +14,10 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 logger = logging.getLogger(__name__)
 
 
+class GigaChatUnavailable(Exception):
+    """GigaChat не ответил: ошибка сети или API, истек дедлайн или разомкнут предохранитель"""
+
+
 class GigaChatClient:
     def __init__(self, api_key):
         if not api_key:
@@ -27,13 +31,39 @@ class GigaChatClient:
         
         logger.info("✅ GigaChatClient инициализирован")
 
-    def _authenticate(self, max_retries=3) -> bool:
-        """Аутентификация в GigaChat API с повторными попытками"""
+    @staticmethod
+    def _timeout(deadline, default):
+        """Таймаут HTTP запроса с учетом общего дедлайна (time.monotonic())"""
+        if deadline is None:
+            return default
+        return max(0.1, min(default, deadline - time.monotonic()))
+
+    @staticmethod
+    def _expired(deadline):
+        return deadline is not None and time.monotonic() >= deadline
+
+    @staticmethod
+    def _sleep(seconds, deadline):
+        """Пауза перед повтором, не выходящая за дедлайн"""
+        if deadline is not None:
+            seconds = min(seconds, max(0.0, deadline - time.monotonic()))
+        time.sleep(seconds)
+
+    def _authenticate(self, max_retries=3, deadline=None) -> bool:
+        """
+        Аутентификация в GigaChat API с повторными попытками
+
+        Args:
+            max_retries (int): Число попыток
+            deadline (float): Момент time.monotonic(), после которого попытки прекращаются
+        """
         if self.access_token and self.token_expires and datetime.now() < self.token_expires:
             logger.debug("✅ Используется существующий токен")
             return True
 
         for attempt in range(max_retries):
+            if self._expired(deadline):
+                break
             try:
                 # Генерируем уникальный RqUID
                 rq_uid = str(uuid.uuid4())
@@ -49,17 +79,17 @@ class GigaChatClient:
                     'scope': 'GIGACHAT_API_PERS'
                 }
 
-                logger.info(f"🔐 Попытка аутентификации {attempt + 1}/{max_retries}...")
+                logger.info(f"🔐 Попытка аутентификации {attempt + 1}/{max_retries}...", extra={'sampled': True})
                 
                 response = requests.post(
                     self.auth_url,
                     headers=headers,
                     data=payload,
                     verify=False,
-                    timeout=30
+                    timeout=self._timeout(deadline, 30)
                 )
 
-                logger.info(f"📊 Статус ответа аутентификации: {response.status_code}")
+                logger.info(f"📊 Статус ответа аутентификации: {response.status_code}", extra={'sampled': True})
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -79,34 +109,42 @@ class GigaChatClient:
                     if attempt < max_retries - 1:
                         wait_time = 2 ** attempt  # Экспоненциальная задержка
                         logger.info(f"⏳ Ожидание {wait_time} секунд перед повторной попыткой...")
-                        time.sleep(wait_time)
+                        self._sleep(wait_time, deadline)
 
             except requests.exceptions.Timeout:
                 logger.error(f"⏰ Таймаут при аутентификации (попытка {attempt + 1})")
                 if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
+                    self._sleep(2 ** attempt, deadline)
                 continue
                     
             except requests.exceptions.ConnectionError as e:
                 logger.error(f"🔌 Ошибка соединения при аутентификации (попытка {attempt + 1}): {e}")
                 if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
+                    self._sleep(2 ** attempt, deadline)
                 continue
                     
             except Exception as e:
                 logger.error(f"❌ Неожиданная ошибка при аутентификации (попытка {attempt + 1}): {e}")
                 if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
+                    self._sleep(2 ** attempt, deadline)
                 continue
 
         logger.error("❌ Все попытки аутентификации завершились неудачей")
         return False
 
-    def chat_completion(self, messages, temperature=0.7, max_tokens=1024, max_retries=3) -> Optional[str]:
-        """Отправка запроса к чат-модели GigaChat с повторными попытками"""
+    def chat_completion(self, messages, temperature=0.7, max_tokens=1024, max_retries=3, deadline=None) -> Optional[str]:
+        """
+        Отправка запроса к чат-модели GigaChat с повторными попытками
+
+        Args:
+            deadline (float): Момент time.monotonic(), к которому нужно уложиться
+                вместе с аутентификацией и всеми повторами
+        """
         for attempt in range(max_retries):
+            if self._expired(deadline):
+                break
             try:
-                if not self._authenticate():
+                if not self._authenticate(deadline=deadline):
                     return "Извините, произошла ошибка при подключении к AI-сервису."
 
                 headers = {
@@ -123,29 +161,29 @@ class GigaChatClient:
                     "stream": False
                 }
 
-                logger.info(f"💬 Попытка чат-запроса {attempt + 1}/{max_retries}")
+                logger.info(f"💬 Попытка чат-запроса {attempt + 1}/{max_retries}", extra={'sampled': True})
                 
                 response = requests.post(
                     f'{self.api_base_url}chat/completions',
                     headers=headers,
                     json=data,
                     verify=False,
-                    timeout=60  # Увеличиваем таймаут
+                    timeout=self._timeout(deadline, 60)  # Увеличиваем таймаут
                 )
 
-                logger.info(f"📊 Статус ответа чата: {response.status_code}")
+                logger.info(f"📊 Статус ответа чата: {response.status_code}", extra={'sampled': True})
                 
                 if response.status_code == 200:
                     result = response.json()
                     response_text = result['choices'][0]['message']['content']
-                    logger.info("✅ Успешно получен ответ от GigaChat")
+                    logger.info("✅ Успешно получен ответ от GigaChat", extra={'sampled': True})
                     return response_text
                 else:
                     logger.warning(f"⚠️ Ошибка чат-запроса: {response.status_code} - {response.text}")
                     if attempt < max_retries - 1:
                         wait_time = 2 ** attempt
                         logger.info(f"⏳ Ожидание {wait_time} секунд перед повторной попыткой...")
-                        time.sleep(wait_time)
+                        self._sleep(wait_time, deadline)
                         continue
                     else:
                         return "Извините, произошла ошибка при обработке запроса."
@@ -153,23 +191,68 @@ class GigaChatClient:
             except requests.exceptions.Timeout:
                 logger.error(f"⏰ Таймаут при запросе к GigaChat (попытка {attempt + 1})")
                 if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
+                    self._sleep(2 ** attempt, deadline)
                 continue
                 
             except requests.exceptions.ConnectionError as e:
                 logger.error(f"🔌 Ошибка соединения с GigaChat (попытка {attempt + 1}): {e}")
                 if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
+                    self._sleep(2 ** attempt, deadline)
                 continue
                 
             except Exception as e:
                 logger.error(f"❌ Неожиданная ошибка при запросе к GigaChat (попытка {attempt + 1}): {e}")
                 if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)
+                    self._sleep(2 ** attempt, deadline)
                 continue
 
         return "Извините, в настоящее время сервис недоступен. Пожалуйста, попробуйте позже."
 
+    def request_completion(self, messages, temperature=0.7, max_tokens=1024, deadline=None) -> str:
+        """
+        Одна попытка чат-запроса без повторов и без текстов-заглушек
+
+        Используется слоем устойчивости (gigachat.resilience), которому нужно
+        отличать ошибку от ответа.
+
+        Raises:
+            GigaChatUnavailable: ошибка аутентификации, сети или ответа API
+        """
+        if self._expired(deadline):
+            raise GigaChatUnavailable("Истек дедлайн запроса")
+        if not self._authenticate(max_retries=1, deadline=deadline):
+            raise GigaChatUnavailable("Ошибка аутентификации")
+
+        headers = {
+            'Authorization': f'Bearer {self.access_token}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+
+        data = {
+            "model": "GigaChat",
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": False
+        }
+
+        try:
+            response = requests.post(
+                f'{self.api_base_url}chat/completions',
+                headers=headers,
+                json=data,
+                verify=False,
+                timeout=self._timeout(deadline, 60)
+            )
+        except requests.exceptions.RequestException as e:
+            raise GigaChatUnavailable(f"Ошибка запроса к GigaChat: {e}") from e
+
+        if response.status_code != 200:
+            raise GigaChatUnavailable(f"Ошибка чат-запроса: {response.status_code} - {response.text[:200]}")
+
+        return response.json()['choices'][0]['message']['content']
+
     def get_embeddings(self, texts, max_retries=2) -> Optional[List[List[float]]]:
         """Получение эмбеддингов для текстов (оставлено для совместимости)"""
         logger.warning("⚠️ Метод get_embeddings больше не используется в новой архитектуре")
@@ -0,0 +1,182 @@
+# app/gigachat/resilience.py
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from gigachat.api_client import GigaChatUnavailable
+from metrics import metrics
+from profiling import request_profiler
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего API
+
+    После failure_threshold ошибок подряд размыкается и сразу отказывает
+    в запросах на recovery_timeout секунд. Затем пропускает один пробный
+    запрос: успех замыкает цепь, ошибка снова размыкает.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Можно ли сейчас отправить запрос"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Возвращает разрешение, если запрос так и не был отправлен"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self.state != self.CLOSED:
+                logger.info("✅ GigaChat снова доступен, предохранитель замкнут")
+            self.state = self.CLOSED
+            metrics.set_gauge('gigachat.circuit_open', 0)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"⚠️ GigaChat недоступен, предохранитель разомкнут на {self.recovery_timeout} с")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                metrics.set_gauge('gigachat.circuit_open', 1)
+
+
+class ResilientGigaChat:
+    """
+    Обертка над GigaChatClient с общим дедлайном, предохранителем и хеджированием
+
+    chat_completion(messages, deadline=...) либо возвращает текст ответа,
+    либо выбрасывает GigaChatUnavailable, чтобы бот мог ответить без LLM.
+    Если первый запрос не ответил за p95 обычной задержки, параллельно
+    отправляется второй, и используется тот ответ, что придет раньше.
+    """
+
+    def __init__(self, client, breaker=None, default_timeout=25.0, hedge=True,
+                 hedge_min_delay=2.0, max_attempts=2):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.default_timeout = default_timeout
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.max_attempts = max_attempts
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gigachat")
+
+    @classmethod
+    def from_config(cls, client, options):
+        """Создает обертку из секции "gigachat" конфигурации"""
+        options = options or {}
+        return cls(
+            client,
+            breaker=CircuitBreaker(
+                failure_threshold=options.get('failure_threshold', 5),
+                recovery_timeout=options.get('recovery_timeout', 30.0)
+            ),
+            default_timeout=options.get('request_timeout', 25.0),
+            hedge=options.get('hedge', True),
+            hedge_min_delay=options.get('hedge_min_delay', 2.0),
+            max_attempts=options.get('max_attempts', 2)
+        )
+
+    def __getattr__(self, name):
+        # Остальные методы (test_connection и т.д.) берутся у клиента
+        return getattr(self.client, name)
+
+    def _hedge_delay(self):
+        p95_ms = metrics.percentile('gigachat.latency_ms', 95)
+        return max(self.hedge_min_delay, (p95_ms or 0.0) / 1000)
+
+    def _attempt(self, messages, deadline, **kwargs):
+        started = time.monotonic()
+        result = self.client.request_completion(messages, deadline=deadline, **kwargs)
+        metrics.observe('gigachat.latency_ms', (time.monotonic() - started) * 1000)
+        return result
+
+    def chat_completion(self, messages, deadline=None, **kwargs):
+        """
+        Запрос к GigaChat в пределах дедлайна
+
+        Raises:
+            GigaChatUnavailable: предохранитель разомкнут, истек дедлайн или все попытки неудачны
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.default_timeout
+
+        # Дедлайн истек в очереди: GigaChat не виноват, предохранитель не трогаем
+        if deadline <= time.monotonic():
+            metrics.incr('gigachat.deadline_expired')
+            raise GigaChatUnavailable("Истек дедлайн запроса к GigaChat")
+
+        if not self.breaker.allow():
+            metrics.incr('gigachat.short_circuited')
+            raise GigaChatUnavailable("Предохранитель GigaChat разомкнут")
+
+        pending = set()
+        attempts = 0
+        last_error = None
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            if attempts < self.max_attempts and (not pending or self.hedge):
+                pending.add(self._executor.submit(request_profiler.inherit(self._attempt), messages, deadline, **kwargs))
+                attempts += 1
+                if attempts > 1:
+                    metrics.incr('gigachat.hedged')
+
+            # Пока можно отправить еще одну попытку, ждем не дольше задержки хеджирования
+            can_hedge = self.hedge and attempts < self.max_attempts
+            timeout = min(remaining, self._hedge_delay()) if can_hedge else remaining
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                self.breaker.record_success()
+                return result
+
+            if not pending and attempts >= self.max_attempts:
+                break
+
+        if not attempts:
+            self.breaker.release()
+            metrics.incr('gigachat.deadline_expired')
+            raise GigaChatUnavailable("Истек дедлайн запроса к GigaChat")
+
+        self.breaker.record_failure()
+        metrics.incr('gigachat.failed')
+        raise GigaChatUnavailable(str(last_error or "Истек дедлайн запроса к GigaChat"))
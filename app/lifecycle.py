@@ -0,0 +1,164 @@
+# app/lifecycle.py
+import asyncio
+import inspect
+import logging
+import signal
+import sys
+import time
+from functools import wraps
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    """
+    Корректная остановка бота
+
+    По SIGINT/SIGTERM:
+    1. перестает получать обновления от Telegram;
+    2. ждет завершения уже принятых сообщений не дольше drain_timeout,
+       незавершенные отменяет;
+    3. останавливает приложение и по порядку выполняет хуки остановки:
+       фоновые задачи, запись аналитики, сохранение кэшей и индекса.
+    """
+
+    def __init__(self, drain_timeout=20.0, hook_timeout=30.0):
+        """
+        Args:
+            drain_timeout (float): Сколько секунд ждать обрабатываемые сообщения
+            hook_timeout (float): Предел для одного асинхронного хука остановки
+        """
+        self.drain_timeout = drain_timeout
+        self.hook_timeout = hook_timeout
+        self.draining = False
+        self.applications = []
+        self._inflight = set()
+        self._hooks = []
+        self._stopping = None
+        self._hooks_done = False
+
+    @classmethod
+    def from_config(cls, options):
+        """Создает менеджер из секции "shutdown" конфигурации"""
+        options = options or {}
+        return cls(
+            drain_timeout=options.get('drain_timeout', 20.0),
+            hook_timeout=options.get('hook_timeout', 30.0)
+        )
+
+    @property
+    def handles_signals(self):
+        """Может ли менеджер сам перехватить сигналы остановки (не на Windows)"""
+        return sys.platform != 'win32'
+
+    @property
+    def inflight(self):
+        return len(self._inflight)
+
+    def add_hook(self, name, func):
+        """
+        Добавляет шаг остановки; шаги выполняются в порядке добавления
+
+        Args:
+            name (str): Имя шага для журнала
+            func: Функция без аргументов, обычная или асинхронная. Обычные
+                функции выполняются в отдельном потоке, чтобы не блокировать цикл
+        """
+        self._hooks.append((name, func))
+
+    def tracked(self, handler, cancelled_reply=None):
+        """
+        Оборачивает обработчик обновлений, чтобы при остановке дождаться его
+
+        Args:
+            handler: Асинхронный обработчик (update, context)
+            cancelled_reply (str): Что ответить, если обработка прервана остановкой
+        """
+        @wraps(handler)
+        async def wrapper(update, context):
+            task = asyncio.current_task()
+            self._inflight.add(task)
+            metrics.set_gauge('lifecycle.inflight', len(self._inflight))
+            try:
+                return await handler(update, context)
+            except asyncio.CancelledError:
+                if self.draining and cancelled_reply and update.message:
+                    try:
+                        await asyncio.wait_for(update.message.reply_text(cancelled_reply), 3)
+                    except Exception:
+                        pass
+                raise
+            finally:
+                self._inflight.discard(task)
+                metrics.set_gauge('lifecycle.inflight', len(self._inflight))
+        return wrapper
+
+    def install(self, *applications):
+        """
+        Перехватывает сигналы остановки в цикле событий приложений
+
+        Несколько приложений (по одному на токен бота) останавливаются вместе.
+        """
+        installed = bool(self.applications)
+        self.applications.extend(app for app in applications if app not in self.applications)
+        if not self.handles_signals or installed:
+            return
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.request_stop, signum)
+
+    def request_stop(self, signum=None):
+        if self._stopping is None:
+            name = signal.Signals(signum).name if signum else "запрос"
+            logger.info(f"🛑 Получен {name}: останавливаемся")
+            self._stopping = asyncio.ensure_future(self._stop())
+
+    async def _stop(self):
+        # Новые обновления больше не запрашиваются
+        for application in self.applications:
+            updater = application.updater
+            if updater is not None and updater.running:
+                await updater.stop()
+        await self.drain()
+        for application in self.applications:
+            application.stop_running()
+
+    async def drain(self):
+        """Ждет обрабатываемые сообщения, по истечении drain_timeout отменяет их"""
+        self.draining = True
+        current = asyncio.current_task()
+        pending = {task for task in self._inflight if task is not current and not task.done()}
+        if not pending:
+            return
+
+        logger.info(f"⏳ Ожидание {len(pending)} обрабатываемых сообщений (до {self.drain_timeout:g} с)")
+        started = time.monotonic()
+        done, pending = await asyncio.wait(pending, timeout=self.drain_timeout)
+        metrics.set_gauge('lifecycle.drain_seconds', round(time.monotonic() - started, 1))
+        if pending:
+            metrics.incr('lifecycle.cancelled', len(pending))
+            logger.warning(f"⚠️ Не дождались {len(pending)} сообщений, обработка прервана")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        else:
+            logger.info(f"✅ Все сообщения обработаны за {time.monotonic() - started:.1f} с")
+
+    async def run_hooks(self):
+        """Выполняет шаги остановки; ошибка одного шага не мешает остальным"""
+        if self._hooks_done:
+            return
+        self._hooks_done = True
+
+        for name, func in self._hooks:
+            started = time.monotonic()
+            try:
+                if inspect.iscoroutinefunction(func):
+                    await asyncio.wait_for(func(), self.hook_timeout)
+                else:
+                    await asyncio.to_thread(func)
+                logger.info(f"🛑 {name}: {(time.monotonic() - started) * 1000:.0f} мс")
+            except Exception as e:
+                logger.error(f"❌ Ошибка при остановке ({name}): {e}")
@@ -0,0 +1,139 @@
+# app/logging_config.py
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+DEFAULT_LOGGING_CONFIG = {
+    'level': 'INFO',
+    'file': 'cosmos_bot.log',
+    'max_bytes': 10 * 1024 * 1024,
+    'backup_count': 5,
+    'json': False,
+    'queue': True,
+    'queue_size': 10000,
+    'sample_rate': 1.0
+}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует записи лога в одну JSON-строку"""
+
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record),
+            'logger': record.name,
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только часть «болтливых» записей уровня INFO и ниже
+
+    Запись считается болтливой, если при логировании передан extra={'sampled': True}.
+    Предупреждения и ошибки проходят всегда.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1.0 or record.levelno > logging.INFO:
+            return True
+        if not getattr(record, 'sampled', False):
+            return True
+        return random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который отбрасывает записи при переполнении очереди"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(options=None):
+    """
+    Настраивает логирование приложения
+
+    В режиме очереди обработчики файла и консоли работают в отдельном потоке
+    QueueListener, поэтому запись на диск не блокирует цикл событий бота.
+    Повторный вызов перенастраивает логирование с новыми параметрами.
+
+    Args:
+        options (dict): Секция "logging" из конфигурации
+    """
+    global _listener
+
+    settings = dict(DEFAULT_LOGGING_CONFIG)
+    settings.update(options or {})
+
+    stop_logging()
+
+    formatter = JsonFormatter() if settings['json'] else logging.Formatter(LOG_FORMAT)
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if settings['file']:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            settings['file'],
+            maxBytes=settings['max_bytes'],
+            backupCount=settings['backup_count'],
+            encoding='utf-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(settings['level'])
+
+    sampling_filter = SamplingFilter(settings['sample_rate'])
+
+    if settings['queue']:
+        queue_handler = DroppingQueueHandler(queue.Queue(settings['queue_size']))
+        queue_handler.addFilter(sampling_filter)
+        root.addHandler(queue_handler)
+
+        _listener = logging.handlers.QueueListener(
+            queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        _listener.start()
+    else:
+        for handler in handlers:
+            handler.addFilter(sampling_filter)
+            root.addHandler(handler)
+
+
+def stop_logging():
+    """Останавливает фоновый поток логирования, дописывая оставшиеся записи"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
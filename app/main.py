@@ -1,51 +1,18 @@
 # app/main.py
 import logging
-import sys
 import os
-import json
-from database.mysql_db import MySQLTextDB
-from gigachat.api_client import GigaChatClient
-from processing.data_parser import DataParser
-from bot.telegram_bot import TelegramBot
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("cosmos_bot.log", encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import threading
+from logging_config import setup_logging, stop_logging
+from processing.data_parser import crawl_documents
+from profiling import request_profiler
+from settings import load_config
+from startup import startup_profiler
+from tenants import tenant_configs
 
-logger = logging.getLogger(__name__)
+# Тяжелые модули (sklearn, requests, BeautifulSoup, python-telegram-bot)
+# импортируются внутри функций, когда они действительно нужны
 
-def load_config(config_path="config.json"):
-    """
-    Загружает конфигурацию из JSON файла
-    
-    Args:
-        config_path (str): Путь к файлу конфигурации
-    
-    Returns:
-        dict: Словарь с конфигурацией
-    """
-    try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        
-        logger.info(f"✅ Конфигурация загружена из {config_path}")
-        return config
-        
-    except FileNotFoundError:
-        logger.error(f"❌ Файл конфигурации {config_path} не найден")
-        raise
-    except json.JSONDecodeError as e:
-        logger.error(f"❌ Ошибка парсинга JSON в файле {config_path}: {e}")
-        raise
-    except Exception as e:
-        logger.error(f"❌ Неожиданная ошибка при загрузке конфигурации: {e}")
-        raise
+logger = logging.getLogger(__name__)
 
 def validate_config(config):
     """
@@ -63,6 +30,23 @@ def validate_config(config):
         'mysql_config',
         'camp_url'
     ]
+
+    # Токен и сайт можно задать у каждого лагеря вместо общих
+    try:
+        camps = tenant_configs(config)
+    except ValueError as e:
+        logger.error(f"❌ {e}")
+        return False
+    for camp_config in camps:
+        for field in ('telegram_bot_token', 'camp_url'):
+            if not camp_config.get(field):
+                logger.error(f"❌ У лагеря {camp_config['tenant']} не задано поле {field}")
+                return False
+        if not camp_config['contacts'].get('phone'):
+            logger.error(f"❌ У лагеря {camp_config['tenant']} не задано поле contacts.phone")
+            return False
+    if camps:
+        required_fields = ['gigachat_api_key', 'mysql_config']
     
     for field in required_fields:
         if field not in config:
@@ -77,7 +61,7 @@ def validate_config(config):
             return False
     
     # Проверяем токены
-    if not config['telegram_bot_token']:
+    if not camps and not config['telegram_bot_token']:
         logger.error("❌ TELEGRAM_BOT_TOKEN не может быть пустым")
         return False
         
@@ -88,31 +72,52 @@ def validate_config(config):
     logger.info("✅ Конфигурация прошла валидацию")
     return True
 
-def setup_database(database, camp_url):
+def setup_database(database, camp_url, faq_path=None, snapshot_path=None, dedup_options=None, builtin_faq=True):
     """
     Настраивает базу данных и загружает информацию
     
     Args:
         database: Экземпляр базы данных
         camp_url (str): URL лагеря для парсинга
+        faq_path (str): Путь к JSON файлу с FAQ (необязательно)
+        snapshot_path (str): Путь к снимку корпуса. Если снимок есть, документы
+            загружаются из него без обращения к сайтам, иначе он записывается после парсинга
+        dedup_options (dict): Секция "dedup" конфигурации
+        builtin_faq (bool): Можно ли использовать встроенный FAQ, если своего нет
     """
     try:
-        count = database.get_document_count()
+        count = database.get_document_count(replica=False)
         if count > 0:
             logger.info(f"В базе уже есть {count} документов, пропускаем загрузку")
             return
 
+        if snapshot_path and os.path.exists(snapshot_path):
+            from processing.snapshot import restore
+
+            try:
+                restored = restore(database, snapshot_path)
+                if restored:
+                    logger.info(f"Загружено {restored} документов из снимка {snapshot_path}")
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось восстановить корпус из снимка: {e}")
+
         logger.info("Начинаем загрузку данных в базу...")
 
-        parser = DataParser(camp_url)
-        website_data = parser.parse_website()
-        faq_data = parser.create_sample_faq()
-        all_data = website_data + faq_data
+        all_data = crawl_documents(camp_url, faq_path, dedup_options, builtin_faq)
 
         if not all_data:
             logger.warning("Не удалось получить данные для базы")
             return
 
+        if snapshot_path:
+            from processing.snapshot import write_snapshot
+
+            try:
+                write_snapshot(all_data, snapshot_path, source=camp_url)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось сохранить снимок корпуса: {e}")
+
         database.store_documents(all_data)
         logger.info(f"Успешно загружено {len(all_data)} документов в базу")
 
@@ -127,6 +132,11 @@ def update_bot_contacts(bot, config):
         bot: Экземпляр бота
         config (dict): Конфигурация
     """
+    if config.get('tenant'):
+        # Контакты лагеря по умолчанию другим лагерям не подходят
+        bot.contact_phone = None
+        bot.contact_email = None
+
     if 'contacts' in config:
         if 'phone' in config['contacts']:
             bot.contact_phone = config['contacts']['phone']
@@ -134,58 +144,330 @@ def update_bot_contacts(bot, config):
             bot.contact_email = config['contacts']['email']
     
     bot.camp_website = config['camp_url']
+    if 'camp_name' in config:
+        bot.camp_name = config['camp_name']
+        bot.camp_title = config.get('camp_title', f'детского лагеря "{bot.camp_name}"')
+
+def open_databases(config, camps, lazy_index):
+    """
+    Подключается к MySQL
+
+    Returns:
+        dict: ID лагеря (None при работе с одним лагерем) -> MySQLTextDB.
+            Базы лагерей используют общие пулы соединений первой базы,
+            а их индексы загружаются при первом вопросе в пределах общего бюджета памяти
+    """
+    from database.mysql_db import MySQLTextDB
+
+    if not camps:
+        database = MySQLTextDB(
+            config['mysql_config'],
+            lazy_index=lazy_index,
+            retrieval_options=config.get('retrieval')
+        )
+        return {None: database}
+
+    from database.index_budget import IndexBudget
+
+    budget = IndexBudget.from_config(config.get('tenants'))
+    databases = {}
+    shared = None
+    for camp_config in camps:
+        database = MySQLTextDB(
+            config['mysql_config'],
+            lazy_index=True,
+            retrieval_options=config.get('retrieval'),
+            tenant=camp_config['tenant'],
+            shared=shared,
+            index_budget=budget
+        )
+        shared = shared or database
+        databases[camp_config['tenant']] = database
+    logger.info(
+        f"🏕️ Лагерей: {len(camps)}, бюджет памяти индексов {budget.max_bytes // (1024 * 1024)} МиБ"
+    )
+    return databases
+
+def build_bot(config, database, gigachat_client, shared, lazy_index=False):
+    """
+    Готовит базу знаний лагеря и создает его бота
+
+    Args:
+        config (dict): Конфигурация лагеря
+        database: Экземпляр MySQLTextDB лагеря
+        gigachat_client: Общий клиент GigaChat
+        shared (dict): Общие для всех лагерей admission, scheduler, lifecycle
+            и ведра токенов рассылок по токенам ботов
+        lazy_index (bool): Индекс загружается в фоне (при работе с одним лагерем)
+
+    Returns:
+        TelegramBot или None, если база знаний пуста
+    """
+    tenant = config.get('tenant')
+    suffix = f'.{tenant}' if tenant else ''
+    # Встроенный FAQ написан для лагеря "Космос"; у лагерей из секции tenants только свой
+    builtin_faq = not tenant
+
+    # Настройка базы данных
+    with startup_profiler.stage(f'setup_database{suffix}'):
+        snapshot_path = config.get('snapshot_file', 'corpus_snapshot.jsonl.gz')
+        setup_database(
+            database, config['camp_url'], config.get('faq_file'),
+            snapshot_path=snapshot_path, dedup_options=config.get('dedup'),
+            builtin_faq=builtin_faq
+        )
+
+    # Проверяем что данные загружены
+    count = database.get_document_count(replica=False)
+    if count == 0:
+        logger.error(f"В базе{' лагеря ' + tenant if tenant else ''} нет данных! Бот не может работать без базы знаний.")
+        return None
+
+    logger.info(f"База данных{' лагеря ' + tenant if tenant else ''} готова, документов: {count}")
+
+    # Кэш поиска прогревается запросами, сохраненными при прошлой остановке.
+    # Индексы нескольких лагерей загружаются только по первому вопросу, их не прогреваем
+    if not tenant:
+        warm_state_path = config.get('shutdown', {}).get('warm_state_file', 'warm_queries.json')
+
+        def on_index_ready():
+            startup_profiler.mark_ready('index_loaded')
+            database.warm_up(warm_state_path)
+
+        if lazy_index:
+            database.load_index_in_background(on_ready=on_index_ready)
+        else:
+            threading.Thread(
+                target=database.warm_up, args=(warm_state_path,), name="cache-warmup", daemon=True
+            ).start()
+
+    # Запись статистики вопросов в фоне
+    analytics = None
+    if config.get('analytics', {}).get('enabled', True):
+        from database.analytics import AnalyticsWriter
+
+        analytics = AnalyticsWriter.from_config(database, config.get('analytics'))
+        analytics.start()
+
+    # Периодическое обновление базы знаний с сайта
+    refresher = None
+    if config.get('refresh', {}).get('enabled', True):
+        from processing.refresh import KnowledgeRefresher
+
+        refresher = KnowledgeRefresher.from_config(
+            database,
+            lambda: crawl_documents(config['camp_url'], config.get('faq_file'), config.get('dedup'), builtin_faq),
+            config.get('refresh'),
+            snapshot_path=snapshot_path
+        )
+
+    # Рассылка объявлений всем, кто писал боту
+    subscribers = None
+    broadcaster = None
+    if config.get('broadcast', {}).get('enabled', True):
+        from bot.admission import TokenBucket
+        from bot.broadcast import Broadcaster, SubscriberStore
+
+        broadcast_options = config.get('broadcast') or {}
+        # Лимит Telegram задан на бота: лагеря с общим токеном делят одно ведро
+        bucket = shared['broadcast_buckets'].setdefault(
+            config['telegram_bot_token'],
+            TokenBucket(broadcast_options.get('rate', 20.0), broadcast_options.get('burst', 20))
+        )
+        subscribers = SubscriberStore(database)
+        try:
+            subscribers.load()
+            broadcaster = Broadcaster.from_config(database, subscribers, broadcast_options, bucket=bucket)
+        except Exception as e:
+            logger.warning(f"⚠️ Рассылки отключены: {e}")
+            subscribers = None
+
+    # Создаем и настраиваем бота
+    with startup_profiler.stage(f'bot_init{suffix}'):
+        from bot.telegram_bot import TelegramBot
+        from bot.conversation import ConversationStore
+        from processing.prompt_budget import ContextAssembler
+        from processing.faq_index import FAQIndex
+        from processing.data_parser import load_faq_entries
+
+        bot = TelegramBot(
+            config['telegram_bot_token'], 
+            gigachat_client, 
+            database,
+            admission=shared['admission'],
+            admin_ids=config.get('admin_ids', []),
+            context_assembler=ContextAssembler.from_config(config.get('prompt')),
+            faq_index=FAQIndex(
+                lambda: load_faq_entries(config.get('faq_file'), builtin=builtin_faq),
+                threshold=config.get('faq_threshold', 0.85)
+            ),
+            conversations=ConversationStore.from_config(config.get('conversation')),
+            analytics=analytics,
+            request_timeout=config.get('gigachat', {}).get('request_timeout', 25.0),
+            scheduler=shared['scheduler'],
+            refresher=refresher,
+            subscribers=subscribers,
+            broadcaster=broadcaster,
+            lifecycle=shared['lifecycle'],
+            tenant=tenant
+        )
+
+    # Обновляем контактные данные
+    update_bot_contacts(bot, config)
+    return bot
+
+def add_shutdown_hooks(lifecycle, bots, scheduler, config):
+    """
+    Шаги остановки после того, как все принятые сообщения обработаны:
+    сначала фоновые задачи, затем запись накопленного и сохранение состояния
+    """
+    for bot in bots:
+        name = f' ({bot.tenant})' if bot.tenant else ''
+        if bot.broadcaster:
+            lifecycle.add_hook(f'рассылки{name}', bot.broadcaster.stop)
+        if bot.refresher:
+            lifecycle.add_hook(f'обновление базы знаний{name}', bot.refresher.stop)
+        if bot.faq_index:
+            lifecycle.add_hook(f'индекс FAQ{name}', bot.faq_index.stop)
+    lifecycle.add_hook('очередь GigaChat', scheduler.stop)
+    for bot in bots:
+        name = f' ({bot.tenant})' if bot.tenant else ''
+        if bot.analytics:
+            lifecycle.add_hook(f'аналитика{name}', bot.analytics.stop)
+        lifecycle.add_hook(f'индекс{name}', bot.db.persist_index)
+        if not bot.tenant:
+            warm_state_path = config.get('shutdown', {}).get('warm_state_file', 'warm_queries.json')
+            lifecycle.add_hook('кэш поиска', lambda database=bot.db: database.save_warm_state(warm_state_path))
+    lifecycle.add_hook('профили', request_profiler.dump)
+
+def run_bots(bots, lifecycle, databases):
+    """
+    Запускает ботов нескольких лагерей в одном цикле событий
+
+    Лагеря с общим токеном обслуживаются одним ботом с выбором лагеря
+    по чату, у лагеря с собственным токеном свой бот.
+
+    Args:
+        bots (list): Пары (TelegramBot, конфигурация лагеря)
+    """
+    from bot.tenants import ChatRouter, TenantDispatcher, run_tenants
+
+    by_token = {}
+    for bot, camp_config in bots:
+        by_token.setdefault(bot.token, []).append((bot, camp_config))
+
+    groups = []
+    for token, members in by_token.items():
+        if len(members) == 1:
+            bot = members[0][0]
+            groups.append((bot.build_application(standalone=False), [bot]))
+            continue
+
+        static_routes = {}
+        default = None
+        for bot, camp_config in members:
+            for chat_id in camp_config.get('chat_ids', []):
+                static_routes[chat_id] = bot.tenant
+            if camp_config.get('default') and default is None:
+                default = bot.tenant
+        router = ChatRouter(
+            databases[members[0][0].tenant], [bot.tenant for bot, _ in members], static_routes, default
+        )
+        router.load()
+        dispatcher = TenantDispatcher(token, {bot.tenant: bot for bot, _ in members}, router, lifecycle)
+        groups.append((dispatcher.build_application(), [bot for bot, _ in members]))
+
+    run_tenants(groups, lifecycle)
 
 def main():
     """Основная функция приложения"""
+    # Настройка логирования (параметры по умолчанию до загрузки конфигурации)
+    setup_logging()
     try:
         logger.info("Запуск приложения лагеря 'Космос'...")
         
         # Загружаем конфигурацию
-        config = load_config("config.json")
+        with startup_profiler.stage('config'):
+            config = load_config("config.json")
+
+        # Применяем настройки логирования из конфигурации
+        if 'logging' in config:
+            setup_logging(config['logging'])
         
         # Проверяем конфигурацию
         if not validate_config(config):
             logger.error("❌ Невалидная конфигурация. Завершение работы.")
             return
+
+        # Несколько лагерей в одном процессе (секция "tenants"); пустой список - один лагерь
+        camps = tenant_configs(config)
+
+        # Профилирование вопросов (по умолчанию выключено, включается /profile или SIGUSR2)
+        request_profiler.configure(config.get('profiling'))
+
+        # В ленивом режиме TF-IDF модель загружается в фоне, пока запускается опрос Telegram
+        lazy_index = config.get('startup', {}).get('lazy_index', False)
         
         # Инициализация клиентов
-        gigachat_client = GigaChatClient(config['gigachat_api_key'])
-        database = MySQLTextDB(config['mysql_config'])
+        with startup_profiler.stage('gigachat_client'):
+            from gigachat.api_client import GigaChatClient
+            from gigachat.resilience import ResilientGigaChat
 
-        # Настройка базы данных
-        setup_database(database, config['camp_url'])
+            # Дедлайн, предохранитель и хеджирование запросов поверх клиента
+            gigachat_client = ResilientGigaChat.from_config(
+                GigaChatClient(config['gigachat_api_key']),
+                config.get('gigachat')
+            )
 
-        # Проверяем что данные загружены
-        count = database.get_document_count()
-        if count == 0:
-            logger.error("В базе нет данных! Бот не может работать без базы знаний.")
-            return
+        with startup_profiler.stage('database'):
+            databases = open_databases(config, camps, lazy_index)
 
-        logger.info(f"База данных готова, документов: {count}")
+        from bot.admission import AdmissionController
+        from bot.scheduler import LLMScheduler
+        from lifecycle import Lifecycle
 
-        # Создаем и настраиваем бота
-        bot = TelegramBot(
-            config['telegram_bot_token'], 
-            gigachat_client, 
-            database
-        )
-        
-        # Обновляем контактные данные
-        update_bot_contacts(bot, config)
+        # Очередь GigaChat, ограничение частоты и остановка общие для всех лагерей
+        scheduler = LLMScheduler.from_config(config.get('scheduler'))
+        lifecycle = Lifecycle.from_config(config.get('shutdown'))
+        shared = {
+            'admission': AdmissionController.from_config(config.get('rate_limit')),
+            'scheduler': scheduler,
+            'lifecycle': lifecycle,
+            'broadcast_buckets': {}
+        }
+
+        bots = []
+        for camp_config in camps or [config]:
+            bot = build_bot(
+                camp_config, databases[camp_config.get('tenant')], gigachat_client, shared,
+                lazy_index=lazy_index
+            )
+            if bot is not None:
+                bots.append((bot, camp_config))
+        if not bots:
+            return
+
+        add_shutdown_hooks(lifecycle, [bot for bot, _ in bots], scheduler, config)
         
         # Запускаем бота
         logger.info("🤖 Запуск Telegram бота...")
-        bot.run()
+        if camps:
+            run_bots(bots, lifecycle, databases)
+        else:
+            bots[0][0].run()
 
     except KeyboardInterrupt:
         logger.info("Приложение остановлено пользователем")
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}")
     finally:
-        # Закрываем соединения
-        if 'database' in locals():
+        # Закрываем соединения; аналитику уже остановил хук жизненного цикла
+        # Базы лагерей закрываются раньше базы, владеющей общими пулами
+        for database in reversed(list(locals().get('databases', {}).values())):
             database.close()
+        if locals().get('databases'):
             logger.info("🔌 Соединение с базой данных закрыто")
+        stop_logging()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
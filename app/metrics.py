@@ -0,0 +1,84 @@
+# app/metrics.py
+import threading
+from collections import deque
+
+
+class Metrics:
+    """Простой потокобезопасный реестр счетчиков, показателей и распределений"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._observations = {}
+
+    def incr(self, name, value=1):
+        """Увеличивает счетчик"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Устанавливает текущее значение показателя"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value):
+        """Добавляет наблюдение в скользящее окно распределения"""
+        with self._lock:
+            values = self._observations.get(name)
+            if values is None:
+                values = self._observations[name] = deque(maxlen=self.window)
+            values.append(value)
+
+    def get_counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def percentile(self, name, q):
+        """Возвращает перцентиль q (0-100) по скользящему окну или None"""
+        with self._lock:
+            values = sorted(self._observations.get(name, ()))
+        if not values:
+            return None
+        index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+        return values[index]
+
+    def snapshot(self):
+        """Возвращает копию всех метрик"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            observations = {name: sorted(values) for name, values in self._observations.items()}
+
+        summaries = {}
+        for name, values in observations.items():
+            if not values:
+                continue
+            summaries[name] = {
+                'count': len(values),
+                'avg': sum(values) / len(values),
+                'p50': values[len(values) // 2],
+                'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+                'max': values[-1]
+            }
+
+        return {'counters': counters, 'gauges': gauges, 'summaries': summaries}
+
+    def format_report(self):
+        """Форматирует метрики в читаемый текст"""
+        data = self.snapshot()
+        lines = []
+        for name, value in sorted(data['counters'].items()):
+            lines.append(f"{name}: {value}")
+        for name, value in sorted(data['gauges'].items()):
+            lines.append(f"{name}: {round(value, 3) if isinstance(value, float) else value}")
+        for name, summary in sorted(data['summaries'].items()):
+            lines.append(
+                f"{name}: n={summary['count']} avg={summary['avg']:.3f} "
+                f"p50={summary['p50']:.3f} p95={summary['p95']:.3f} max={summary['max']:.3f}"
+            )
+        return "\n".join(lines) if lines else "Метрик пока нет"
+
+
+metrics = Metrics()
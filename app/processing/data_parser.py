@@ -1,17 +1,87 @@
 # app/processing/data_parser.py
-import requests
-from bs4 import BeautifulSoup
 import re
 import logging
 from urllib.parse import urljoin
 import time
+import json
+import os
 
 logger = logging.getLogger(__name__)
 
+# Курируемые пары вопрос/ответ; используются и как документы базы, и для быстрого ответа
+SAMPLE_FAQ = [
+    {
+        'question': 'Какие документы нужны для заезда в лагерь?',
+        'answer': 'Для заезда в лагерь необходимы: паспорт родителя, свидетельство о рождении ребенка, медицинская справка формы 079/у, справка об отсутствии контактов с инфекционными больными, копия медицинского полиса.',
+        'type': 'faq'
+    },
+    {
+        'question': 'Какова стоимость путевки?',
+        'answer': 'Стоимость путевки зависит от сезона и программы смены. Актуальные цены уточняйте у администрации лагеря по телефону.',
+        'type': 'faq'
+    },
+    {
+        'question': 'Какие меры безопасности предусмотрены в лагере?',
+        'answer': 'Лагерь обеспечен круглосуточной охраной, видеонаблюдением, медицинским пунктом. Все вожатые проходят специальную подготовку по безопасности детей.',
+        'type': 'faq'
+    },
+    {
+        'question': 'Какие возрастные группы принимаются в лагерь?',
+        'answer': 'Лагерь принимает детей в возрасте от 7 до 17 лет. Группы формируются по возрастным категориям.',
+        'type': 'faq'
+    },
+    {
+        'question': 'Есть ли в лагере Wi-Fi?',
+        'answer': 'На территории лагеря есть ограниченный доступ к Wi-Fi для детей в специально отведенное время.',
+        'type': 'faq'
+    },
+    {
+        'question': 'Какая ответственность администрации лагеря за безопасность детей?',
+        'answer': 'Администрация лагеря несет полную ответственность за безопасность детей согласно законодательству РФ, включая Федеральный закон №124-ФЗ, Гражданский кодекс РФ и другие нормативные акты.',
+        'type': 'faq'
+    }
+]
+
+
+def load_faq_entries(faq_path=None, builtin=True):
+    """
+    Загружает записи FAQ
+
+    Args:
+        faq_path (str): Путь к JSON файлу со списком {"question", "answer"}.
+            Если не указан или не найден, используются встроенные записи.
+        builtin (bool): Можно ли подставить встроенные записи. Они относятся
+            к лагерю "Космос", поэтому у других лагерей без FAQ список пуст
+
+    Returns:
+        list: Список словарей с полями question и answer
+    """
+    if faq_path and os.path.exists(faq_path):
+        try:
+            with open(faq_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось загрузить FAQ из {faq_path}: {e}")
+    elif faq_path and not builtin:
+        logger.warning(f"⚠️ Файл FAQ {faq_path} не найден")
+    return SAMPLE_FAQ if builtin else []
+
+
+def _make_soup(html):
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(html, 'html.parser')
+
 
 class DataParser:
-    def __init__(self, base_url):
+    def __init__(self, base_url, faq_path=None, builtin_faq=True):
         self.base_url = base_url
+        self.faq_path = faq_path
+        self.builtin_faq = builtin_faq
+
+        # requests и BeautifulSoup нужны только при парсинге, импортируем их здесь
+        import requests
+
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -95,7 +165,7 @@ class DataParser:
                 response = self.session.get(law['url'], timeout=15)
                 response.raise_for_status()
 
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = _make_soup(response.text)
 
                 # Удаляем скрипты и стили
                 for element in soup(["script", "style", "nav", "header", "footer"]):
@@ -203,7 +273,7 @@ class DataParser:
                 response = self.session.get(url, timeout=15)
                 response.raise_for_status()
 
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = _make_soup(response.text)
 
                 # Удаляем скрипты и стили
                 for element in soup(["script", "style", "nav", "header", "footer"]):
@@ -250,7 +320,7 @@ class DataParser:
             try:
                 logger.info("Пробуем распарсить главную страницу...")
                 response = self.session.get(self.base_url, timeout=15)
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = _make_soup(response.text)
                 
                 for element in soup(["script", "style", "nav", "header", "footer"]):
                     element.decompose()
@@ -303,38 +373,7 @@ class DataParser:
 
     def create_sample_faq(self):
         """Создание образцов FAQ"""
-        sample_faq = [
-            {
-                'question': 'Какие документы нужны для заезда в лагерь?',
-                'answer': 'Для заезда в лагерь необходимы: паспорт родителя, свидетельство о рождении ребенка, медицинская справка формы 079/у, справка об отсутствии контактов с инфекционными больными, копия медицинского полиса.',
-                'type': 'faq'
-            },
-            {
-                'question': 'Какова стоимость путевки?',
-                'answer': 'Стоимость путевки зависит от сезона и программы смены. Актуальные цены уточняйте у администрации лагеря по телефону.',
-                'type': 'faq'
-            },
-            {
-                'question': 'Какие меры безопасности предусмотрены в лагере?',
-                'answer': 'Лагерь обеспечен круглосуточной охраной, видеонаблюдением, медицинским пунктом. Все вожатые проходят специальную подготовку по безопасности детей.',
-                'type': 'faq'
-            },
-            {
-                'question': 'Какие возрастные группы принимаются в лагерь?',
-                'answer': 'Лагерь принимает детей в возрасте от 7 до 17 лет. Группы формируются по возрастным категориям.',
-                'type': 'faq'
-            },
-            {
-                'question': 'Есть ли в лагере Wi-Fi?',
-                'answer': 'На территории лагеря есть ограниченный доступ к Wi-Fi для детей в специально отведенное время.',
-                'type': 'faq'
-            },
-            {
-                'question': 'Какая ответственность администрации лагеря за безопасность детей?',
-                'answer': 'Администрация лагеря несет полную ответственность за безопасность детей согласно законодательству РФ, включая Федеральный закон №124-ФЗ, Гражданский кодекс РФ и другие нормативные акты.',
-                'type': 'faq'
-            }
-        ]
+        sample_faq = load_faq_entries(self.faq_path, builtin=self.builtin_faq)
 
         documents = []
         for i, item in enumerate(sample_faq):
@@ -347,4 +386,23 @@ class DataParser:
             })
 
         logger.info(f"📋 Создано FAQ документов: {len(documents)}")
-        return documents
\ No newline at end of file
+        return documents
+
+
+def crawl_documents(camp_url, faq_path=None, dedup_options=None, builtin_faq=True):
+    """
+    Парсит сайт лагеря, юридические документы и FAQ
+
+    Почти одинаковые чанки (общие шапки страниц, FAQ, повторяющий сайт)
+    отбрасываются, если дедупликация не выключена в секции "dedup".
+    Встроенный FAQ лагеря "Космос" добавляется, только если builtin_faq.
+    """
+    parser = DataParser(camp_url, faq_path=faq_path, builtin_faq=builtin_faq)
+    documents = parser.parse_website() + parser.create_sample_faq()
+
+    dedup_options = dedup_options or {}
+    if documents and dedup_options.get('enabled', True):
+        from processing.dedup import NearDuplicateFilter
+
+        documents, _ = NearDuplicateFilter.from_config(dedup_options).filter(documents)
+    return documents
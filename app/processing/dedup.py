@@ -0,0 +1,164 @@
+# app/processing/dedup.py
+import logging
+import re
+import zlib
+
+import numpy as np
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Простое число Мерсенна для универсального хэширования MinHash
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Какой из почти одинаковых документов оставлять: курируемые ответы важнее страниц сайта
+TYPE_PRIORITY = {'faq': 0, 'legal_document': 1, 'website': 2}
+
+
+class NearDuplicateFilter:
+    """
+    Удаление почти одинаковых чанков при загрузке корпуса
+
+    Каждый документ описывается MinHash подписью по множеству словесных
+    шинглов. Подпись делится на bands полос; документы, совпавшие хотя бы
+    в одной полосе, становятся кандидатами и сравниваются по оценке
+    коэффициента Жаккара. Так сравниваются только похожие пары, и время
+    работы растет почти линейно с размером корпуса.
+
+    Из группы дубликатов остается документ с более приоритетным типом
+    (faq, затем legal_document, затем website), а при равенстве - более длинный.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, bands=16, shingle_size=3, seed=1):
+        """
+        Args:
+            threshold (float): Оценка сходства по Жаккару, начиная с которой документы - дубликаты
+            num_perm (int): Длина MinHash подписи
+            bands (int): Число полос LSH; num_perm должно делиться на bands
+            shingle_size (int): Число слов в шингле
+            seed (int): Зерно хэш-функций, чтобы результат не зависел от запуска
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    @classmethod
+    def from_config(cls, options):
+        """Создает фильтр из секции "dedup" конфигурации"""
+        options = options or {}
+        return cls(
+            threshold=options.get('threshold', 0.8),
+            num_perm=options.get('num_perm', 128),
+            bands=options.get('bands', 16)
+        )
+
+    def _shingles(self, text):
+        words = re.findall(r'\w+', text.lower())
+        if len(words) < self.shingle_size:
+            return set(words)
+        size = self.shingle_size
+        return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def signature(self, text):
+        """MinHash подпись текста или None для текста без слов"""
+        shingles = self._shingles(text)
+        if not shingles:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        # Переполнение uint64 при умножении допустимо: это часть хэш-функции
+        with np.errstate(over='ignore'):
+            permuted = (hashes[:, None] * self._a + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def similarity(self, first, second):
+        """Оценка коэффициента Жаккара по двум подписям"""
+        return float(np.count_nonzero(first == second)) / self.num_perm
+
+    def _bands(self, signature):
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def _priority(doc):
+        return (TYPE_PRIORITY.get(doc.get('type', 'website'), len(TYPE_PRIORITY)), -len(doc['content']))
+
+    def filter(self, documents):
+        """
+        Отбрасывает точные и почти точные дубликаты
+
+        Args:
+            documents (list): Документы в формате DataParser
+
+        Returns:
+            tuple: (оставшиеся документы в исходном порядке, отчет о дедупликации)
+        """
+        order = sorted(range(len(documents)), key=lambda i: self._priority(documents[i]))
+
+        exact = {}          # нормализованный текст -> номер оставленного документа
+        buckets = {}        # (полоса, значения) -> номера оставленных документов
+        signatures = {}
+        kept = set()
+        exact_duplicates = 0
+        near_duplicates = 0
+        removed_by_type = {}
+
+        for index in order:
+            doc = documents[index]
+            doc_type = doc.get('type', 'website')
+            normalized = ' '.join(doc['content'].lower().split())
+            if normalized in exact:
+                exact_duplicates += 1
+                removed_by_type[doc_type] = removed_by_type.get(doc_type, 0) + 1
+                continue
+
+            signature = self.signature(normalized)
+            if signature is not None:
+                keys = self._bands(signature)
+                candidates = {other for key in keys for other in buckets.get(key, ())}
+                if any(self.similarity(signature, signatures[other]) >= self.threshold for other in candidates):
+                    near_duplicates += 1
+                    removed_by_type[doc_type] = removed_by_type.get(doc_type, 0) + 1
+                    continue
+                signatures[index] = signature
+                for key in keys:
+                    buckets.setdefault(key, []).append(index)
+
+            exact[normalized] = index
+            kept.add(index)
+
+        result = [doc for index, doc in enumerate(documents) if index in kept]
+        total = len(documents)
+        report = {
+            'total': total,
+            'kept': len(result),
+            'exact_duplicates': exact_duplicates,
+            'near_duplicates': near_duplicates,
+            'ratio': (total - len(result)) / total if total else 0.0,
+            'removed_by_type': removed_by_type
+        }
+
+        metrics.incr('ingest.documents', total)
+        metrics.incr('ingest.duplicates_exact', exact_duplicates)
+        metrics.incr('ingest.duplicates_near', near_duplicates)
+        metrics.set_gauge('ingest.dedup_ratio', round(report['ratio'], 3))
+        logger.info(
+            f"🧹 Дедупликация: оставлено {len(result)} из {total} документов "
+            f"(точных дубликатов {exact_duplicates}, почти одинаковых {near_duplicates}, "
+            f"{report['ratio']:.1%}), удалено по типам: {removed_by_type}"
+        )
+        return result, report
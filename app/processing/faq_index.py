@@ -0,0 +1,158 @@
+# app/processing/faq_index.py
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(text):
+    """Нормализация вопроса для точного сравнения"""
+    text = text.lower().replace('ё', 'е')
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class FAQIndex:
+    """
+    Индекс быстрых ответов по курируемому FAQ
+
+    Вопрос сначала ищется по точному совпадению нормализованного текста,
+    затем по символьным n-граммам TF-IDF с высоким порогом сходства.
+    Найденный ответ возвращается уже отформатированным, без обращения к GigaChat.
+    Индекс строится и перестраивается при изменении FAQ в фоновой задаче
+    (start), чтение файла и обучение TF-IDF идут в отдельном потоке, а не
+    в цикле событий.
+    """
+
+    def __init__(self, loader, threshold=0.85, check_interval=60):
+        """
+        Args:
+            loader: Функция без аргументов, возвращающая список {"question", "answer"}
+            threshold (float): Минимальное косинусное сходство для ответа
+            check_interval (int): Как часто (в секундах) проверять изменения FAQ
+        """
+        self.loader = loader
+        self.threshold = threshold
+        self.check_interval = check_interval
+        self.formatter = None
+
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        self._state = ({}, [], None, None)
+        self._task = None
+
+    def bind_formatter(self, formatter):
+        """
+        Задает функцию formatter(question, answer), которой ответы форматируются
+        один раз при построении индекса
+        """
+        self.formatter = formatter
+        self._signature = None
+
+    def _build(self, entries, signature):
+        exact = {}
+        questions = []
+        answers = []
+
+        for entry in entries:
+            answer = entry['answer']
+            if self.formatter:
+                answer = self.formatter(entry['question'], answer)
+            normalized = normalize_question(entry['question'])
+            exact[normalized] = answer
+            questions.append(normalized)
+            answers.append(answer)
+
+        vectorizer = None
+        matrix = None
+        if questions:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+
+            vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4))
+            matrix = vectorizer.fit_transform(questions)
+
+        # Состояние публикуется одной ссылкой, чтобы поиск не видел частично построенный индекс
+        self._state = (exact, answers, vectorizer, matrix)
+        self._signature = signature
+        metrics.incr('faq.rebuilds')
+        logger.info(f"📋 Индекс быстрых ответов FAQ построен: {len(answers)} записей")
+
+    def start(self):
+        """Строит индекс и затем раз в check_interval проверяет изменения FAQ"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"❌ Ошибка построения индекса FAQ: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    def refresh(self, force=False):
+        """Перестраивает индекс, если записи FAQ изменились"""
+        now = time.monotonic()
+        if not force and self._signature is not None and now - self._checked_at < self.check_interval:
+            return
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                entries = self.loader()
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось загрузить FAQ: {e}")
+                return
+
+            payload = json.dumps(
+                [[entry['question'], entry['answer']] for entry in entries], ensure_ascii=False
+            )
+            signature = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+            if force or signature != self._signature:
+                self._build(entries, signature)
+
+    def lookup(self, question):
+        """
+        Ищет готовый ответ на вопрос
+
+        Индекс здесь не перестраивается: пока фоновая задача его не построила,
+        вопросы уходят в обычный поиск.
+
+        Returns:
+            str: Отформатированный ответ или None, если вопрос не из FAQ
+        """
+        exact, answers, vectorizer, matrix = self._state
+        normalized = normalize_question(question)
+        answer = exact.get(normalized)
+
+        if answer is None and matrix is not None and normalized:
+            from sklearn.metrics.pairwise import linear_kernel
+
+            similarities = linear_kernel(vectorizer.transform([normalized]), matrix).flatten()
+            best = int(similarities.argmax())
+            if similarities[best] >= self.threshold:
+                answer = answers[best]
+
+        if answer is None:
+            metrics.incr('faq.miss')
+        else:
+            metrics.incr('faq.hit')
+
+        hits = metrics.get_counter('faq.hit')
+        total = hits + metrics.get_counter('faq.miss')
+        metrics.set_gauge('faq.hit_rate', hits / total)
+        return answer
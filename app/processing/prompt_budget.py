@@ -0,0 +1,152 @@
+# app/processing/prompt_budget.py
+import logging
+import re
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text, chars_per_token=3.0):
+    """Грубая оценка числа токенов GigaChat для русского текста"""
+    if not text:
+        return 0
+    return int(len(text) / chars_per_token) + 1
+
+
+class ContextAssembler:
+    """
+    Собирает контекст для промпта в пределах бюджета токенов
+
+    Документы режутся на абзацы, абзацы ранжируются по сходству документа
+    с запросом и по пересечению со словами вопроса. Почти одинаковые абзацы
+    (пересекающиеся чанки, повторяющиеся шапки страниц) отбрасываются.
+    """
+
+    def __init__(self, max_tokens=1200, chars_per_token=3.0, dedup_threshold=0.7, max_passage_chars=700):
+        self.max_tokens = max_tokens
+        self.chars_per_token = chars_per_token
+        self.dedup_threshold = dedup_threshold
+        self.max_passage_chars = max_passage_chars
+
+    @classmethod
+    def from_config(cls, options):
+        """Создает сборщик из секции "prompt" конфигурации"""
+        options = options or {}
+        return cls(
+            max_tokens=options.get('context_tokens', 1200),
+            chars_per_token=options.get('chars_per_token', 3.0),
+            dedup_threshold=options.get('dedup_threshold', 0.7),
+            max_passage_chars=options.get('max_passage_chars', 700)
+        )
+
+    def estimate_tokens(self, text):
+        return estimate_tokens(text, self.chars_per_token)
+
+    def _split_passages(self, text):
+        """Делит документ на абзацы не длиннее max_passage_chars"""
+        passages = []
+        for paragraph in re.split(r'\n\s*\n', text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if len(paragraph) <= self.max_passage_chars:
+                passages.append(paragraph)
+                continue
+
+            current = ""
+            for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+                if current and len(current) + len(sentence) + 1 > self.max_passage_chars:
+                    passages.append(current)
+                    current = ""
+                current = f"{current} {sentence}".strip()
+            if current:
+                passages.append(current)
+        return passages
+
+    @staticmethod
+    def _words(text):
+        return re.findall(r'\w{3,}', text.lower())
+
+    @staticmethod
+    def _shingles(words):
+        if len(words) < 3:
+            return set(words)
+        return {' '.join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+    def _is_duplicate(self, shingles, selected):
+        for other in selected:
+            if not shingles or not other:
+                continue
+            overlap = len(shingles & other)
+            # Мера вложенности ловит и дубликаты, и абзацы, целиком входящие в другие
+            if overlap / min(len(shingles), len(other)) >= self.dedup_threshold:
+                return True
+        return False
+
+    def _truncate(self, text, max_chars):
+        """Обрезает текст по границе предложения или слова"""
+        if len(text) <= max_chars:
+            return text
+        cut = text[:max_chars]
+        boundary = max(cut.rfind('. '), cut.rfind('! '), cut.rfind('? '))
+        if boundary > max_chars // 2:
+            return cut[:boundary + 1]
+        return cut.rsplit(' ', 1)[0] + '…'
+
+    def assemble(self, documents, query):
+        """
+        Формирует текст контекста из найденных документов
+
+        Args:
+            documents (list): Документы с полями content и similarity
+            query (str): Вопрос пользователя
+
+        Returns:
+            str: Контекст, укладывающийся в бюджет токенов
+        """
+        query_words = set(self._words(query))
+
+        candidates = []
+        for doc_rank, doc in enumerate(documents):
+            similarity = doc.get('similarity', 0.0)
+            for position, passage in enumerate(self._split_passages(doc['content'])):
+                words = self._words(passage)
+                if query_words and words:
+                    overlap = len(query_words.intersection(words)) / len(query_words)
+                else:
+                    overlap = 0.0
+                score = similarity * (1.0 + overlap)
+                candidates.append((-score, doc_rank, position, passage, words))
+
+        candidates.sort(key=lambda item: item[:3])
+
+        budget_chars = int(self.max_tokens * self.chars_per_token)
+        selected_shingles = []
+        parts = []
+        used_chars = 0
+        dropped = 0
+
+        for _, _, _, passage, words in candidates:
+            shingles = self._shingles(words)
+            if self._is_duplicate(shingles, selected_shingles):
+                dropped += 1
+                continue
+
+            remaining = budget_chars - used_chars
+            if remaining < 80:
+                dropped += 1
+                continue
+            if len(passage) > remaining:
+                passage = self._truncate(passage, remaining)
+
+            parts.append(passage)
+            selected_shingles.append(shingles)
+            used_chars += len(passage) + 2
+
+        if dropped:
+            metrics.incr('prompt.passages_dropped', dropped)
+
+        context = "\n\n".join(parts)
+        metrics.observe('prompt.context_tokens', self.estimate_tokens(context))
+        return context
@@ -0,0 +1,244 @@
+# app/processing/refresh.py
+import asyncio
+import ctypes
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ioprio_set(2): номера системного вызова и класс idle - поток читает и пишет
+# диск, только когда диск не нужен остальным
+IOPRIO_SET_SYSCALLS = {'x86_64': 251, 'aarch64': 30, 'i686': 289, 'armv7l': 314}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+
+
+def set_idle_io_priority(tid):
+    """
+    Переводит поток в класс ввода-вывода idle (только Linux)
+
+    Returns:
+        bool: Удалось ли изменить приоритет
+    """
+    number = IOPRIO_SET_SYSCALLS.get(platform.machine())
+    if not sys.platform.startswith('linux') or number is None:
+        return False
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.syscall(number, IOPRIO_WHO_PROCESS, tid, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT) != 0:
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+    return True
+
+
+class KnowledgeRefresher:
+    """
+    Периодическое обновление базы знаний внутри процесса бота
+
+    Раз в interval секунд заново парсит сайт, сохраняет снимок корпуса и
+    применяет к базе только изменившиеся документы. Работа идет в отдельном
+    фоновом потоке с пониженным приоритетом процессора (nice) и, на Linux,
+    с классом ввода-вывода idle, поэтому не отнимает процессор и диск
+    у обработки сообщений. Свежесть базы видна в метриках refresh.*.
+    """
+
+    def __init__(self, database, crawl, interval=6 * 3600, snapshot_path=None, nice=10, tick=60,
+                 retry_interval=900, min_ratio=0.5, io_idle=True, stop_timeout=20.0):
+        """
+        Args:
+            database: Экземпляр MySQLTextDB
+            crawl: Функция без аргументов, возвращающая список документов
+            interval (float): Период обновления в секундах
+            snapshot_path (str): Куда сохранять снимок корпуса после парсинга
+            nice (int): Насколько понизить приоритет потока обновления
+            tick (float): Как часто обновлять метрику возраста данных
+            retry_interval (float): Через сколько секунд повторить неудачное обновление
+            min_ratio (float): Минимальная доля документов от текущей базы, при которой
+                результат парсинга считается полным
+            io_idle (bool): Перевести поток обновления в класс ввода-вывода idle
+            stop_timeout (float): Сколько секунд при остановке ждать текущее обновление
+        """
+        self.database = database
+        self.crawl = crawl
+        self.interval = interval
+        self.snapshot_path = snapshot_path
+        self.nice = nice
+        self.tick = tick
+        self.retry_interval = retry_interval
+        self.min_ratio = min_ratio
+        self.io_idle = io_idle
+        self.stop_timeout = stop_timeout
+        # Время последнего успешного обновления (по умолчанию - время снимка корпуса)
+        self.last_refresh = self._snapshot_time() or time.time()
+        self._next_run = self.last_refresh + interval
+        self._task = None
+        self._current = None
+        self._stopping = threading.Event()
+        self._running = threading.Lock()
+
+    @classmethod
+    def from_config(cls, database, crawl, options, snapshot_path=None):
+        """Создает планировщик из секции "refresh" конфигурации"""
+        options = options or {}
+        return cls(
+            database,
+            crawl,
+            interval=options.get('interval_hours', 6) * 3600,
+            snapshot_path=snapshot_path,
+            nice=options.get('nice', 10),
+            retry_interval=options.get('retry_minutes', 15) * 60,
+            io_idle=options.get('io_idle', True),
+            stop_timeout=options.get('stop_timeout', 20.0)
+        )
+
+    def _snapshot_time(self):
+        """Время создания последнего снимка корпуса как время последнего обновления"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            from processing.snapshot import read_header
+
+            return datetime.fromisoformat(read_header(self.snapshot_path)['created_at']).timestamp()
+        except Exception:
+            return None
+
+    def start(self):
+        """Запускает цикл обновления в текущем цикле событий"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+            logger.info(f"🔄 Обновление базы знаний каждые {self.interval / 3600:g} ч")
+
+    async def stop(self):
+        """
+        Останавливает обновление
+
+        Начатое обновление не применяет изменения к базе после парсинга;
+        его завершения ждем не дольше stop_timeout. Поток обновления
+        фоновый (daemon) и не задерживает выход процесса.
+        """
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        current = self._current
+        if current is not None and not current.done():
+            logger.info(f"⏳ Ожидание завершения обновления базы знаний (до {self.stop_timeout:g} с)")
+            try:
+                await asyncio.wait_for(asyncio.shield(current), self.stop_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("⚠️ Обновление базы знаний не завершилось, выходим без него")
+
+    def _run_in_thread(self):
+        """Запускает refresh_once в фоновом потоке, результат - в future цикла событий"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def deliver(result):
+            if not future.done():
+                future.set_result(result)
+
+        def worker():
+            result = self.refresh_once()
+            try:
+                loop.call_soon_threadsafe(deliver, result)
+            except RuntimeError:
+                # Цикл событий уже закрыт
+                pass
+
+        threading.Thread(target=worker, name="refresh", daemon=True).start()
+        self._current = future
+        return future
+
+    async def _loop(self):
+        while True:
+            metrics.set_gauge('refresh.age_s', int(time.time() - self.last_refresh))
+            if time.time() >= self._next_run:
+                changes = await asyncio.shield(self._run_in_thread())
+                self._next_run = time.time() + (self.interval if changes is not None else self.retry_interval)
+            await asyncio.sleep(min(self.tick, max(1.0, self._next_run - time.time())))
+
+    def _lower_priority(self):
+        # На Linux nice и ioprio действуют на отдельный поток, а не на весь процесс
+        tid = threading.get_native_id()
+        if hasattr(os, 'setpriority'):
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, self.nice)
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось понизить приоритет обновления: {e}")
+        if self.io_idle:
+            try:
+                if not set_idle_io_priority(tid):
+                    logger.debug("Приоритет ввода-вывода обновления не изменен: не Linux")
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось понизить приоритет ввода-вывода обновления: {e}")
+
+    def refresh_once(self):
+        """
+        Одно обновление базы знаний
+
+        Returns:
+            dict: Изменения (added, removed, kept) или None, если обновление не удалось
+        """
+        if not self._running.acquire(blocking=False):
+            logger.info("🔄 Обновление базы знаний уже выполняется")
+            return None
+
+        try:
+            self._lower_priority()
+            started = time.monotonic()
+            logger.info("🔄 Обновление базы знаний...")
+
+            documents = self.crawl()
+            if self._stopping.is_set():
+                logger.info("🔄 Бот останавливается - результат обновления не применяется")
+                return None
+            if not documents:
+                # Сайт недоступен - оставляем текущую базу и попробуем в следующий раз
+                metrics.incr('refresh.failed')
+                logger.warning("⚠️ Обновление базы знаний: не получено ни одного документа")
+                return None
+
+            # Если часть страниц не загрузилась, их документы нельзя удалять из базы.
+            # Индекс лагеря может быть еще не загружен или выгружен, поэтому считаем и по таблице
+            current = max(
+                len(self.database.snapshot.documents), self.database.get_document_count(replica=False)
+            )
+            if len(documents) < current * self.min_ratio:
+                metrics.incr('refresh.failed')
+                logger.warning(f"⚠️ Обновление базы знаний пропущено: получено {len(documents)} документов из {current}")
+                return None
+
+            if self.snapshot_path:
+                from processing.snapshot import write_snapshot
+
+                write_snapshot(documents, self.snapshot_path)
+
+            if self._stopping.is_set():
+                logger.info("🔄 Бот останавливается - изменения не применяются")
+                return None
+            changes = self.database.apply_changes(documents)
+
+            duration = time.monotonic() - started
+            self.last_refresh = time.time()
+            metrics.incr('refresh.completed')
+            metrics.incr('refresh.documents_added', changes['added'])
+            metrics.incr('refresh.documents_removed', changes['removed'])
+            metrics.set_gauge('refresh.last_duration_s', round(duration, 1))
+            metrics.set_gauge('refresh.age_s', 0)
+            logger.info(f"✅ База знаний обновлена за {duration:.1f} с: {changes}")
+            return changes
+
+        except Exception as e:
+            metrics.incr('refresh.failed')
+            logger.error(f"❌ Ошибка обновления базы знаний: {e}")
+            return None
+        finally:
+            self._running.release()
@@ -0,0 +1,136 @@
+# app/processing/snapshot.py
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 'cosmos-corpus'
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_PATH = 'corpus_snapshot.jsonl.gz'
+
+
+def content_hash(content):
+    """SHA-256 текста документа"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _open(path, mode):
+    """
+    Открывает файл снимка как текстовый поток
+
+    Формат определяется по расширению: .zst - zstandard (если пакет
+    установлен), иначе gzip.
+    """
+    if path.endswith('.zst'):
+        import zstandard
+
+        if mode == 'w':
+            raw = zstandard.ZstdCompressor(level=10).stream_writer(open(path, 'wb'))
+        else:
+            raw = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+        return io.TextIOWrapper(raw, encoding='utf-8')
+    return gzip.open(path, mode + 't', encoding='utf-8')
+
+
+def write_snapshot(documents, path=DEFAULT_SNAPSHOT_PATH, source=None):
+    """
+    Записывает распарсенные документы в сжатый JSONL снимок
+
+    Первая строка - заголовок с форматом и временем создания, далее по одному
+    документу на строку с хэшем содержимого и временем загрузки. Файл
+    записывается во временный и затем атомарно заменяет старый снимок.
+
+    Args:
+        documents: Итерируемые документы (content, source, type, chunk_index)
+        path (str): Путь к снимку (.jsonl.gz или .jsonl.zst)
+        source (str): Откуда получены документы, например URL сайта
+
+    Returns:
+        int: Число записанных документов
+    """
+    created_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.tmp{os.path.splitext(path)[1]}"
+    count = 0
+    with _open(tmp_path, 'w') as f:
+        header = {
+            'format': SNAPSHOT_FORMAT,
+            'version': SNAPSHOT_VERSION,
+            'created_at': created_at,
+            'source': source
+        }
+        f.write(json.dumps(header, ensure_ascii=False) + '\n')
+
+        for doc in documents:
+            record = {
+                'content': doc['content'],
+                'source': doc.get('source', 'unknown'),
+                'type': doc.get('type', 'website'),
+                'chunk_index': doc.get('chunk_index', 0),
+                'content_hash': content_hash(doc['content']),
+                'fetched_at': doc.get('fetched_at', created_at)
+            }
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+
+    os.replace(tmp_path, path)
+    logger.info(f"📦 Снимок корпуса сохранен: {path} ({count} документов)")
+    return count
+
+
+def read_header(path=DEFAULT_SNAPSHOT_PATH):
+    """Заголовок снимка или None, если файла нет"""
+    if not os.path.exists(path):
+        return None
+    with _open(path, 'r') as f:
+        return json.loads(f.readline())
+
+
+def iter_snapshot(path=DEFAULT_SNAPSHOT_PATH, verify=True):
+    """
+    Потоково читает документы из снимка
+
+    Документы с несовпадающим хэшем содержимого пропускаются.
+
+    Yields:
+        dict: Документ в формате DataParser с полями content_hash и fetched_at
+    """
+    with _open(path, 'r') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} не является снимком корпуса")
+        if header.get('version', 0) > SNAPSHOT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия снимка: {header.get('version')}")
+
+        skipped = 0
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            if verify and content_hash(doc['content']) != doc.get('content_hash'):
+                skipped += 1
+                continue
+            yield doc
+
+        if skipped:
+            logger.warning(f"⚠️ Пропущено поврежденных документов в снимке: {skipped}")
+
+
+def restore(database, path=DEFAULT_SNAPSHOT_PATH):
+    """
+    Загружает документы из снимка в базу без обращения к сайтам
+
+    Returns:
+        int: Число загруженных документов
+    """
+    header = read_header(path)
+    logger.info(f"📦 Восстановление корпуса из снимка {path} от {header.get('created_at')}")
+    return database.store_documents(iter_snapshot(path))
@@ -0,0 +1,239 @@
+# app/processing/spell.py
+import logging
+import re
+import time
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r'[а-яёa-z]+')
+
+
+def edit_distance(first, second, limit):
+    """
+    Расстояние Дамерау-Левенштейна (с перестановкой соседних букв)
+
+    Возвращает limit + 1, если расстояние больше limit.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class SpellCorrector:
+    """
+    Исправление опечаток в запросе по словарю индекса (алгоритм SymSpell)
+
+    Для каждого слова словаря TF-IDF заранее вычисляются все варианты
+    с удалением до max_distance букв (в первых prefix_length буквах).
+    Слово запроса исправляется поиском его удалений в этом словаре:
+    кандидаты находятся несколькими обращениями к dict без перебора
+    словаря, затем проверяются точным расстоянием Дамерау-Левенштейна.
+
+    Слова, которые встречаются в документах базы, но не попали в словарь
+    TF-IDF (max_features), считаются правильными и не исправляются.
+    """
+
+    def __init__(self, vocabulary, known_words=(), weights=None, max_distance=2, prefix_length=7,
+                 min_length=4):
+        """
+        Args:
+            vocabulary: Слова, в которые можно исправлять (словарь TF-IDF)
+            known_words: Прочие правильные слова (все слова корпуса, стоп-слова)
+            weights (dict): Слово -> вес для выбора среди равноудаленных кандидатов
+            max_distance (int): Максимальное число правок
+            prefix_length (int): Длина префикса, по которому строятся удаления
+            min_length (int): Более короткие слова не исправляются
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.min_length = min_length
+        self.weights = weights or {}
+        self.words = set(vocabulary)
+        self.known = set(known_words) | self.words
+        self.deletes = {}
+        for word in self.words:
+            for variant in self._variants(word[:prefix_length], max_distance):
+                self.deletes.setdefault(variant, []).append(word)
+
+    @classmethod
+    def from_index(cls, vectorizer, documents=None, stop_words=(), max_distance=2):
+        """
+        Строит корректор по обученному TfidfVectorizer
+
+        Args:
+            vectorizer: Обученный TfidfVectorizer (vocabulary_, idf_)
+            documents (dict): Документы индекса; их слова считаются правильными
+            stop_words: Стоп-слова, которые тоже не исправляются
+        """
+        vocabulary = vectorizer.vocabulary_
+        idf = getattr(vectorizer, 'idf_', None)
+        # Чаще встречающиеся слова (меньший idf) выигрывают при равном расстоянии
+        weights = {word: -float(idf[vocabulary[word]]) for word in vocabulary} if idf is not None else {}
+
+        known = set(stop_words)
+        for doc in (documents or {}).values():
+            known.update(WORD_PATTERN.findall(doc['content'].lower()))
+        return cls(vocabulary, known, weights, max_distance=max_distance)
+
+    @staticmethod
+    def _variants(word, distance):
+        """Слово и все его варианты с удалением до distance букв"""
+        variants = {word}
+        frontier = {word}
+        for _ in range(distance):
+            frontier = {
+                candidate[:i] + candidate[i + 1:]
+                for candidate in frontier if len(candidate) > 1
+                for i in range(len(candidate))
+            }
+            variants |= frontier
+        return variants
+
+    def _limit(self, word):
+        # Короткие слова с двумя правками становятся неоднозначными
+        return 1 if len(word) <= 5 else self.max_distance
+
+    def lookup(self, word):
+        """Ближайшее слово словаря или None, если исправлять нечего"""
+        if len(word) < self.min_length or word in self.known or not word.isalpha():
+            return None
+
+        limit = self._limit(word)
+        best = None
+        best_key = None
+        seen = set()
+        for variant in self._variants(word[:self.prefix_length], limit):
+            for candidate in self.deletes.get(variant, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = edit_distance(word, candidate, limit)
+                if distance > limit:
+                    continue
+                key = (distance, -self.weights.get(candidate, 0.0), candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+        return best
+
+    def correct(self, text):
+        """
+        Исправляет опечатки в нормализованном тексте запроса
+
+        Returns:
+            tuple: (исправленный текст, число исправленных слов)
+        """
+        words = text.split()
+        corrected = 0
+        for i, word in enumerate(words):
+            replacement = self.lookup(word)
+            if replacement:
+                words[i] = replacement
+                corrected += 1
+        return ' '.join(words), corrected
+
+
+def correct_query(corrector, text):
+    """Исправляет запрос и записывает метрики; без корректора возвращает текст как есть"""
+    if corrector is None or not text:
+        return text
+    started = time.perf_counter()
+    corrected, count = corrector.correct(text)
+    metrics.observe('retrieval.spell_us', (time.perf_counter() - started) * 1e6)
+    if count:
+        metrics.incr('retrieval.spell_corrected')
+        logger.info(f"✏️ Запрос исправлен: '{text}' -> '{corrected}'", extra={'sampled': True})
+    return corrected
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    import joblib
+
+    from database.mysql_db import russian_stop_words
+    from processing.data_parser import load_faq_entries
+
+    arg_parser = argparse.ArgumentParser(
+        description="Задержка исправления опечаток и доля запросов без совпадений со словарем TF-IDF "
+                    "(tfidf_model.pkl в текущем каталоге) до и после исправления"
+    )
+    arg_parser.add_argument('--queries', help="Файл с вопросами, по одному в строке (по умолчанию вопросы FAQ)")
+    arg_parser.add_argument('--typos', type=int, default=1, help="Сколько опечаток вносить в каждое слово")
+    arg_parser.add_argument('--seed', type=int, default=1)
+    args = arg_parser.parse_args()
+
+    random.seed(args.seed)
+    vectorizer = joblib.load('tfidf_model.pkl')
+
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = [item['question'] for item in load_faq_entries()]
+
+    started = time.perf_counter()
+    corrector = SpellCorrector.from_index(vectorizer, stop_words=russian_stop_words())
+    print(f"Словарь: {len(corrector.words)} слов, {len(corrector.deletes)} удалений, "
+          f"построен за {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    def add_typo(word):
+        position = random.randrange(len(word))
+        kind = random.choice(('replace', 'delete', 'insert', 'swap'))
+        letter = random.choice('абвгдежзийклмнопрстуфхцчшщыэюя')
+        if kind == 'replace':
+            return word[:position] + letter + word[position + 1:]
+        if kind == 'delete':
+            return word[:position] + word[position + 1:]
+        if kind == 'insert':
+            return word[:position] + letter + word[position:]
+        position = min(position, len(word) - 2)
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+    def normalize(text):
+        return ' '.join(WORD_PATTERN.findall(text.lower()))
+
+    # В каждом запросе искажаем слова, которые есть в словаре TF-IDF
+    typo_queries = []
+    for question in questions:
+        words = normalize(question).split()
+        for i, word in enumerate(words):
+            if word in corrector.words and len(word) >= corrector.min_length:
+                for _ in range(args.typos):
+                    words[i] = add_typo(words[i])
+        typo_queries.append(' '.join(words))
+
+    def misses(texts):
+        # Запрос без единого слова из словаря дает нулевой вектор и уходит в медленный поиск по LIKE
+        return sum(1 for text in texts if vectorizer.transform([text]).nnz == 0)
+
+    timings = []
+    corrected_queries = []
+    for text in typo_queries:
+        started = time.perf_counter()
+        corrected_queries.append(corrector.correct(text)[0])
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+
+    total = len(typo_queries)
+    print(f"Запросов: {total}")
+    print(f"Исправление: p50={timings[total // 2]:.0f} мкс, p95={timings[int(total * 0.95)]:.0f} мкс, "
+          f"max={timings[-1]:.0f} мкс")
+    print(f"Без совпадений со словарем: исходные {misses([normalize(q) for q in questions])}, "
+          f"с опечатками {misses(typo_queries)}, после исправления {misses(corrected_queries)}")
+    restored = sum(1 for original, fixed in zip(questions, corrected_queries) if normalize(original) == fixed)
+    print(f"Восстановлено запросов полностью: {restored} из {total}")
@@ -0,0 +1,271 @@
+# app/profiling.py
+import asyncio
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+from collections import Counter
+from functools import wraps
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfiler:
+    """
+    Сэмплирующий профилировщик обработки вопросов
+
+    Для выбранной доли вопросов фоновый поток раз в interval секунд снимает
+    стеки потоков, занятых этапами обработки (retrieval, prompt, llm,
+    formatting), и накапливает их по этапам. Результат сохраняется в
+    формате collapsed stacks (flamegraph.pl, speedscope, inferno).
+
+    По умолчанию выключен: фоновый поток не запущен, а проверка на входе
+    в этап - одно обращение к словарю trace.
+    """
+
+    def __init__(self, sample_percent=0.0, interval=0.005, output_dir='profiles', max_depth=64):
+        """
+        Args:
+            sample_percent (float): Доля профилируемых вопросов в процентах
+            interval (float): Период снятия стеков в секундах
+            output_dir (str): Каталог для файлов *.folded
+            max_depth (int): Максимальная глубина сохраняемого стека
+        """
+        self.sample_percent = sample_percent
+        self.interval = interval
+        self.output_dir = output_dir
+        self.max_depth = max_depth
+        # Процент, включаемый по сигналу или команде без аргумента
+        self.toggle_percent = sample_percent or 100.0
+        self._threads = {}     # ID потока -> этап, который он сейчас выполняет
+        self._local = threading.local()
+        self._counts = {}      # этап -> Counter(стек -> число снимков)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        # Включение и выключение идут из пула потоков цикла событий
+        self._switch = threading.RLock()
+        self._tasks = set()
+
+    def configure(self, options):
+        """Применяет секцию "profiling" конфигурации"""
+        options = options or {}
+        self.interval = options.get('interval_ms', 5) / 1000
+        self.output_dir = options.get('output_dir', 'profiles')
+        self.max_depth = options.get('max_depth', 64)
+        self.set_sample_percent(options.get('sample_percent', 0))
+        self.toggle_percent = self.sample_percent or 100.0
+
+    @property
+    def enabled(self):
+        return self.sample_percent > 0
+
+    def set_sample_percent(self, percent):
+        """
+        Включает профилирование доли вопросов или выключает его при 0
+
+        При выключении ждет завершения фонового потока, поэтому из цикла
+        событий вызывается через asyncio.to_thread.
+        """
+        with self._switch:
+            self.sample_percent = max(0.0, min(100.0, float(percent)))
+            if self.enabled and self._sampler is None:
+                self._stop.clear()
+                self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._sampler.start()
+                logger.info(f"🔬 Профилирование включено для {self.sample_percent:g}% вопросов")
+            elif not self.enabled and self._sampler is not None:
+                self._stop.set()
+                self._sampler.join()
+                self._sampler = None
+                logger.info("🔬 Профилирование выключено")
+            metrics.set_gauge('profiling.sample_percent', self.sample_percent)
+
+    def toggle(self):
+        """Переключает профилирование; при выключении сохраняет накопленные стеки"""
+        with self._switch:
+            if self.enabled:
+                self.set_sample_percent(0)
+                self.dump()
+            else:
+                self.set_sample_percent(self.toggle_percent)
+
+    def install_signal_handler(self, loop):
+        """Переключение профилирования сигналом SIGUSR2 (kill -USR2 <pid>)"""
+        if not hasattr(signal, 'SIGUSR2'):
+            return
+        try:
+            loop.add_signal_handler(signal.SIGUSR2, self._toggle_in_thread, loop)
+        except (NotImplementedError, RuntimeError) as e:
+            logger.warning(f"⚠️ Сигнал профилирования недоступен: {e}")
+
+    def _toggle_in_thread(self, loop):
+        # Остановка потока и запись файлов не должны блокировать цикл событий
+        task = loop.create_task(asyncio.to_thread(self.toggle))
+        self._tasks.add(task)
+        task.add_done_callback(self._toggled)
+
+    def _toggled(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ Ошибка переключения профилирования: {task.exception()}")
+
+    def begin(self, trace):
+        """Решает, профилировать ли вопрос, и отмечает это в trace"""
+        if self.sample_percent <= 0:
+            return False
+        if self.sample_percent < 100 and random.random() * 100 >= self.sample_percent:
+            return False
+        trace['profile'] = True
+        metrics.incr('profiling.requests')
+        return True
+
+    def enter(self, trace, stage):
+        """
+        Привязывает текущий поток к этапу профилируемого вопроса
+
+        Returns:
+            bool: Была ли сделана привязка (тогда нужно вызвать leave())
+        """
+        if not trace.get('profile'):
+            return False
+        self._bind(stage)
+        return True
+
+    def leave(self):
+        self._unbind()
+
+    def bind(self, func, trace, stage):
+        """
+        Оборачивает функцию, которая будет выполнена в другом потоке
+
+        Пока функция выполняется, стеки этого потока относятся к этапу stage.
+        Для непрофилируемых вопросов функция возвращается без изменений.
+        """
+        if not trace.get('profile'):
+            return func
+        return self._bound(func, stage)
+
+    def inherit(self, func):
+        """Передает этап текущего потока функции, отправляемой в пул потоков"""
+        stage = getattr(self._local, 'stage', None)
+        if stage is None:
+            return func
+        return self._bound(func, stage)
+
+    def _bound(self, func, stage):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            self._bind(stage)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._unbind()
+        return wrapper
+
+    def _bind(self, stage):
+        # Пулы потоков переиспользуют потоки, поэтому сохраняем предыдущую привязку
+        previous = getattr(self._local, 'stage', None)
+        self._local.__dict__.setdefault('stack', []).append(previous)
+        self._local.stage = stage
+        with self._lock:
+            self._threads[threading.get_ident()] = stage
+
+    def _unbind(self):
+        previous = self._local.stack.pop()
+        self._local.stage = previous
+        with self._lock:
+            if previous is None:
+                self._threads.pop(threading.get_ident(), None)
+            else:
+                self._threads[threading.get_ident()] = previous
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = dict(self._threads)
+            if not threads:
+                continue
+
+            frames = sys._current_frames()
+            stacks = []
+            for thread_id, stage in threads.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks.append((stage, self._collapse(frame)))
+            del frames
+
+            with self._lock:
+                for stage, stack in stacks:
+                    self._counts.setdefault(stage, Counter())[stack] += 1
+            metrics.incr('profiling.samples', len(stacks))
+
+    def _collapse(self, frame):
+        """Стек от корня к листу в виде 'файл:функция;файл:функция;...'"""
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def dump(self, reset=True):
+        """
+        Сохраняет накопленные стеки по этапам в output_dir
+
+        Для каждого этапа пишется <этап>.folded, а в all.folded - все этапы
+        с именем этапа в корне стека.
+
+        Returns:
+            list: Пути записанных файлов
+        """
+        with self._lock:
+            counts = self._counts
+            if reset:
+                self._counts = {}
+            else:
+                counts = {stage: Counter(stacks) for stage, stacks in counts.items()}
+        if not counts:
+            return []
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = []
+        combined = []
+        for stage, stacks in sorted(counts.items()):
+            lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+            combined.extend(f"{stage};{line}" for line in lines)
+            paths.append(self._write(f"{stage}.folded", lines))
+        paths.append(self._write("all.folded", combined))
+        logger.info(f"🔬 Профили сохранены в {self.output_dir}: {sum(sum(s.values()) for s in counts.values())} снимков")
+        return paths
+
+    def _write(self, name, lines):
+        path = os.path.join(self.output_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return path
+
+    def report(self, top=3):
+        """Краткая сводка: число снимков по этапам и самые частые функции-листья"""
+        with self._lock:
+            counts = {stage: Counter(stacks) for stage, stacks in self._counts.items()}
+        if not counts:
+            return "Снимков стеков пока нет"
+
+        lines = []
+        for stage, stacks in sorted(counts.items()):
+            total = sum(stacks.values())
+            leaves = Counter()
+            for stack, count in stacks.items():
+                leaves[stack.rsplit(';', 1)[-1]] += count
+            lines.append(f"{stage}: {total} снимков")
+            for leaf, count in leaves.most_common(top):
+                lines.append(f"  {count * 100 / total:5.1f}% {leaf}")
+        return "\n".join(lines)
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,35 @@
+# app/settings.py
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = "config.json"
+
+
+def load_config(config_path=DEFAULT_CONFIG_PATH):
+    """
+    Загружает конфигурацию из JSON файла
+    
+    Args:
+        config_path (str): Путь к файлу конфигурации
+    
+    Returns:
+        dict: Словарь с конфигурацией
+    """
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        
+        logger.info(f"✅ Конфигурация загружена из {config_path}")
+        return config
+        
+    except FileNotFoundError:
+        logger.error(f"❌ Файл конфигурации {config_path} не найден")
+        raise
+    except json.JSONDecodeError as e:
+        logger.error(f"❌ Ошибка парсинга JSON в файле {config_path}: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"❌ Неожиданная ошибка при загрузке конфигурации: {e}")
+        raise
@@ -0,0 +1,45 @@
+# app/startup.py
+import logging
+import time
+from contextlib import contextmanager
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """Замеряет длительность этапов запуска приложения"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        """Контекстный менеджер для замера одного этапа"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, duration):
+        self.stages.append((name, duration))
+        metrics.set_gauge(f'startup.{name}_seconds', duration)
+
+    def mark_ready(self, name='ready'):
+        """Отмечает момент, когда приложение готово отвечать"""
+        total = time.perf_counter() - self.started
+        self.stages.append((name, total))
+        metrics.set_gauge(f'startup.{name}_seconds', total)
+        logger.info(f"⏱️ Отчет о запуске:\n{self.report()}")
+
+    def report(self):
+        """Возвращает отчет по этапам запуска"""
+        if not self.stages:
+            return "Этапы запуска еще не замерены"
+        return "\n".join(f"{name}: {duration * 1000:.0f} мс" for name, duration in self.stages)
+
+
+startup_profiler = StartupProfiler()
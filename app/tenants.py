@@ -0,0 +1,87 @@
+# app/tenants.py
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Каталог с файлами лагерей: tenants/<id>/tfidf_model.pkl, dense_index/, снимок корпуса
+TENANTS_DIR = 'tenants'
+
+# ID лагеря входит в имена таблиц MySQL, поэтому допускаются только строчные латинские буквы, цифры и _
+TENANT_ID_PATTERN = re.compile(r'^[a-z][a-z0-9_]{0,31}$')
+
+# Поля лагеря, которые по умолчанию берутся из общей конфигурации
+TENANT_FIELDS = (
+    'telegram_bot_token', 'camp_url', 'faq_threshold', 'admin_ids'
+)
+
+# Содержимое, которое у каждого лагеря свое и от общей конфигурации не наследуется.
+# Без своего faq_file у лагеря нет быстрых ответов по FAQ и FAQ документов в корпусе,
+# снимок корпуса по умолчанию лежит в каталоге лагеря
+TENANT_OWN_FIELDS = {'contacts': {}, 'faq_file': None}
+
+
+def tenant_dir(tenant):
+    """Каталог файлов лагеря; для работы с одним лагерем - текущий каталог"""
+    return os.path.join(TENANTS_DIR, tenant) if tenant else ''
+
+
+def tenant_configs(config):
+    """
+    Конфигурации лагерей из секции "tenants"
+
+    Каждый лагерь описывается словарем с обязательным id; токен бота, сайт
+    и настройки по умолчанию берутся из общей конфигурации, а контакты,
+    FAQ и снимок корпуса у каждого лагеря свои. Лагеря с одинаковым токеном обслуживаются одним ботом,
+    лагерь тогда определяется по чату:
+
+        {"id": "zvezda", "name": "Звезда", "title": "детского лагеря \"Звезда\" в Липецкой области",
+         "camp_url": "https://...", "contacts": {"phone": "..."}, "faq_file": "faq_zvezda.json",
+         "chat_ids": [-1001234567890], "default": false}
+
+    Returns:
+        list: Полные конфигурации лагерей или пустой список, если бот
+            работает с одним лагерем
+    """
+    camps = (config.get('tenants') or {}).get('camps') or []
+    configs = []
+    seen = set()
+    for camp in camps:
+        tenant = camp.get('id', '')
+        if not TENANT_ID_PATTERN.match(tenant):
+            raise ValueError(f"Недопустимый id лагеря: '{tenant}' (нужны строчные латинские буквы, цифры и _)")
+        if tenant in seen:
+            raise ValueError(f"Лагерь '{tenant}' описан дважды")
+        seen.add(tenant)
+        configs.append(_merge(config, camp))
+    return configs
+
+
+def tenant_config(config, tenant):
+    """Конфигурация одного лагеря по id"""
+    for camp_config in tenant_configs(config):
+        if camp_config['tenant'] == tenant:
+            return camp_config
+    raise ValueError(f"Лагерь '{tenant}' не найден в секции tenants")
+
+
+def _merge(config, camp):
+    merged = dict(config)
+    for field in TENANT_FIELDS:
+        if field in camp:
+            merged[field] = camp[field]
+    for field, empty in TENANT_OWN_FIELDS.items():
+        merged[field] = camp.get(field, empty)
+
+    tenant = camp['id']
+    merged['tenant'] = tenant
+    merged['camp_name'] = camp.get('name', tenant)
+    if 'title' in camp:
+        merged['camp_title'] = camp['title']
+    merged['chat_ids'] = camp.get('chat_ids', [])
+    merged['default'] = camp.get('default', False)
+    # Снимок корпуса у каждого лагеря свой
+    snapshot_file = os.path.basename(config.get('snapshot_file', 'corpus_snapshot.jsonl.gz'))
+    merged['snapshot_file'] = camp.get('snapshot_file', os.path.join(tenant_dir(tenant), snapshot_file))
+    return merged
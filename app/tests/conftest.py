@@ -0,0 +1,6 @@
+# app/tests/conftest.py
+import os
+import sys
+
+# Модули приложения импортируются так же, как при запуске из app/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,72 @@
+# app/tests/test_admission.py
+import asyncio
+
+from bot.admission import AdmissionController, TokenBucket
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=1.0, burst=2)
+
+    assert bucket.try_consume()
+    assert bucket.try_consume()
+    assert not bucket.try_consume()
+    assert 0 < bucket.time_until_available() <= 1.0
+
+    # Прошло 10 секунд: ведро наполнилось, но не больше burst
+    bucket.updated -= 10
+    assert bucket.time_until_available() == 0.0
+    assert bucket.tokens == 2
+    assert bucket.try_consume()
+
+
+def test_rate_limit_is_per_user():
+    admission = AdmissionController(rate=0.001, burst=1, max_users=2)
+
+    assert admission.allow(1)
+    assert not admission.allow(1)
+    assert admission.allow(2)
+    assert admission.retry_after(1) > 0
+    assert admission.retry_after(3) == 0.0
+
+    # Самый давний пользователь вытесняется и получает новое ведро
+    assert admission.allow(3)
+    assert admission.allow(1)
+
+
+def test_identical_questions_are_coalesced():
+    admission = AdmissionController(max_concurrent=4)
+    calls = []
+
+    async def answer():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'ответ'
+
+    async def scenario():
+        key = AdmissionController.normalize_question('Когда  начинается СМЕНА?')
+        assert key == AdmissionController.normalize_question('когда начинается смена')
+        results = await asyncio.gather(*(admission.run(key, answer) for _ in range(3)))
+        # После завершения вопрос снова выполняется заново
+        results.append(await admission.run(key, answer))
+        return results
+
+    assert asyncio.run(scenario()) == ['ответ'] * 4
+    assert len(calls) == 2
+
+
+def test_concurrency_limit():
+    admission = AdmissionController(max_concurrent=2)
+    active = []
+    peak = []
+
+    async def answer():
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.pop()
+
+    async def scenario():
+        await asyncio.gather(*(admission.run(None, answer) for _ in range(6)))
+
+    asyncio.run(scenario())
+    assert max(peak) == 2
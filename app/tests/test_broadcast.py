@@ -0,0 +1,83 @@
+# app/tests/test_broadcast.py
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('telegram')
+
+from telegram.error import Forbidden
+
+from bot.broadcast import Broadcaster, SubscriberStore
+
+
+class _Database:
+    def __init__(self, chat_ids):
+        self.chat_ids = chat_ids
+        self.executed = []
+
+    def table_name(self, name):
+        return name
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetch_all(self, sql, params=None, replica=False):
+        after, limit = params
+        return [{'chat_id': chat_id} for chat_id in self.chat_ids if chat_id > after][:limit]
+
+
+class _Bot:
+    def __init__(self, blocked=()):
+        self.blocked = set(blocked)
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        if chat_id in self.blocked:
+            raise Forbidden("bot was blocked by the user")
+        self.sent.append((chat_id, time.monotonic()))
+
+
+def _broadcaster(chat_ids, bot, **kwargs):
+    database = _Database(chat_ids)
+    broadcaster = Broadcaster(database, SubscriberStore(database), **kwargs)
+    broadcaster.bot = bot
+    return broadcaster, database
+
+
+def _progress(database):
+    # Параметры UPDATE: (status, last_chat_id, sent, failed, status, id)
+    return [params[:4] for sql, params in database.executed if sql.startswith('UPDATE broadcasts')]
+
+
+def test_sends_to_every_page_within_rate_limit():
+    bot = _Bot()
+    broadcaster, database = _broadcaster(
+        list(range(1, 8)), bot, rate=100.0, burst=2, page_size=3, checkpoint_every=3
+    )
+    broadcast = {'id': 1, 'text': 'Объявление', 'status': 'pending', 'last_chat_id': 0, 'sent': 0, 'failed': 0}
+
+    asyncio.run(broadcaster._run(broadcast))
+
+    assert [chat_id for chat_id, _ in bot.sent] == list(range(1, 8))
+    # Два сообщения подряд из запаса ведра, остальные пять - не чаще 100 в секунду
+    assert bot.sent[-1][1] - bot.sent[0][1] >= 0.04
+    assert _progress(database) == [
+        ('running', 0, 0, 0),
+        ('running', 3, 3, 0),
+        ('running', 6, 6, 0),
+        ('done', 7, 7, 0),
+    ]
+
+
+def test_resumes_after_checkpoint_and_deactivates_blocked_chats():
+    bot = _Bot(blocked={5})
+    broadcaster, database = _broadcaster([1, 2, 3, 4, 5, 6], bot, rate=1000.0, burst=10)
+    broadcaster.subscribers._known = {1, 2, 3, 4, 5, 6}
+    broadcast = {'id': 2, 'text': 'Объявление', 'status': 'running', 'last_chat_id': 3, 'sent': 3, 'failed': 0}
+
+    asyncio.run(broadcaster._run(broadcast))
+
+    assert [chat_id for chat_id, _ in bot.sent] == [4, 6]
+    assert 5 not in broadcaster.subscribers._known
+    assert _progress(database)[-1] == ('done', 6, 5, 1)
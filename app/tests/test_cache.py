@@ -0,0 +1,62 @@
+# app/tests/test_cache.py
+import threading
+
+import pytest
+
+from database.cache import LRUCache
+
+
+def test_lru_eviction_and_stats():
+    cache = LRUCache(2, 'test.cache')
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.keys() == ['a', 'c']
+    assert cache.stats() == {'size': 2, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_disabled_cache_stores_nothing():
+    cache = LRUCache(0, 'test.disabled')
+    cache.put('a', 1)
+    assert len(cache) == 0
+    assert cache.get('a') is None
+
+
+def _database(results):
+    pytest.importorskip('mysql.connector')
+    from database.index_snapshot import IndexSnapshot
+    from database.mysql_db import MySQLTextDB
+
+    database = MySQLTextDB.__new__(MySQLTextDB)
+    database.index_budget = None
+    database.retrieval_mode = 'hybrid'
+    database._lock = threading.RLock()
+    database._snapshot = IndexSnapshot(version=1)
+    database.result_cache = LRUCache(10, 'test.results')
+    calls = []
+
+    def hybrid_search(snapshot, query, k, filters=None):
+        calls.append(query)
+        return results.pop(0)
+
+    database._hybrid_search = hybrid_search
+    return database, calls
+
+
+def test_only_complete_results_are_cached():
+    database, calls = _database([
+        ([{'id': 1}], False),
+        ([{'id': 1}, {'id': 2}], True),
+    ])
+
+    assert database.search_similar_documents('Смена?') == [{'id': 1}]
+    found = database.search_similar_documents('смена')
+    assert found == [{'id': 1}, {'id': 2}]
+
+    # Кэш отдает копии: изменения вызывающего его не портят
+    found[0]['id'] = 99
+    assert database.search_similar_documents('смена') == [{'id': 1}, {'id': 2}]
+    assert calls == ['смена', 'смена']
@@ -0,0 +1,41 @@
+# app/tests/test_cli.py
+import pytest
+
+import cli
+
+
+@pytest.mark.parametrize('command', [['search', 'вопрос'], ['bench']])
+def test_repeat_must_be_positive(command, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.build_parser().parse_args(command + ['--repeat', '0'])
+
+    assert exit_info.value.code == 2
+    assert '--repeat' in capsys.readouterr().err
+
+
+def test_empty_timings_are_reported(capsys):
+    cli._print_timings("запросы", [])
+
+    assert 'нет замеров' in capsys.readouterr().out
+
+
+def test_bench_without_questions(tmp_path, capsys):
+    queries = tmp_path / 'questions.txt'
+    queries.write_text('\n', encoding='utf-8')
+    args = cli.build_parser().parse_args(['bench', '--queries', str(queries)])
+
+    assert cli.cmd_bench(args, {}) == 1
+    assert 'Нет вопросов' in capsys.readouterr().out
+
+
+def test_cli_import_has_no_side_effects():
+    import subprocess
+    import sys
+
+    code = (
+        "import logging, sys; import cli; "
+        "sys.exit(1 if logging.getLogger().handlers or 'main' in sys.modules else 0)"
+    )
+    app_dir = cli.__file__.rsplit('cli.py', 1)[0]
+
+    assert subprocess.run([sys.executable, '-c', code], cwd=app_dir).returncode == 0
@@ -0,0 +1,37 @@
+# app/tests/test_compact_index.py
+import pytest
+
+np = pytest.importorskip('numpy')
+sparse = pytest.importorskip('scipy.sparse')
+
+from database.compact_index import QUANTIZED_SCALE, compact_matrix, quantized_scale, recall_check
+
+
+def _matrix(rows=200, features=300):
+    matrix = sparse.random(rows, features, density=0.05, format='csr', random_state=1)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    # Строки нормированы, как у TfidfVectorizer(norm='l2')
+    return sparse.csr_matrix(sparse.diags(1 / np.maximum(norms, 1e-12)) @ matrix)
+
+
+def test_quantized_values_round_trip():
+    matrix = _matrix()
+    compact = compact_matrix(matrix)
+    quantized = compact_matrix(matrix, quantize=True)
+
+    assert quantized.dtype == np.uint8
+    assert quantized.indices.dtype == np.int32
+    assert quantized_scale(quantized) == QUANTIZED_SCALE
+    assert quantized_scale(compact) is None
+    assert quantized.data.nbytes * 4 == compact.data.nbytes
+
+    restored = compact_matrix(quantized)
+    assert restored.dtype == np.float32
+    assert abs(restored - matrix).max() <= QUANTIZED_SCALE / 2 + 1e-6
+
+
+def test_quantized_search_keeps_recall():
+    matrix = compact_matrix(_matrix())
+    quantized = compact_matrix(matrix, quantize=True)
+
+    assert recall_check(matrix, quantized, matrix[:50]) >= 0.9
@@ -0,0 +1,54 @@
+# app/tests/test_conversation.py
+from bot.conversation import ConversationStore
+
+
+def test_keeps_only_last_turns_and_truncates_them():
+    store = ConversationStore(max_turns=2, max_chars_per_turn=10)
+    for number in range(3):
+        store.add_turn(1, f"вопрос {number} " * 3, "ответ")
+
+    history = store.history(1)
+    assert [turn.question for turn in history] == ["вопрос 1 в", "вопрос 2 в"]
+
+
+def test_evicts_least_recent_user_and_expired_dialogs():
+    store = ConversationStore(max_users=2)
+    store.add_turn(1, "вопрос", "ответ")
+    store.add_turn(2, "вопрос", "ответ")
+    store.add_turn(1, "еще вопрос", "ответ")
+    store.add_turn(3, "вопрос", "ответ")
+
+    assert store.history(2) == []
+    assert len(store.history(1)) == 2
+
+    store.ttl = 0
+    assert store.history(1) == []
+    assert store.history(3) == []
+
+
+def test_follow_up_query_includes_previous_question():
+    store = ConversationStore()
+    store.add_turn(1, "Сколько стоит путевка в лагерь", "30 000 рублей")
+    history = store.history(1)
+
+    assert store.retrieval_query(history, "А для второго ребенка?") == (
+        "Сколько стоит путевка в лагерь А для второго ребенка?"
+    )
+    question = "Какие документы нужны для поступления в лагерь"
+    assert store.retrieval_query(history, question) == question
+
+
+def test_history_messages_fit_token_budget():
+    store = ConversationStore(token_budget=40, chars_per_token=1.0)
+    store.add_turn(1, "старый вопрос", "старый ответ")
+    store.add_turn(1, "новый вопрос", "Первое предложение. Второе предложение.")
+
+    # Свежая реплика берется целиком, ответ обрезается по предложению,
+    # от старой остается то, что поместилось в бюджет
+    messages = store.history_messages(store.history(1))
+    assert messages == [
+        {"role": "user", "content": "старый во"},
+        {"role": "user", "content": "новый вопрос"},
+        {"role": "assistant", "content": "Первое предложение."},
+    ]
+    assert sum(len(message["content"]) for message in messages) <= 40
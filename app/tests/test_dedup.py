@@ -0,0 +1,47 @@
+# app/tests/test_dedup.py
+import pytest
+
+pytest.importorskip('numpy')
+
+from processing.dedup import NearDuplicateFilter
+
+TEXT = (
+    "Лагерь Космос принимает детей от семи до семнадцати лет. Смена длится "
+    "двадцать один день, в программе занятия по робототехнике, астрономии "
+    "и спорту, экскурсии и вечерние мероприятия для всех отрядов."
+)
+
+
+def _doc(content, doc_type='website'):
+    return {'content': content, 'type': doc_type, 'source': doc_type}
+
+
+def test_similarity_estimates_jaccard():
+    dedup = NearDuplicateFilter()
+    first = dedup.signature(TEXT)
+
+    assert dedup.similarity(first, dedup.signature(TEXT)) == 1.0
+    assert dedup.similarity(first, dedup.signature(TEXT + " Телефон для справок.")) >= 0.8
+    assert dedup.similarity(first, dedup.signature("Оплата путевки по договору через банк")) < 0.2
+    assert dedup.signature("!!!") is None
+
+
+def test_keeps_preferred_copy_of_near_duplicates():
+    dedup = NearDuplicateFilter(threshold=0.8)
+    documents = [
+        _doc(TEXT + " Подробности на сайте."),
+        _doc(TEXT, 'faq'),
+        _doc(TEXT.upper()),
+        _doc("Оплата путевки производится по договору через банк."),
+    ]
+
+    kept, report = dedup.filter(documents)
+
+    assert kept == [documents[1], documents[3]]
+    assert report['exact_duplicates'] == 1
+    assert report['near_duplicates'] == 1
+
+
+def test_bands_must_divide_signature():
+    with pytest.raises(ValueError):
+        NearDuplicateFilter(num_perm=100, bands=16)
@@ -0,0 +1,40 @@
+# app/tests/test_faq_index.py
+import pytest
+
+pytest.importorskip('sklearn')
+
+from processing.faq_index import FAQIndex
+
+ENTRIES = [
+    {'question': 'Когда начинается смена?', 'answer': '1 июня'},
+    {'question': 'Сколько стоит путевка?', 'answer': '30 000 рублей'},
+]
+
+
+def _index(entries, **kwargs):
+    index = FAQIndex(lambda: entries, **kwargs)
+    index.bind_formatter(lambda question, answer: f"{question}: {answer}")
+    index.refresh(force=True)
+    return index
+
+
+def test_exact_and_fuzzy_lookup():
+    index = _index(ENTRIES, threshold=0.6)
+
+    assert index.lookup('когда начинается СМЕНА') == 'Когда начинается смена?: 1 июня'
+    assert index.lookup('Когда начинаеться смена') == 'Когда начинается смена?: 1 июня'
+    assert index.lookup('Как доехать до лагеря?') is None
+
+
+def test_rebuilds_only_when_entries_change():
+    entries = list(ENTRIES)
+    index = _index(entries, check_interval=0)
+    signature = index._signature
+
+    index.refresh()
+    assert index._signature == signature
+
+    entries.append({'question': 'Что взять с собой?', 'answer': 'Форму'})
+    index.refresh()
+    assert index._signature != signature
+    assert index.lookup('Что взять с собой') == 'Что взять с собой?: Форму'
@@ -0,0 +1,109 @@
+# app/tests/test_hybrid_search.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+
+from database.index_snapshot import IndexSnapshot
+from database.mysql_db import MySQLTextDB
+
+
+def _database(vector_search, deadline=0.05):
+    database = MySQLTextDB.__new__(MySQLTextDB)
+    database._executor = ThreadPoolExecutor(max_workers=4)
+    database.retrieval_deadline = deadline
+    database._vector_search = vector_search
+    database._fulltext_search = lambda query, k, filters=None: []
+    database._keyword_search = lambda query, k, filters=None: []
+    return database
+
+
+def _snapshot():
+    return IndexSnapshot(tfidf_matrix=object(), document_ids=[1], version=1)
+
+
+def test_late_vector_search_keeps_snapshot_alive():
+    started = threading.Event()
+    finish = threading.Event()
+    seen = []
+
+    def slow_search(snapshot, query, k, filters=None):
+        started.set()
+        finish.wait(5)
+        # Снимок уже снят с публикации, но данные еще доступны этой задаче
+        seen.append(snapshot.tfidf_matrix)
+        return []
+
+    database = _database(slow_search)
+    snapshot = _snapshot()
+    snapshot.acquire()
+    documents, complete = database._hybrid_search(snapshot, 'вопрос', 3)
+    snapshot.release()
+
+    assert started.is_set()
+    assert (documents, complete) == ([], False)
+    snapshot.retire()
+    assert snapshot.tfidf_matrix is not None
+
+    finish.set()
+    database._executor.shutdown(wait=True)
+    assert seen[0] is not None
+    assert snapshot.readers == 0
+    assert snapshot.tfidf_matrix is None
+
+
+def test_hybrid_search_returns_partial_result_at_deadline():
+    def slow_search(snapshot, query, k, filters=None):
+        time.sleep(0.5)
+        return [(1, 0.9)]
+
+    database = _database(slow_search, deadline=0.05)
+    started = time.perf_counter()
+    _, complete = database._hybrid_search(_snapshot(), 'вопрос', 3)
+
+    assert time.perf_counter() - started < 0.4
+    assert not complete
+    database._executor.shutdown(wait=True)
+
+
+def _documents(*doc_ids):
+    return {
+        doc_id: {'id': doc_id, 'content': f'текст {doc_id}', 'source': 'site', 'type': 'website'}
+        for doc_id in doc_ids
+    }
+
+
+def test_rank_fusion_prefers_documents_found_by_both_searches():
+    database = _database(lambda snapshot, query, k, filters=None: [(1, 0.9), (2, 0.8)])
+    documents = _documents(1, 2, 3)
+    database._fulltext_search = lambda query, k, filters=None: [documents[3], documents[2]]
+    snapshot = _snapshot()
+    snapshot.documents = documents
+
+    found, complete = database._hybrid_search(snapshot, 'вопрос', 3)
+    database._executor.shutdown(wait=True)
+
+    assert complete
+    assert [doc['id'] for doc in found] == [2, 1, 3]
+    assert [doc['similarity'] for doc in found] == [0.8, 0.9, 0.5]
+    assert {doc['method'] for doc in found} == {'hybrid'}
+
+
+def test_failed_search_does_not_discard_the_others():
+    def broken_search(snapshot, query, k, filters=None):
+        raise RuntimeError("индекс поврежден")
+
+    database = _database(broken_search)
+    documents = _documents(5)
+    database._fulltext_search = lambda query, k, filters=None: [documents[5]]
+    snapshot = _snapshot()
+    snapshot.documents = documents
+
+    found, complete = database._hybrid_search(snapshot, 'вопрос', 3)
+    database._executor.shutdown(wait=True)
+
+    assert not complete
+    assert [doc['id'] for doc in found] == [5]
@@ -0,0 +1,70 @@
+# app/tests/test_index_snapshot.py
+import threading
+
+import pytest
+
+from database.index_snapshot import IndexSnapshot
+
+
+def _snapshot(version=1):
+    return IndexSnapshot(vectorizer=object(), tfidf_matrix=object(), document_ids=[1], version=version)
+
+
+def test_retired_snapshot_is_freed_after_last_reader():
+    snapshot = _snapshot()
+    snapshot.acquire()
+    snapshot.acquire()
+
+    snapshot.retire()
+    snapshot.release()
+    assert snapshot.ready
+    assert snapshot.readers == 1
+
+    snapshot.release()
+    assert not snapshot.ready
+    assert snapshot.vectorizer is None
+    assert snapshot.readers == 0
+
+
+def test_unused_snapshot_is_freed_on_retire():
+    snapshot = _snapshot()
+    snapshot.acquire()
+    snapshot.release()
+    assert snapshot.ready
+
+    snapshot.retire()
+    assert snapshot.tfidf_matrix is None
+
+
+def test_matches_filters():
+    snapshot = IndexSnapshot()
+    snapshot.documents = {1: {'type': 'faq', 'source': 'faq.json'}}
+
+    assert snapshot.matches(1, None)
+    assert snapshot.matches(1, {'type': ('faq', 'website')})
+    assert not snapshot.matches(1, {'type': ('faq',), 'source': ('https://site',)})
+    assert not snapshot.matches(2, {'type': ('faq',)})
+
+
+def test_reader_keeps_old_snapshot_across_swap():
+    pytest.importorskip('mysql.connector')
+    from database.mysql_db import MySQLTextDB
+
+    database = MySQLTextDB.__new__(MySQLTextDB)
+    database._lock = threading.RLock()
+    database._snapshot = old = _snapshot(version=1)
+
+    with database._reading() as snapshot:
+        # Публикация нового снимка, как в _publish
+        with database._lock:
+            database._snapshot = _snapshot(version=2)
+        old.retire()
+        assert snapshot is old
+        assert snapshot.ready
+
+        with database._reading() as current:
+            assert current.version == 2
+
+    assert not old.ready
+    assert database._snapshot.ready
+    assert database._snapshot.readers == 0
@@ -0,0 +1,36 @@
+# app/tests/test_profiling.py
+import asyncio
+import threading
+from collections import Counter
+
+from profiling import RequestProfiler
+
+
+def test_signal_toggle_runs_outside_event_loop(tmp_path):
+    profiler = RequestProfiler(output_dir=str(tmp_path))
+    threads = []
+    original = profiler.toggle
+
+    def toggle():
+        threads.append(threading.get_ident())
+        original()
+
+    profiler.toggle = toggle
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        profiler._toggle_in_thread(loop)
+        await asyncio.gather(*profiler._tasks)
+        assert profiler.enabled
+        profiler._counts = {'llm': Counter({'main.py:ask': 3})}
+        profiler._toggle_in_thread(loop)
+        await asyncio.gather(*profiler._tasks)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+
+    assert len(threads) == 2
+    assert loop_thread not in threads
+    assert not profiler.enabled
+    assert profiler._sampler is None
+    assert (tmp_path / 'all.folded').read_text(encoding='utf-8') == "llm;main.py:ask 3\n"
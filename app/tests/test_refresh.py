@@ -0,0 +1,39 @@
+# app/tests/test_refresh.py
+from database.index_snapshot import IndexSnapshot
+from processing.refresh import KnowledgeRefresher
+
+
+class UnloadedDatabase:
+    """База лагеря, чей индекс выгружен из памяти"""
+
+    def __init__(self, count):
+        self.snapshot = IndexSnapshot()
+        self.count = count
+        self.applied = None
+
+    def get_document_count(self, replica=True):
+        return self.count
+
+    def apply_changes(self, documents):
+        self.applied = documents
+        return {'added': 0, 'removed': self.count - len(documents), 'kept': len(documents)}
+
+
+def _refresher(database, documents):
+    return KnowledgeRefresher(database, lambda: documents, nice=0, io_idle=False)
+
+
+def test_partial_crawl_is_skipped_when_index_is_unloaded():
+    database = UnloadedDatabase(100)
+
+    assert _refresher(database, [{'id': 1}] * 10).refresh_once() is None
+    assert database.applied is None
+
+
+def test_full_crawl_is_applied():
+    database = UnloadedDatabase(100)
+
+    changes = _refresher(database, [{'id': 1}] * 90).refresh_once()
+
+    assert changes['kept'] == 90
+    assert len(database.applied) == 90
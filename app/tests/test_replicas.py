@@ -0,0 +1,71 @@
+# app/tests/test_replicas.py
+import pytest
+
+pytest.importorskip('mysql.connector')
+
+from mysql.connector.errors import OperationalError
+
+from database.mysql_db import MySQLTextDB
+from database.replicas import Replica, ReplicaRouter
+
+
+class _Cursor:
+    def __init__(self, rows=None, error=None):
+        self.rows = rows
+        self.error = error
+
+    def execute(self, sql, params=None):
+        if self.error:
+            raise self.error
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.closed = False
+
+    def cursor(self, dictionary=False):
+        return self._cursor
+
+    def close(self):
+        self.closed = True
+
+
+class _Pool:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def get_connection(self):
+        return self.connection
+
+
+def _database(replica_cursor, primary_rows):
+    database = MySQLTextDB.__new__(MySQLTextDB)
+    database.pool = _Pool(_Connection(_Cursor(rows=primary_rows)))
+    replica = Replica('replica-1', _Pool(_Connection(replica_cursor)))
+    replica.healthy = True
+    database.replicas = ReplicaRouter([replica])
+    return database, replica
+
+
+def test_read_uses_healthy_replica():
+    database, replica = _database(_Cursor(rows=[{'id': 'replica'}]), [{'id': 'primary'}])
+
+    assert database.fetch_all("SELECT id FROM documents", replica=True) == [{'id': 'replica'}]
+    assert replica.healthy
+
+
+def test_failed_replica_read_retries_on_primary():
+    database, replica = _database(_Cursor(error=OperationalError("Lost connection")), [{'id': 'primary'}])
+
+    assert database.fetch_all("SELECT id FROM documents", replica=True) == [{'id': 'primary'}]
+    assert not replica.healthy
+    assert replica.pool.connection.closed
+    # Следующее чтение сразу идет на основной сервер
+    assert database.replicas.acquire() == (None, None)
@@ -0,0 +1,84 @@
+# app/tests/test_resilience.py
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+
+from gigachat.api_client import GigaChatUnavailable
+from gigachat.resilience import CircuitBreaker, ResilientGigaChat
+
+
+def test_breaker_opens_after_failures_and_probes_once():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    # После паузы проходит только один пробный запрос
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+class _Client:
+    def __init__(self, delays, error=None):
+        self.delays = list(delays)
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def request_completion(self, messages, deadline=None, **kwargs):
+        with self._lock:
+            attempt = self.calls
+            self.calls += 1
+        time.sleep(self.delays[attempt])
+        if self.error:
+            raise self.error
+        return f"ответ {attempt}"
+
+
+def test_slow_request_is_hedged():
+    client = _Client([1.0, 0.0])
+    gigachat = ResilientGigaChat(client, hedge_min_delay=0.05)
+
+    assert gigachat.chat_completion([], deadline=time.monotonic() + 2) == "ответ 1"
+    assert client.calls == 2
+
+
+def test_failures_open_the_breaker():
+    client = _Client([0.0] * 4, error=RuntimeError("500"))
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60)
+    gigachat = ResilientGigaChat(client, breaker=breaker, hedge=False)
+
+    with pytest.raises(GigaChatUnavailable):
+        gigachat.chat_completion([], deadline=time.monotonic() + 1)
+    assert client.calls == 2
+
+    with pytest.raises(GigaChatUnavailable):
+        gigachat.chat_completion([], deadline=time.monotonic() + 1)
+    assert client.calls == 2
+
+
+def test_expired_deadline_does_not_touch_the_breaker():
+    client = _Client([])
+    breaker = CircuitBreaker(failure_threshold=1)
+    gigachat = ResilientGigaChat(client, breaker=breaker)
+
+    with pytest.raises(GigaChatUnavailable):
+        gigachat.chat_completion([], deadline=time.monotonic() - 1)
+    assert client.calls == 0
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,92 @@
+# app/tests/test_scheduler.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+
+from bot.scheduler import (
+    PRIORITY_FIRST, PRIORITY_FOLLOW_UP, PRIORITY_REPEAT, LLMScheduler, SchedulerBusy
+)
+from gigachat.api_client import GigaChatUnavailable
+
+
+def test_stop_resolves_queued_requests():
+    release = threading.Event()
+
+    async def scenario():
+        scheduler = LLMScheduler(workers=1, max_queue=10)
+        running = asyncio.ensure_future(scheduler.submit(lambda: release.wait(5) and 'ответ'))
+        await asyncio.sleep(0.05)
+        queued = [asyncio.ensure_future(scheduler.submit(lambda: 'ответ')) for _ in range(3)]
+        await asyncio.sleep(0.05)
+
+        await scheduler.stop()
+        release.set()
+        return await asyncio.wait_for(
+            asyncio.gather(running, *queued, return_exceptions=True), timeout=1
+        )
+
+    results = asyncio.run(scenario())
+
+    assert len(results) == 4
+    assert all(isinstance(result, GigaChatUnavailable) for result in results)
+
+
+def test_queued_requests_run_by_priority_then_arrival():
+    release = threading.Event()
+    order = []
+
+    def call(name):
+        def run():
+            order.append(name)
+            return name
+        return run
+
+    async def scenario():
+        scheduler = LLMScheduler(workers=1, max_queue=10)
+        running = asyncio.ensure_future(scheduler.submit(lambda: release.wait(5)))
+        await asyncio.sleep(0.05)
+        queued = [
+            asyncio.ensure_future(scheduler.submit(call(name), priority))
+            for name, priority in (
+                ('повтор', PRIORITY_REPEAT),
+                ('уточнение', PRIORITY_FOLLOW_UP),
+                ('первый-1', PRIORITY_FIRST),
+                ('первый-2', PRIORITY_FIRST),
+            )
+        ]
+        await asyncio.sleep(0.05)
+        release.set()
+        await asyncio.gather(running, *queued)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert order == ['первый-1', 'первый-2', 'уточнение', 'повтор']
+
+
+def test_expired_and_overflowing_requests_are_shed():
+    release = threading.Event()
+    called = []
+
+    async def scenario():
+        scheduler = LLMScheduler(workers=1, max_queue=1, min_remaining=1.0)
+        running = asyncio.ensure_future(scheduler.submit(lambda: release.wait(5)))
+        await asyncio.sleep(0.05)
+        # До дедлайна останется меньше min_remaining - запрос не отправляется
+        expiring = asyncio.ensure_future(
+            scheduler.submit(lambda: called.append(1), deadline=time.monotonic() + 0.5)
+        )
+        await asyncio.sleep(0.05)
+        with pytest.raises(SchedulerBusy):
+            await scheduler.submit(lambda: called.append(1))
+        release.set()
+        await running
+        with pytest.raises(GigaChatUnavailable):
+            await expiring
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert called == []
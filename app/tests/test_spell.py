@@ -0,0 +1,35 @@
+# app/tests/test_spell.py
+from processing.spell import SpellCorrector, correct_query, edit_distance
+
+
+def test_edit_distance_counts_transpositions():
+    assert edit_distance('смена', 'смена', 2) == 0
+    assert edit_distance('смнеа', 'смена', 2) == 1
+    assert edit_distance('путевка', 'путвеак', 2) == 2
+    assert edit_distance('лагерь', 'стоимость', 2) == 3
+
+
+def test_corrects_typos_against_vocabulary():
+    speller = SpellCorrector(
+        ['путевка', 'смена', 'стоимость', 'расписание'],
+        known_words=['лагерь', 'сколько'],
+    )
+
+    assert speller.lookup('путевкка') == 'путевка'
+    assert speller.lookup('стоимсоть') == 'стоимость'
+    assert speller.lookup('рассписане') == 'расписание'
+    # Известные и короткие слова не трогаем, далекие не исправляем
+    assert speller.lookup('лагерь') is None
+    assert speller.lookup('смн') is None
+    assert speller.lookup('зоопарк') is None
+    assert speller.correct('сколько стоимсоть путевкка') == ('сколько стоимость путевка', 2)
+
+
+def test_ties_go_to_more_frequent_word():
+    speller = SpellCorrector(['домик', 'домок'], weights={'домик': -1.0, 'домок': -3.0})
+
+    assert speller.lookup('домак') == 'домик'
+
+
+def test_correct_query_without_corrector():
+    assert correct_query(None, 'смнеа') == 'смнеа'
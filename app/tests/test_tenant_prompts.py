@@ -0,0 +1,57 @@
+# app/tests/test_tenant_prompts.py
+import pytest
+
+pytest.importorskip('telegram')
+pytest.importorskip('requests')
+
+from bot.telegram_bot import TelegramBot
+from main import update_bot_contacts
+from tenants import tenant_config
+
+CONFIG = {
+    'telegram_bot_token': 'token',
+    'camp_url': 'https://cosmos.68edu.ru',
+    'contacts': {'phone': '+7 (4752) 55-70-09', 'email': 'kosmos@OBRAZ.TAMBOV.GOV.RU'},
+    'tenants': {
+        'camps': [
+            {
+                'id': 'zvezda',
+                'name': 'Звезда',
+                'camp_url': 'https://zvezda.example.ru',
+                'contacts': {'phone': '+7 (4742) 00-00-00', 'email': 'zvezda@example.ru'}
+            }
+        ]
+    }
+}
+
+DEFAULT_CONTACTS = ('55-70-09', 'cosmos.68edu.ru', 'kosmos@', 'Космос')
+
+
+def _bot(config):
+    bot = TelegramBot(config['telegram_bot_token'], None, None, tenant=config.get('tenant'))
+    update_bot_contacts(bot, config)
+    return bot
+
+
+@pytest.mark.parametrize('question', [
+    'Какие документы нужны?',
+    'Сколько стоит путевка?',
+    'Как связаться с ребенком?'
+])
+def test_second_tenant_prompt_has_no_default_contacts(question):
+    bot = _bot(tenant_config(CONFIG, 'zvezda'))
+    prompt = bot.system_prompt + bot._create_formatted_prompt("контекст", question)
+
+    for contact in DEFAULT_CONTACTS:
+        assert contact not in prompt
+    assert '+7 (4742) 00-00-00' in prompt
+    assert 'https://zvezda.example.ru' in prompt
+    assert 'zvezda@example.ru' in prompt
+
+
+def test_default_camp_prompt_keeps_its_contacts():
+    bot = _bot(CONFIG)
+    prompt = bot._create_formatted_prompt("контекст", 'Как связаться с ребенком?')
+
+    assert '+7 (4752) 55-70-09' in prompt
+    assert 'https://cosmos.68edu.ru' in prompt
@@ -0,0 +1,52 @@
+# app/tests/test_tenants.py
+from processing.data_parser import load_faq_entries
+from tenants import tenant_config
+
+CONFIG = {
+    'telegram_bot_token': 'token',
+    'camp_url': 'https://cosmos.68edu.ru',
+    'faq_file': 'faq_cosmos.json',
+    'snapshot_file': 'corpus_snapshot.jsonl.gz',
+    'tenants': {
+        'camps': [
+            {'id': 'zvezda', 'camp_url': 'https://zvezda.example.ru'},
+            {'id': 'luch', 'faq_file': 'faq_luch.json', 'snapshot_file': 'luch.jsonl.gz'}
+        ]
+    }
+}
+
+
+def test_tenant_does_not_inherit_faq_and_snapshot():
+    camp = tenant_config(CONFIG, 'zvezda')
+
+    assert camp['faq_file'] is None
+    assert camp['snapshot_file'] != CONFIG['snapshot_file']
+    assert camp['snapshot_file'].startswith('tenants')
+    assert load_faq_entries(camp['faq_file'], builtin=False) == []
+
+
+def test_tenant_own_faq_and_snapshot():
+    camp = tenant_config(CONFIG, 'luch')
+
+    assert camp['faq_file'] == 'faq_luch.json'
+    assert camp['snapshot_file'] == 'luch.jsonl.gz'
+    assert camp['camp_url'] == CONFIG['camp_url']
+
+
+def test_builtin_faq_without_file():
+    assert load_faq_entries(None)
+    assert load_faq_entries('missing_faq.json', builtin=False) == []
+
+
+def test_cli_requires_tenant_without_default(tmp_path, monkeypatch, capsys):
+    import json
+
+    import cli
+
+    # Журнал по умолчанию пишется в текущий каталог
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps(CONFIG), encoding='utf-8')
+
+    assert cli.main(['--config', str(path), 'stats']) == 2
+    assert '--tenant' in capsys.readouterr().out